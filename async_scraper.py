@@ -0,0 +1,194 @@
+"""
+Asyncio crawler mode for WikiScraper.
+
+All requests go through one aiohttp session whose connector keeps
+connections alive and caps them at `concurrency`, so throughput is bound by
+the number of in-flight requests rather than by OS threads. HTML parsing is
+CPU-bound and runs in a process pool, and SQLite/CSV writes go to the
+batched ArticleWriter thread, so the event loop only schedules I/O.
+
+    python wiki_scraper.py --async -c 100
+"""
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import aiohttp
+
+from wiki_parser import parse_article
+from wiki_scraper import (
+    WIKI_BASE_URL, ArticleWriterError, FetchResult, WikiScraper, conditional_headers
+)
+
+
+class AsyncWikiScraper(WikiScraper):
+    def __init__(self, db_path: str, concurrency: int = 100,
+                 base_url: str = WIKI_BASE_URL, request_interval: float = 0.02,
+                 parse_workers: Optional[int] = None, request_timeout: float = 30,
+                 batch_size: int = 100, flush_interval: float = 1.0,
+                 near_duplicate_threshold: Optional[float] = 0.8):
+        """
+        Args:
+            db_path: SQLite database path
+            concurrency: Maximum requests in flight (and pooled connections)
+            base_url: Site the /wiki/ links are resolved against
+            request_interval: Minimum seconds between request starts, shared
+                by all tasks like WikiScraper._rate_limit
+            parse_workers: Parser processes, defaults to the CPU count
+            request_timeout: Total seconds allowed per request
+            batch_size: Articles per ArticleWriter transaction
+            flush_interval: Seconds before a partial batch is committed
+            near_duplicate_threshold: See ArticleWriter, None disables
+        """
+        super().__init__(db_path, max_workers=concurrency, base_url=base_url,
+                         request_interval=request_interval, batch_size=batch_size,
+                         flush_interval=flush_interval, request_timeout=request_timeout,
+                         near_duplicate_threshold=near_duplicate_threshold)
+        self.concurrency = concurrency
+        self.parse_workers = parse_workers or os.cpu_count() or 1
+
+        self.articles_scraped = 0
+        self._next_request_time = 0.0
+        self._active = 0
+        self._frontier_changed = None
+        self._http = None
+        self._parse_executor = None
+
+    async def _rate_limit(self):
+        """Space request starts request_interval apart across all tasks."""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        # single event loop thread, so reserving a slot needs no lock
+        slot = max(now, self._next_request_time)
+        self._next_request_time = slot + self.request_interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def get_article(self, url, etag=None, last_modified=None) -> FetchResult:
+        """Fetch an article, like WikiScraper.get_article."""
+        await self._rate_limit()
+        headers = conditional_headers(etag, last_modified)
+        try:
+            async with self._http.get(f"{self.base_url}{url}", headers=headers) as response:
+                if response.status == 200:
+                    return FetchResult(200, await response.read(),
+                                       response.headers.get('ETag'),
+                                       response.headers.get('Last-Modified'))
+                if response.status != 304:
+                    print(f"Failed to fetch {url}: {response.status}")
+                return FetchResult(response.status, None, etag, last_modified)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            print(f"Request error for {url}: {e}")
+            return FetchResult(None, None, etag, last_modified)
+
+    async def _process_article(self, url: str):
+        """
+        Fetch, parse and queue one article for storage.
+
+        Returns:
+            (stored, links) like WikiScraper._process_article
+        """
+        fetched = await self.get_article(url)
+        if not fetched.html:
+            return False, []
+
+        loop = asyncio.get_running_loop()
+        page = await loop.run_in_executor(self._parse_executor, parse_article, fetched.html)
+        if not page:
+            return False, []
+        title, content, summary, new_links = page
+
+        # only touched from the event loop thread, so no title_lock
+        if title in self.seen_titles:
+            print(f"Skipping dup article: {title}")
+            return False, []
+        self.seen_titles.add(title)
+        if not content:
+            return False, []
+
+        # put() compresses and may block on a full queue, keep it off the loop
+        await loop.run_in_executor(None, self.writer.put, title, url, content, summary,
+                                   fetched.etag, fetched.last_modified)
+        print(f"Visiting... {title}")
+        return True, list(dict.fromkeys(new_links))
+
+    async def _worker(self, max_pages: Optional[int]):
+        while True:
+            url = None
+            if max_pages is None or self.articles_scraped + self._active < max_pages:
+                url = self.frontier.pop()
+
+            if url is None:
+                if not self._active:
+                    # nothing left and nobody can add more
+                    async with self._frontier_changed:
+                        self._frontier_changed.notify_all()
+                    return
+                async with self._frontier_changed:
+                    await self._frontier_changed.wait()
+                continue
+
+            self._active += 1
+            try:
+                stored, links = await self._process_article(url)
+            except (asyncio.CancelledError, ArticleWriterError):
+                # url stays claimed and is pending again on restart
+                raise
+            except Exception as e:
+                print(f"Error processing article {url}: {e}")
+                stored, links = False, []
+            finally:
+                self._active -= 1
+
+            self.articles_scraped += stored
+            self.frontier.done(url)
+            self.frontier.add_many(links)
+            async with self._frontier_changed:
+                self._frontier_changed.notify_all()
+
+    async def crawl(self, start_url: str = "/wiki/Dune_(novel)",
+                    max_pages: Optional[int] = None) -> int:
+        """
+        Crawl from start_url (or the frontier left by an earlier run) until
+        the frontier is empty or max_pages articles were stored.
+
+        Returns:
+            Number of articles stored
+        """
+        self.frontier.add(start_url)
+        self._active = 0
+        self._frontier_changed = asyncio.Condition()
+
+        connector = aiohttp.TCPConnector(limit=self.concurrency,
+                                         limit_per_host=self.concurrency,
+                                         keepalive_timeout=30)
+        timeout = aiohttp.ClientTimeout(total=self.request_timeout)
+        async with aiohttp.ClientSession(connector=connector, headers=self.headers,
+                                         timeout=timeout) as self._http:
+            await asyncio.gather(*(self._worker(max_pages)
+                                   for _ in range(self.concurrency)))
+        return self.articles_scraped
+
+    def scrape_wikipedia(self, start_url: str = "/wiki/Dune_(novel)",
+                         max_pages: Optional[int] = None) -> int:
+        """Run crawl() to completion and report pages/sec."""
+        self.load_visited_titles()
+        self._parse_executor = ProcessPoolExecutor(max_workers=self.parse_workers)
+        self.writer.start()
+        start_time = time.perf_counter()
+        try:
+            asyncio.run(self.crawl(start_url, max_pages))
+        except KeyboardInterrupt:
+            print("\nScraping interrupted by user")
+        finally:
+            self._parse_executor.shutdown(cancel_futures=True)
+            try:
+                self.writer.close()
+            finally:
+                self.frontier.close()
+            elapsed = time.perf_counter() - start_time
+            rate = self.articles_scraped / elapsed if elapsed else 0.0
+            print(f"\nScraped {self.articles_scraped} articles ({rate:.1f} pages/sec)")
+        return self.articles_scraped
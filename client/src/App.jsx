@@ -1,5 +1,18 @@
 import { useState, useEffect, useRef } from 'react';
 
+// Wrap the [start, end) highlight ranges returned by the API in <mark>
+function renderSnippet(text, highlights = []) {
+  const parts = [];
+  let last = 0;
+  highlights.forEach(([start, end], index) => {
+    if (start > last) parts.push(text.slice(last, start));
+    parts.push(<mark key={index}>{text.slice(start, end)}</mark>);
+    last = end;
+  });
+  parts.push(text.slice(last));
+  return parts;
+}
+
 export default function App() {
   const [query, setQuery] = useState('');
   const [results, setResults] = useState([]);
@@ -157,7 +170,7 @@ export default function App() {
             </header>
             
             <p className="wiki-summary">
-              {result.summary}
+              {result.snippet ? renderSnippet(result.snippet, result.highlights) : result.summary}
             </p>
           </article>
         ))}
@@ -0,0 +1,179 @@
+"""
+Disk-backed crawl frontier with a compact in-memory seen filter.
+
+Pending links live in the crawl_frontier table (sql/frontier.sql) together
+with their inbound link count, and are claimed in small batches, most
+linked-to first. Discovered links and finished URLs are buffered and written
+with executemany, so memory is bounded by the batch sizes plus a Bloom
+filter of visited URLs, independent of crawl size. Because claimed and done
+URLs are recorded in the table, a restarted crawl resumes with exactly the
+frontier it stopped with.
+"""
+import hashlib
+import logging
+import math
+import os
+import sqlite3
+from collections import deque
+from typing import Iterable, Optional
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql')
+
+PENDING, CLAIMED, DONE = 0, 1, 2
+
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over strings.
+
+    Membership can give false positives at roughly error_rate while at most
+    capacity items were added, never false negatives.
+    """
+    def __init__(self, capacity: int, error_rate: float = 1e-6):
+        self.capacity = max(capacity, 1)
+        self.error_rate = error_rate
+        self.num_bits = int(math.ceil(-self.capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes = max(1, round(self.num_bits / self.capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        # double hashing: two 64-bit halves of one digest stand in for k hashes
+        digest = hashlib.blake2b(item.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+
+    def add(self, item: str) -> None:
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7))
+                   for position in self._positions(item))
+
+    def __len__(self) -> int:
+        return self.count
+
+
+class CrawlFrontier:
+    def __init__(self, db_path: str, batch_size: int = 500, claim_size: int = 100,
+                 seen_capacity: int = 5_000_000, seen_error_rate: float = 1e-6):
+        """
+        Args:
+            db_path: SQLite database holding the crawl_frontier table
+            batch_size: Buffered link additions / completions per write
+            claim_size: Pending URLs claimed per read; smaller keeps the
+                inbound-count ordering more current
+            seen_capacity: Expected number of visited URLs; the filter is
+                sized for at least twice the URLs already visited
+            seen_error_rate: Bloom filter false positive rate, i.e. the
+                chance an unvisited link is taken as already visited
+        """
+        self.batch_size = batch_size
+        self.claim_size = claim_size
+        self.logger = logging.getLogger(__name__)
+
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with open(os.path.join(SQL_DIR, 'frontier.sql'), mode='r', encoding='utf-8') as file:
+            self.conn.executescript(file.read())
+        with self.conn:
+            self.conn.execute("UPDATE crawl_frontier SET state = ? WHERE state = ?",
+                              (PENDING, CLAIMED))
+
+        # visited = done in the frontier, or stored by a crawl that predates it
+        visited_query = ("SELECT url FROM crawl_frontier WHERE state = ? "
+                         "UNION SELECT url FROM documents WHERE url IS NOT NULL")
+        visited = self.conn.execute(
+            f"SELECT COUNT(*) FROM ({visited_query})", (DONE,)).fetchone()[0]
+        self.seen = BloomFilter(max(seen_capacity, 2 * visited), seen_error_rate)
+        for (url,) in self.conn.execute(visited_query, (DONE,)):
+            self.seen.add(url)
+
+        self._pending = {}  # url -> inbound links not yet written
+        self._claimed = deque()
+        self._done = []
+        self.logger.info(f"Frontier opened: {visited} visited, {len(self)} pending")
+
+    def add(self, url: str) -> None:
+        """Record a link to url, queueing it if it was not visited yet."""
+        if url in self.seen:
+            return
+        self._pending[url] = self._pending.get(url, 0) + 1
+        if len(self._pending) >= self.batch_size:
+            self._flush_pending()
+
+    def add_many(self, urls: Iterable[str]) -> None:
+        for url in urls:
+            self.add(url)
+
+    def pop(self) -> Optional[str]:
+        """Next URL to crawl, or None if the frontier is empty."""
+        if not self._claimed:
+            self._claim()
+        if not self._claimed:
+            return None
+        return self._claimed.popleft()
+
+    def done(self, url: str) -> None:
+        """Mark a popped URL as visited."""
+        self._done.append(url)
+        if len(self._done) >= self.batch_size:
+            self._flush_done()
+
+    def _flush_pending(self) -> None:
+        if not self._pending:
+            return
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO crawl_frontier (url, inbound) VALUES (?, ?) "
+                "ON CONFLICT(url) DO UPDATE SET inbound = inbound + excluded.inbound",
+                self._pending.items()
+            )
+        self._pending = {}
+
+    def _flush_done(self) -> None:
+        if not self._done:
+            return
+        with self.conn:
+            self.conn.executemany("UPDATE crawl_frontier SET state = ? WHERE url = ?",
+                                  ((DONE, url) for url in self._done))
+        self._done = []
+
+    def _claim(self) -> None:
+        # write buffered links first so they compete on inbound count
+        self._flush_pending()
+        with self.conn:
+            urls = [row[0] for row in self.conn.execute(
+                "SELECT url FROM crawl_frontier WHERE state = ? "
+                "ORDER BY inbound DESC LIMIT ?", (PENDING, self.claim_size)
+            )]
+            self.conn.executemany("UPDATE crawl_frontier SET state = ? WHERE url = ?",
+                                  ((CLAIMED, url) for url in urls))
+        for url in urls:
+            self.seen.add(url)
+        self._claimed.extend(urls)
+
+    def flush(self) -> None:
+        """Write buffered additions and completions."""
+        self._flush_pending()
+        self._flush_done()
+
+    def close(self) -> None:
+        """Flush, return unstarted claims to pending and close the connection."""
+        self.flush()
+        if self._claimed:
+            with self.conn:
+                self.conn.executemany("UPDATE crawl_frontier SET state = ? WHERE url = ?",
+                                      ((PENDING, url) for url in self._claimed))
+            self._claimed.clear()
+        self.conn.close()
+
+    def __len__(self) -> int:
+        """Pending URLs, including buffered and claimed ones."""
+        stored = self.conn.execute("SELECT COUNT(*) FROM crawl_frontier WHERE state = ?",
+                                   (PENDING,)).fetchone()[0]
+        return stored + len(self._pending) + len(self._claimed)
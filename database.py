@@ -1,9 +1,16 @@
+import os
+import csv
+import hashlib
+import zlib
 import sqlite3
 import threading
 import time
+from typing import Dict, List, Optional
 from queue import Queue, Empty, Full
 from contextlib import contextmanager
 
+from near_duplicates import near_duplicate_ids
+
 def get_db():
     """Opens database connection."""
     db = sqlite3.connect('./var/wiki.sqlite3')
@@ -16,13 +23,18 @@ def get_db():
 
 class DatabasePool:
     def __init__(self, database_path: str, max_connections: int = 10, timeout: int = 30):
-        self.max_connections = 10
+        self.max_connections = max_connections
         self.active_connections = 0
         self.connections = Queue(maxsize=max_connections)
         self.database_path = database_path
         self.timeout = timeout
         self._lock = threading.Lock()
 
+        # wait/saturation counters exposed through stats()
+        self.wait_count = 0
+        self.wait_time_total = 0.0
+        self.timeout_count = 0
+
     def _create_connection(self):
         """Create new SQLite connection."""
         conn = sqlite3.connect(
@@ -42,6 +54,9 @@ class DatabasePool:
         2. Create new connection if under limit
         3. Wait for new connection to be returned to pool via .get()
 
+        The lock only guards the connection count; it is released before
+        waiting so one starved caller does not block everyone else.
+
         Returns:
             sqlite3.Connection: A database connection 
         Raises:
@@ -50,20 +65,37 @@ class DatabasePool:
         try:
             # Get connection w/o waiting if available
             return self.connections.get_nowait()
+        except Empty:
+            pass
+
+        with self._lock:
+            create = self.active_connections < self.max_connections
+            if create:
+                self.active_connections += 1
+
+        if create:
+            try:
+                return self._create_connection()
+            except Exception:
+                with self._lock:
+                    self.active_connections -= 1
+                raise
+
+        wait_start = time.perf_counter()
+        try:
+            # At limit, block until new connection is available
+            return self.connections.get(timeout=self.timeout)
         except Empty:
             with self._lock:
-                if self.active_connections < self.max_connections:
-                    # Create and return new connection
-                    self.active_connections += 1
-                    return self._create_connection()
-                try:
-                    # At limit, block until new connection is available
-                    return self.connections.get(timeout=self.timeout)
-                except Empty:
-                    raise TimeoutError(
-                        f"Could not get connection within {self.timeout} seconds. "
-                        f"Active connections: {self.active_connections}"
-                    )
+                self.timeout_count += 1
+            raise TimeoutError(
+                f"Could not get connection within {self.timeout} seconds. "
+                f"Active connections: {self.active_connections}"
+            )
+        finally:
+            with self._lock:
+                self.wait_count += 1
+                self.wait_time_total += time.perf_counter() - wait_start
                 
     def return_connection(self, conn: sqlite3.Connection):
         """Return connection to the pool for reusage or close it if the pool is full"""
@@ -74,15 +106,394 @@ class DatabasePool:
             with self._lock:
                 self.active_connections -= 1
 
+    def stats(self):
+        """Snapshot of pool usage for monitoring."""
+        idle = self.connections.qsize()
+        active = max(self.active_connections - idle, 0)
+        return {
+            "max_connections": self.max_connections,
+            "open": self.active_connections,
+            "idle": idle,
+            "active": active,
+            "saturation": active / self.max_connections if self.max_connections else 0.0,
+            "waits": self.wait_count,
+            "wait_time": self.wait_time_total,
+            "timeouts": self.timeout_count
+        }
+
+
+class ReadOnlyPool:
+    """
+    Read-optimized SQLite pool for the search server.
+
+    Connections are opened read-only with query_only and tuned mmap/page
+    cache settings. Each thread gets back the connection it used last
+    (per-thread affinity, so its page cache stays warm) and otherwise any
+    idle one. Check-out and return are single dict operations, atomic under
+    the GIL, so the hot path takes no lock; a condition variable is only
+    used when the pool is exhausted.
+    """
+    def __init__(self, database_path: str, max_connections: int = 10, timeout: int = 30,
+                 mmap_size: int = 256 * 1024 * 1024, cache_size_kib: int = 64 * 1024):
+        self.database_path = database_path
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.mmap_size = mmap_size
+        self.cache_size_kib = cache_size_kib
+
+        self.active_connections = 0
+        self._idle = {}  # id(conn) -> conn
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self._waiters = 0
+
+        self.wait_count = 0
+        self.wait_time_total = 0.0
+        self.timeout_count = 0
+
+    def _create_connection(self):
+        """Create a read-only connection with read-tuned pragmas."""
+        uri = f"file:{os.path.abspath(self.database_path)}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=self.timeout,
+                               check_same_thread=False)
+        conn.execute('PRAGMA query_only=ON')
+        conn.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+        # negative cache_size is in KiB rather than pages
+        conn.execute(f'PRAGMA cache_size=-{int(self.cache_size_kib)}')
+        conn.execute('PRAGMA temp_store=MEMORY')
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def get_connection(self):
+        """
+        Check out a connection, trying in order:
+        1. The connection this thread returned last
+        2. Any idle connection
+        3. A new connection if under max_connections
+        4. Wait for a connection to be returned
+
+        Returns:
+            sqlite3.Connection: A read-only database connection
+        Raises:
+            TimeoutError: If no connection available within timeout period
+        """
+        conn = self._idle.pop(getattr(self._local, 'last', None), None)
+        if conn is not None:
+            return conn
+
+        conn = self._pop_idle()
+        if conn is not None:
+            return conn
+
+        with self._lock:
+            create = self.active_connections < self.max_connections
+            if create:
+                self.active_connections += 1
+        if create:
+            try:
+                return self._create_connection()
+            except Exception:
+                with self._lock:
+                    self.active_connections -= 1
+                raise
+
+        return self._wait_for_connection()
+
+    def _pop_idle(self):
+        try:
+            return self._idle.popitem()[1]
+        except KeyError:
+            return None
+
+    def _wait_for_connection(self):
+        wait_start = time.perf_counter()
+        deadline = time.monotonic() + self.timeout
+        with self._available:
+            self._waiters += 1
+            try:
+                while True:
+                    conn = self._pop_idle()
+                    if conn is not None:
+                        return conn
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeout_count += 1
+                        raise TimeoutError(
+                            f"Could not get connection within {self.timeout} seconds. "
+                            f"Active connections: {self.active_connections}"
+                        )
+                    # short waits so a missed notify only costs a poll
+                    self._available.wait(min(remaining, 0.05))
+            finally:
+                self._waiters -= 1
+                self.wait_count += 1
+                self.wait_time_total += time.perf_counter() - wait_start
+
+    def return_connection(self, conn: sqlite3.Connection):
+        """Return connection to the idle set and remember it for this thread."""
+        key = id(conn)
+        self._local.last = key
+        self._idle[key] = conn
+        if self._waiters:
+            with self._available:
+                self._available.notify()
+
+    def close_all(self):
+        """Close idle connections (checked-out ones are closed on return)."""
+        while True:
+            conn = self._pop_idle()
+            if conn is None:
+                break
+            conn.close()
+            with self._lock:
+                self.active_connections -= 1
+
+    def stats(self):
+        """Snapshot of pool usage for monitoring."""
+        idle = len(self._idle)
+        active = max(self.active_connections - idle, 0)
+        return {
+            "max_connections": self.max_connections,
+            "open": self.active_connections,
+            "idle": idle,
+            "active": active,
+            "saturation": active / self.max_connections if self.max_connections else 0.0,
+            "waits": self.wait_count,
+            "wait_time": self.wait_time_total,
+            "timeouts": self.timeout_count
+        }
+
 pool = None
 
+# document_content.content holds zlib-compressed UTF-8 (BLOB). Rows written
+# before compression was introduced are plain TEXT; readers accept both.
+CONTENT_COMPRESSION_LEVEL = 6
+
+def compress_content(text: str) -> bytes:
+    """Compress article text for document_content."""
+    return zlib.compress(text.encode('utf-8'), CONTENT_COMPRESSION_LEVEL)
+
+def decompress_content(value) -> str:
+    """Decode a document_content value, compressed (bytes) or legacy TEXT."""
+    if isinstance(value, (bytes, memoryview)):
+        return zlib.decompress(value).decode('utf-8')
+    return value
+
+def content_hash(text: str) -> str:
+    """Hash of extracted article text, used to detect changed pages on refresh."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+# columns added to documents after the original schema, for refresh crawls
+REFRESH_COLUMNS = {
+    'etag': 'TEXT',
+    'last_modified': 'TEXT',
+    'content_hash': 'TEXT',
+}
+
+def migrate_documents(conn) -> None:
+    """Add any REFRESH_COLUMNS missing from an older documents table."""
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(documents)")}
+    for column, column_type in REFRESH_COLUMNS.items():
+        if column not in existing:
+            conn.execute(f"ALTER TABLE documents ADD COLUMN {column} {column_type}")
+    conn.commit()
+
+def _database_size(conn) -> int:
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+def _content_size(conn) -> Optional[int]:
+    """Bytes used by document_content, if SQLite has the dbstat table."""
+    try:
+        return conn.execute(
+            "SELECT SUM(pgsize) FROM dbstat WHERE name = 'document_content'"
+        ).fetchone()[0]
+    except sqlite3.OperationalError:
+        return None
+
+def _content_read_latency(database_path: str, doc_ids: List[int]) -> Dict[str, float]:
+    """Time reading (and decoding) content for doc_ids on a fresh connection."""
+    conn = sqlite3.connect(database_path)
+    try:
+        times = []
+        for doc_id in doc_ids:
+            start = time.perf_counter()
+            row = conn.execute(
+                "SELECT content FROM document_content WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+            if row:
+                decompress_content(row[0])
+            times.append(time.perf_counter() - start)
+    finally:
+        conn.close()
+
+    if not times:
+        return {"avg_ms": 0.0, "p95_ms": 0.0}
+    times.sort()
+    return {
+        "avg_ms": sum(times) / len(times) * 1000,
+        "p95_ms": times[min(int(len(times) * 0.95), len(times) - 1)] * 1000
+    }
+
+def compress_document_content(database_path: str = './var/wiki.sqlite3',
+                              batch_size: int = 500, sample_size: int = 200) -> Dict:
+    """
+    Migrate plain TEXT rows of document_content to compressed BLOBs.
+
+    Already compressed rows are skipped, so the migration can be re-run or
+    resumed. The database is vacuumed afterwards to give the space back.
+
+    Args:
+        database_path: Path to wiki.sqlite3
+        batch_size: Rows compressed per transaction
+        sample_size: Random docs used to measure read latency
+
+    Returns:
+        Report with sizes and read latency before and after
+    """
+    conn = sqlite3.connect(database_path)
+    try:
+        doc_ids = [row[0] for row in conn.execute(
+            "SELECT doc_id FROM document_content ORDER BY RANDOM() LIMIT ?", (sample_size,)
+        )]
+        before = {
+            "database_bytes": _database_size(conn),
+            "content_bytes": _content_size(conn),
+            "read_latency": _content_read_latency(database_path, doc_ids)
+        }
+
+        migrated = 0
+        last_doc_id = -1
+        while True:
+            rows = conn.execute(
+                "SELECT doc_id, content FROM document_content "
+                "WHERE doc_id > ? AND typeof(content) = 'text' "
+                "ORDER BY doc_id LIMIT ?",
+                (last_doc_id, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+
+            conn.executemany(
+                "UPDATE document_content SET content = ? WHERE doc_id = ?",
+                [(compress_content(content), doc_id) for doc_id, content in rows]
+            )
+            conn.commit()
+            migrated += len(rows)
+            last_doc_id = rows[-1][0]
+
+        conn.execute("VACUUM")
+        after = {
+            "database_bytes": _database_size(conn),
+            "content_bytes": _content_size(conn),
+            "read_latency": _content_read_latency(database_path, doc_ids)
+        }
+    finally:
+        conn.close()
+
+    return {
+        "rows_compressed": migrated,
+        "before": before,
+        "after": after,
+        "database_size_ratio": (after["database_bytes"] / before["database_bytes"]
+                                if before["database_bytes"] else 0.0)
+    }
+
+def export_csv(database_path: str = './var/wiki.sqlite3', output_path: str = 'data.csv',
+               batch_size: int = 500, skip_near_duplicates: bool = False) -> int:
+    """
+    Write data.csv (doc_id, title, content) from the database for the indexer.
+
+    Args:
+        skip_near_duplicates: Leave out articles listed in duplicate_clusters
+            (only the first article of each near-duplicate cluster is kept)
+
+    Returns:
+        Number of documents written
+    """
+    conn = sqlite3.connect(database_path)
+    try:
+        skipped = near_duplicate_ids(conn) if skip_near_duplicates else set()
+        cur = conn.execute(
+            "SELECT d.doc_id, d.title, c.content "
+            "FROM documents d JOIN document_content c ON c.doc_id = d.doc_id "
+            "ORDER BY d.doc_id"
+        )
+        count = 0
+        with open(output_path, mode='w', newline='\n', encoding='utf-8') as file:
+            writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+            while True:
+                rows = cur.fetchmany(batch_size)
+                if not rows:
+                    break
+                rows = [row for row in rows if row[0] not in skipped]
+                writer.writerows((doc_id, title, decompress_content(content))
+                                 for doc_id, title, content in rows)
+                count += len(rows)
+        return count
+    finally:
+        conn.close()
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql')
+
+def build_fts_index(database_path: str = './var/wiki.sqlite3', batch_size: int = 1000) -> int:
+    """
+    (Re)build the FTS5 table used by the 'fts5' search backend.
+
+    Args:
+        database_path: Path to wiki.sqlite3
+        batch_size: Documents inserted per executemany call
+
+    Returns:
+        Number of documents indexed
+    """
+    with open(os.path.join(SQL_DIR, 'fts.sql'), mode='r', encoding='utf-8') as file:
+        schema = file.read()
+
+    conn = sqlite3.connect(database_path)
+    try:
+        conn.executescript(schema)
+        read_cur = conn.execute(
+            "SELECT d.doc_id, d.title, c.content "
+            "FROM documents d JOIN document_content c ON c.doc_id = d.doc_id"
+        )
+        count = 0
+        while True:
+            rows = read_cur.fetchmany(batch_size)
+            if not rows:
+                break
+            conn.executemany(
+                "INSERT INTO documents_fts (rowid, title, content) VALUES (?, ?, ?)",
+                [(doc_id, title, decompress_content(content))
+                 for doc_id, title, content in rows]
+            )
+            count += len(rows)
+
+        conn.execute("INSERT INTO documents_fts (documents_fts) VALUES ('optimize')")
+        conn.commit()
+        return count
+    finally:
+        conn.close()
+
 def init_db(app):
     global pool
     if pool is None:
-        pool = DatabasePool(
+        pool_class = DatabasePool
+        kwargs = {}
+        if app.config.get('DATABASE_POOL_MODE', 'default') == 'read_only':
+            pool_class = ReadOnlyPool
+            kwargs = {
+                'mmap_size': app.config.get('DATABASE_MMAP_SIZE', 256 * 1024 * 1024),
+                'cache_size_kib': app.config.get('DATABASE_CACHE_SIZE_KIB', 64 * 1024)
+            }
+
+        pool = pool_class(
             database_path=app.config.get('DATABASE_PATH', '../var/wiki.sqlite3'),
             max_connections=app.config.get('DATABASE_POOL_SIZE', 10),
-            timeout=app.config.get('DATABASE_TIMEOUT', 30)
+            timeout=app.config.get('DATABASE_TIMEOUT', 30),
+            **kwargs
         )
 
 @contextmanager
@@ -110,3 +521,44 @@ def get_db():
             raise e
         finally:
             conn.close()
+
+
+def _print_compression_report(report: Dict) -> None:
+    def mib(value):
+        return f"{value / 2**20:.1f} MiB" if value is not None else "n/a"
+
+    before, after = report["before"], report["after"]
+    print(f"Compressed {report['rows_compressed']} document_content rows")
+    print(f"{'':<22}{'before':>14}{'after':>14}")
+    print(f"{'database size':<22}{mib(before['database_bytes']):>14}{mib(after['database_bytes']):>14}")
+    print(f"{'document_content':<22}{mib(before['content_bytes']):>14}{mib(after['content_bytes']):>14}")
+    print(f"{'read latency avg':<22}{before['read_latency']['avg_ms']:>12.3f}ms"
+          f"{after['read_latency']['avg_ms']:>12.3f}ms")
+    print(f"{'read latency p95':<22}{before['read_latency']['p95_ms']:>12.3f}ms"
+          f"{after['read_latency']['p95_ms']:>12.3f}ms")
+
+
+if __name__ == "__main__":
+    import argparse
+    import json
+
+    parser = argparse.ArgumentParser(description="wiki.sqlite3 maintenance commands")
+    parser.add_argument('command', choices=['fts', 'compress', 'export'])
+    parser.add_argument('--db', default='./var/wiki.sqlite3')
+    parser.add_argument('--output', default='data.csv', help='CSV path for export')
+    parser.add_argument('--skip-near-duplicates', action='store_true',
+                        help='export: leave out near-duplicate articles')
+    args = parser.parse_args()
+
+    if args.command == 'fts':
+        print(f"Indexed {build_fts_index(args.db)} documents into documents_fts")
+    elif args.command == 'compress':
+        report = compress_document_content(args.db)
+        _print_compression_report(report)
+        filename = f"content_compression_{time.strftime('%Y%m%d_%H%M%S')}.json"
+        with open(filename, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Report saved to {filename}")
+    elif args.command == 'export':
+        count = export_csv(args.db, args.output, skip_near_duplicates=args.skip_near_duplicates)
+        print(f"Exported {count} documents to {args.output}")
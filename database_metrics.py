@@ -8,6 +8,7 @@ import json
 import logging
 from contextlib import contextmanager
 import sqlite3
+import threading
 import database  # Our database module with pool
 import os
 from flask import Flask
@@ -255,6 +256,129 @@ def run_performance_comparison(num_queries: int = 100) -> Dict[str, Any]:
         logging.error(error_msg)
         return {"error": error_msg}
 
+def test_pool_concurrency(db_pool, implementation: str, num_threads: int,
+                          queries_per_thread: int, test_doc_ids: List[int]) -> Dict[str, Any]:
+    """Hammer a pool from several threads at once.
+    
+    Args:
+        db_pool: DatabasePool or ReadOnlyPool instance
+        implementation: Name of implementation being tested
+        num_threads: Number of concurrent client threads
+        queries_per_thread: Queries issued by each thread
+        test_doc_ids: Document IDs to query (cycled)
+        
+    Returns:
+        Dictionary containing latency, throughput and pool statistics
+    """
+    metrics = PerformanceMetrics(implementation)
+    metrics_lock = threading.Lock()
+    start_barrier = threading.Barrier(num_threads)
+
+    def worker(offset):
+        query_times = []
+        errors = 0
+        start_barrier.wait()
+        for i in range(queries_per_thread):
+            doc_id = test_doc_ids[(offset + i) % len(test_doc_ids)]
+            query_start = time.perf_counter()
+            try:
+                conn = db_pool.get_connection()
+                try:
+                    cur = conn.execute(
+                        "SELECT summary FROM documents WHERE doc_id = ?",
+                        (doc_id,)
+                    )
+                    cur.fetchone()
+                finally:
+                    db_pool.return_connection(conn)
+                query_times.append(time.perf_counter() - query_start)
+            except Exception:
+                errors += 1
+
+        with metrics_lock:
+            for query_time in query_times:
+                metrics.add_measurement(query_time)
+            metrics.errors += errors
+            metrics.total_queries += errors
+
+    logging.info(f"Starting {implementation} concurrency test with {num_threads} threads")
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(num_threads)]
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall_time = time.perf_counter() - wall_start
+
+    stats = metrics.get_stats()
+    stats["threads"] = num_threads
+    stats["throughput_qps"] = metrics.total_queries / wall_time if wall_time > 0 else 0
+    stats["pool_stats"] = db_pool.stats()
+    return stats
+
+def run_concurrent_pool_comparison(num_threads: int = 16, queries_per_thread: int = 1000,
+                                   pool_size: int = 10) -> Dict[str, Any]:
+    """Compare the queue-based DatabasePool with the read-only pool under load.
+    
+    Args:
+        num_threads: Number of concurrent client threads
+        queries_per_thread: Queries issued by each thread
+        pool_size: max_connections for both pools
+        
+    Returns:
+        Dictionary containing comparison results and statistics
+    """
+    db_path = os.path.join('.', 'var', 'wiki.sqlite3')
+    test_doc_ids = list(range(1, 101))
+
+    default_pool = database.DatabasePool(db_path, max_connections=pool_size)
+    read_only_pool = database.ReadOnlyPool(db_path, max_connections=pool_size)
+
+    default_results = test_pool_concurrency(
+        default_pool, "database_pool", num_threads, queries_per_thread, test_doc_ids
+    )
+    read_only_results = test_pool_concurrency(
+        read_only_pool, "read_only_pool", num_threads, queries_per_thread, test_doc_ids
+    )
+    read_only_pool.close_all()
+
+    improvement = {}
+    if default_results.get("avg_query_time_ms") and read_only_results.get("avg_query_time_ms"):
+        improvement = {
+            "avg_query_time_percent": (
+                (default_results["avg_query_time_ms"] - read_only_results["avg_query_time_ms"]) /
+                default_results["avg_query_time_ms"] * 100
+            ),
+            "p95_query_time_percent": (
+                (default_results["p95_query_time_ms"] - read_only_results["p95_query_time_ms"]) /
+                default_results["p95_query_time_ms"] * 100
+            ),
+            "throughput_ratio": (
+                read_only_results["throughput_qps"] / default_results["throughput_qps"]
+                if default_results["throughput_qps"] else 0
+            )
+        }
+
+    results = {
+        "database_pool": default_results,
+        "read_only_pool": read_only_results,
+        "improvement": improvement,
+        "test_info": {
+            "threads": num_threads,
+            "queries_per_thread": queries_per_thread,
+            "pool_size": pool_size,
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f'pool_concurrency_{timestamp}.json'
+    with open(filename, 'w') as f:
+        json.dump(results, f, indent=2)
+
+    logging.info(f"Pool concurrency comparison saved to {filename}")
+    return results
+
 if __name__ == "__main__":
     # Example usage
     print("Initializing database pool...")
@@ -276,6 +400,14 @@ if __name__ == "__main__":
         print("\nHeavy Load Improvement:")
         print(f"Average Query Time: {heavy_load['improvement']['avg_query_time_percent']:.2f}%")
 
+        print("\nRunning concurrent pool comparison...")
+        concurrent = run_concurrent_pool_comparison()
+        for name in ("database_pool", "read_only_pool"):
+            result = concurrent[name]
+            print(f"{name}: {result['throughput_qps']:.0f} queries/sec, "
+                  f"p95 {result['p95_query_time_ms']:.3f}ms, "
+                  f"waits {result['pool_stats']['waits']}")
+
     except Exception as e:
         print(f"Error running performance tests: {e}")
         logging.error(f"Performance test error: {e}")
\ No newline at end of file
@@ -0,0 +1,370 @@
+"""Profile the index build stage by stage in each of its execution modes.
+
+Builds the index from the first --documents rows of a doc_id,title,body CSV
+and records, for every stage, wall and CPU time, records in/out and
+records/sec, bytes in/out and peak RSS:
+
+- local: the map1 | sort | reduce1 ... reduce5 scripts of pipeline.sh, each
+  stage run to completion on the previous stage's output file, so its
+  resources are measured in isolation (os.wait4)
+- multiprocess: inverted_index/build_index.py's map, reduce and write
+  phases, once per --workers count
+- hadoop: pipeline.sh on the sample, with the per-job figures taken from
+  the counters Hadoop streaming prints. Runs when `mapred` is on PATH
+
+    python index_benchmark.py data.csv --documents 5000 --workers 1 4
+
+Results are written to index_benchmark_<timestamp>.json.
+"""
+import argparse
+import csv
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import re
+import shlex
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logging.basicConfig(
+    filename='index_benchmark.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+REPORT_FORMAT = 1
+INDEX_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'inverted_index')
+MODES = ('local', 'multiprocess', 'hadoop')
+
+# as in inverted_index/performance.py
+SORT = "sort --compress-program=gzip"
+LOCAL_STAGES = [f"{kind}{job}" for job in range(1, 6) for kind in ('map', 'sort', 'reduce')]
+
+csv.field_size_limit(sys.maxsize)
+
+
+def write_sample(input_path: str, sample_path: str, documents: int) -> Dict[str, Any]:
+    """Copy the first `documents` rows of the input; the sample is described by its sha256."""
+    digest = hashlib.sha256()
+    rows = 0
+    with open(input_path, mode='r', encoding='utf-8', newline='') as src, \
+            open(sample_path, mode='w', encoding='utf-8', newline='') as dst:
+        writer = csv.writer(dst)
+        for row in csv.reader(src):
+            if rows >= documents:
+                break
+            writer.writerow(row)
+            rows += 1
+    with open(sample_path, mode='rb') as file:
+        for block in iter(lambda: file.read(2**20), b''):
+            digest.update(block)
+    return {"documents": rows, "bytes": os.path.getsize(sample_path),
+            "sha256": digest.hexdigest()}
+
+
+def _count_lines(path: str) -> int:
+    with open(path, mode='rb') as file:
+        return sum(block.count(b'\n') for block in iter(lambda: file.read(2**20), b''))
+
+
+def _summarize(stages: Dict[str, Dict], documents: int, complete: bool = True) -> Dict[str, Any]:
+    """Whole-build figures of one mode from its stages."""
+    seconds = sum(stage["seconds"] for stage in stages.values())
+    return {
+        "complete": complete,
+        "seconds": seconds,
+        "cpu_seconds": sum(stage["cpu_seconds"] for stage in stages.values()),
+        "peak_rss_bytes": max((stage["peak_rss_bytes"] for stage in stages.values()), default=0),
+        "documents_per_second": documents / seconds if seconds else 0.0,
+        "intermediate_bytes": sum(stage["bytes_out"] for stage in list(stages.values())[:-1]),
+    }
+
+
+def run_stage(command: List[str], in_path: str, out_path: str, cwd: str,
+              records_in: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Run one pipeline stage as a child process, stdin and stdout redirected to files.
+
+    Args:
+        command: Stage command line
+        in_path: Input file (the previous stage's output)
+        out_path: Output file
+        cwd: Working directory, holding stopwords.txt and doc_count.txt
+        records_in: Input records, if the input is not line-oriented
+
+    Returns:
+        Wall and CPU seconds, peak RSS, records and bytes of the stage
+    """
+    with open(in_path, mode='rb') as src, open(out_path, mode='wb') as dst:
+        start = time.perf_counter()
+        process = subprocess.Popen(command, stdin=src, stdout=dst, cwd=cwd)
+        # unlike RUSAGE_CHILDREN, wait4 reports this child alone
+        _, status, usage = os.wait4(process.pid, 0)
+        seconds = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise subprocess.CalledProcessError(process.returncode, command)
+
+    if records_in is None:
+        records_in = _count_lines(in_path)
+    return {"seconds": seconds,
+            "cpu_seconds": usage.ru_utime + usage.ru_stime,
+            "peak_rss_bytes": usage.ru_maxrss * 1024,
+            "records_in": records_in,
+            "records_out": _count_lines(out_path),
+            "records_per_second": records_in / seconds if seconds else 0.0,
+            "bytes_in": os.path.getsize(in_path),
+            "bytes_out": os.path.getsize(out_path)}
+
+
+def run_local(sample_path: str, documents: int, work_dir: str) -> Dict[str, Any]:
+    """Profile every stage of the Unix pipeline on the sample."""
+    os.makedirs(work_dir)
+    shutil.copy(os.path.join(INDEX_DIR, 'stopwords.txt'), work_dir)
+    stages = {}
+    in_path = sample_path
+    for name in LOCAL_STAGES:
+        if name.startswith('sort'):
+            command = shlex.split(SORT)
+        else:
+            script = os.path.join(INDEX_DIR, f'{name}.py')
+            if not os.path.exists(script):
+                logging.warning(f"local: {name}.py not found, stopping after {len(stages)} stages")
+                return {"stages": stages, "missing_stage": name,
+                        "total": _summarize(stages, documents, complete=False)}
+            command = [sys.executable, script]
+
+        out_path = os.path.join(work_dir, f'{name}.out')
+        logging.info(f"local: running {name}")
+        stages[name] = run_stage(command, in_path, out_path, work_dir,
+                                 records_in=documents if name == 'map1' else None)
+        if in_path != sample_path:
+            os.remove(in_path)
+        in_path = out_path
+    return {"stages": stages, "total": _summarize(stages, documents)}
+
+
+def _build_child(sample_path: str, output_dir: str, workers: int, conn) -> None:
+    """Child process: run build_index so its memory is measured on its own."""
+    try:
+        sys.path.append(INDEX_DIR)
+        from build_index import build_index
+        conn.send(build_index(sample_path, output_dir, workers=workers))
+    except Exception as e:
+        logging.error(f"multiprocess build failed: {e}")
+        conn.send({"error": str(e)})
+    finally:
+        conn.close()
+
+
+def run_multiprocess(sample_path: str, documents: int, work_dir: str, workers: int) -> Dict[str, Any]:
+    """Profile the map, reduce and write phases of build_index.py."""
+    context = multiprocessing.get_context('spawn')
+    parent_conn, child_conn = context.Pipe(duplex=False)
+    process = context.Process(target=_build_child,
+                              args=(sample_path, work_dir, workers, child_conn))
+    process.start()
+    child_conn.close()
+    stats = parent_conn.recv()
+    process.join()
+    if "error" in stats:
+        return stats
+    return {"workers": stats["workers"], "partitions": stats["partitions"],
+            "runs": stats["runs"], "stages": stats["stages"],
+            "total": _summarize(stats["stages"], documents)}
+
+
+_COUNTER = re.compile(r'^\s+([^=]+?)=(\d+)\s*$')
+_JOB_STARTED = re.compile(r'Running job: (job_\d+_\d+)')
+_JOB_FINISHED = re.compile(r'Job (job_\d+_\d+) (completed successfully|failed)')
+
+
+def parse_hadoop_log(lines, clock=time.perf_counter) -> List[Dict[str, Any]]:
+    """
+    Per-job wall time and counters from the output of `mapred streaming`.
+
+    Args:
+        lines: Output lines, consumed as they are produced so that job
+            start and end can be timed
+        clock: Time source
+
+    Returns:
+        One dict per job: id, seconds, status and counters by name
+    """
+    jobs = []
+    job = None
+    for line in lines:
+        started = _JOB_STARTED.search(line)
+        if started:
+            job = {"id": started.group(1), "start": clock(), "counters": {}}
+            jobs.append(job)
+            continue
+        if job is None:
+            continue
+        finished = _JOB_FINISHED.search(line)
+        if finished:
+            job["seconds"] = clock() - job.pop("start")
+            job["status"] = finished.group(2)
+            continue
+        counter = _COUNTER.match(line)
+        if counter:
+            job["counters"][counter.group(1)] = int(counter.group(2))
+    return jobs
+
+
+def _hadoop_stage(job: Dict[str, Any]) -> Dict[str, Any]:
+    counters = job["counters"]
+    seconds = job.get("seconds", 0.0)
+    records_in = counters.get("Map input records", 0)
+    return {"job_id": job["id"],
+            "seconds": seconds,
+            # task CPU across the cluster, not the client's
+            "cpu_seconds": counters.get("CPU time spent (ms)", 0) / 1000,
+            "peak_rss_bytes": max(counters.get("Peak Map Physical memory (bytes)", 0),
+                                  counters.get("Peak Reduce Physical memory (bytes)", 0)),
+            "records_in": records_in,
+            "records_out": counters.get("Reduce output records", 0),
+            "records_per_second": records_in / seconds if seconds else 0.0,
+            "bytes_in": counters.get("HDFS: Number of bytes read", 0),
+            "bytes_out": counters.get("HDFS: Number of bytes written", 0),
+            "shuffle_bytes": counters.get("Reduce shuffle bytes", 0)}
+
+
+def run_hadoop(sample_path: str, documents: int) -> Dict[str, Any]:
+    """Run pipeline.sh on the sample, one stage per MapReduce job."""
+    if shutil.which('mapred') is None:
+        return {"skipped": "mapred not found on PATH"}
+
+    start = time.perf_counter()
+    process = subprocess.Popen(['./pipeline.sh'], cwd=INDEX_DIR,
+                               env={**os.environ, 'INPUT_CSV': sample_path},
+                               stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                               text=True, bufsize=1)
+    jobs = parse_hadoop_log(process.stdout)
+    process.wait()
+    seconds = time.perf_counter() - start
+    if process.returncode != 0:
+        return {"error": f"pipeline.sh exited with {process.returncode}",
+                "jobs": [job["id"] for job in jobs]}
+
+    stages = {f"job{number}": _hadoop_stage(job) for number, job in enumerate(jobs, start=1)}
+    total = _summarize(stages, documents)
+    # job submission, HDFS copies and startup are not inside any job
+    total["pipeline_seconds"] = seconds
+    return {"stages": stages, "total": total}
+
+
+def run_benchmark(input_path: str, documents: int = 1000, workers: Optional[List[int]] = None,
+                  modes=MODES) -> Dict[str, Any]:
+    """
+    Profile the index build of a sample of the corpus in each mode.
+
+    Args:
+        input_path: doc_id,title,body CSV
+        documents: Sample size, taken from the start of the input
+        workers: Worker counts of the multiprocess mode, defaults to the CPU count
+        modes: Modes to run
+
+    Returns:
+        The report: sample and machine description, per-mode stages and
+        totals, and speedups over the first complete mode
+    """
+    workers = workers or [os.cpu_count() or 1]
+    with tempfile.TemporaryDirectory(prefix='index_benchmark-') as tmp_dir:
+        sample_path = os.path.join(tmp_dir, 'sample.csv')
+        sample = write_sample(input_path, sample_path, documents)
+        documents = sample["documents"]
+        logging.info(f"Benchmarking index build on {documents} documents: {', '.join(modes)}")
+
+        results = {}
+        if 'local' in modes:
+            results['local'] = run_local(sample_path, documents, os.path.join(tmp_dir, 'local'))
+        if 'multiprocess' in modes:
+            for count in workers:
+                results[f'multiprocess-{count}'] = run_multiprocess(
+                    sample_path, documents, os.path.join(tmp_dir, f'multiprocess-{count}'), count)
+        if 'hadoop' in modes:
+            results['hadoop'] = run_hadoop(sample_path, documents)
+
+    report = {
+        "format": REPORT_FORMAT,
+        "test_info": {
+            "input": os.path.abspath(input_path),
+            "sample": sample,
+            "timestamp": datetime.now().isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "git_commit": _git_commit(),
+        },
+        "modes": results,
+    }
+
+    complete = [(name, result["total"]) for name, result in results.items()
+                if result.get("total", {}).get("complete")]
+    if complete:
+        baseline, base_total = complete[0]
+        report["comparison"] = {
+            "baseline": baseline,
+            "speedup": {name: base_total["seconds"] / total["seconds"] if total["seconds"] else 0.0
+                        for name, total in complete},
+        }
+    return report
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)),
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('input', nargs='?', default='data.csv',
+                        help='doc_id,title,body CSV (default: data.csv)')
+    parser.add_argument('--documents', type=int, default=1000,
+                        help='Sample size, from the start of the input (default: 1000)')
+    parser.add_argument('--workers', type=int, nargs='+', default=None,
+                        help='Worker counts for the multiprocess mode (default: CPU count)')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    args = parser.parse_args()
+
+    report = run_benchmark(args.input, args.documents, args.workers, args.modes)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f'index_benchmark_{timestamp}.json'
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"Sample: {report['test_info']['sample']['documents']} documents")
+    for name, result in report["modes"].items():
+        if "total" not in result:
+            print(f"{name}: {result.get('skipped') or 'failed (' + result.get('error', '') + ')'}")
+            continue
+        for stage, figures in result["stages"].items():
+            print(f"  {name:16} {stage:8} {figures['seconds']:8.2f}s "
+                  f"cpu {figures['cpu_seconds']:7.2f}s  "
+                  f"{figures['records_per_second']:10.0f} rec/s  "
+                  f"{figures['bytes_in'] / 2**20:7.1f} -> {figures['bytes_out'] / 2**20:7.1f} MiB  "
+                  f"rss {figures['peak_rss_bytes'] / 2**20:6.1f} MiB")
+        total = result["total"]
+        note = "" if total["complete"] else f" (incomplete: {result.get('missing_stage')}.py missing)"
+        print(f"{name}: {total['seconds']:.2f}s, {total['documents_per_second']:.0f} docs/s{note}")
+    for name, speedup in report.get("comparison", {}).get("speedup", {}).items():
+        print(f"Speedup of {name} over {report['comparison']['baseline']}: {speedup:.2f}x")
+    print(f"Saved to {filename}")
+
+
+if __name__ == "__main__":
+    main()
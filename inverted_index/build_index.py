@@ -0,0 +1,404 @@
+#!/usr/bin/env python3
+"""
+Build the TF-IDF inverted index in-process on a multiprocessing pool.
+
+Produces the same part-0000N files as the map1 | sort | reduce1 ... reduce5
+chain, without serializing to text and sorting between every stage:
+
+1. map: chunks of documents are tokenized and counted per document into an
+   in-memory dictionary, hash-partitioned by word. When the dictionary
+   reaches the worker's share of the memory budget it is spilled to disk as
+   one run per partition, sorted by word (SPIMI block indexing). The
+   document and token counts for idf and the manifest's corpus statistics
+   are collected on the way
+2. reduce: each partition k-way merges its runs, in several passes if there
+   are more than MERGE_FAN_IN, computes idf and every document's partial
+   squared norm over the partition's words, and streams the merged terms to
+   a single run
+3. write: with the partial norms summed, each partition streams its run
+   into its part-0000N file, words in sorted order
+
+Runs are read and written one term at a time, so memory is bounded by the
+budget, the postings of the most frequent word and one norm per document,
+not by the corpus size. Every phase runs one task per chunk or partition,
+so the build scales with the number of worker processes.
+
+    python inverted_index/build_index.py data.csv data/ --workers 4 --memory-mb 2048
+"""
+import argparse
+import csv
+import gzip
+import hashlib
+import heapq
+import logging
+import math
+import os
+import pickle
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import zlib
+from array import array
+from collections import Counter, deque
+from glob import glob
+from itertools import groupby, islice
+from multiprocessing import Pool
+from operator import itemgetter
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+sys.path.append(os.path.dirname(__file__))
+
+from manifest import corpus_stats, write_manifest  # noqa: E402
+from util import load_stopwords, tokenize  # noqa: E402
+
+STOPWORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stopwords.txt')
+
+# Runs merged at once; more are first merged in groups of this size
+MERGE_FAN_IN = 64
+
+# Approximate in-memory cost of one (doc_id, tf) posting in the map
+# dictionary, used to decide when to spill
+POSTING_BYTES = 100
+
+csv.field_size_limit(sys.maxsize)
+
+_stop_words = frozenset()
+
+
+def _init_worker(stopwords_path):
+    global _stop_words
+    _stop_words = frozenset(load_stopwords(stopwords_path))
+
+
+def partition_of(word: str, partitions: int) -> int:
+    """Stable (unlike hash()) partition of a word across processes."""
+    return zlib.crc32(word.encode('utf-8')) % partitions
+
+
+def _write_run(path: str, terms: Iterable[tuple], compress: bool = False) -> None:
+    """Write terms (tuples starting with the word, in word order) to a run file."""
+    with (gzip.open(path, mode='wb', compresslevel=1) if compress else open(path, mode='wb')) as file:
+        for term in terms:
+            pickle.dump(term, file, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def _read_run(path: str) -> Iterator[tuple]:
+    with open(path, mode='rb') as file:
+        compressed = file.read(2) == b'\x1f\x8b'
+    with (gzip.open(path, mode='rb') if compressed else open(path, mode='rb')) as file:
+        while True:
+            try:
+                yield pickle.load(file)
+            except EOFError:
+                return
+
+
+def _merge_runs(paths: List[str]) -> Iterator[Tuple[str, list]]:
+    """k-way merge of runs, concatenating the postings of equal words."""
+    merged = heapq.merge(*(_read_run(path) for path in paths), key=itemgetter(0))
+    for word, group in groupby(merged, key=itemgetter(0)):
+        postings = []
+        for _, run_postings in group:
+            postings.extend(run_postings)
+        yield word, postings
+
+
+def map_chunk(chunk_id: int, rows: List[List[str]], partitions: int, tmp_dir: str,
+              block_bytes: int, compress: bool = False) -> Tuple[int, int, int, int]:
+    """
+    Count words per document, spilling sorted runs of each partition.
+
+    Args:
+        chunk_id: Sequence number of the chunk, used in file names
+        rows: [doc_id, title, body] CSV rows
+        partitions: Number of word partitions
+        tmp_dir: Directory for intermediate files
+        block_bytes: Approximate dictionary size at which runs are spilled
+        compress: gzip-compress the runs
+
+    Returns:
+        Number of documents, tokens and (word, doc_id) postings, and the
+        largest doc_id in the chunk
+    """
+    postings = [{} for _ in range(partitions)]  # word -> [(doc_id, tf)]
+    size = 0
+    block = 0
+    tokens = postings_count = 0
+    max_doc_id = -1
+
+    def spill():
+        for partition, words in enumerate(postings):
+            if words:
+                path = os.path.join(tmp_dir, f'run-{partition}-{chunk_id:06d}-{block:04d}')
+                _write_run(path, sorted(words.items()), compress)
+                words.clear()
+
+    for doc_id, title, body in rows:
+        doc_id = int(doc_id)
+        max_doc_id = max(max_doc_id, doc_id)
+        # combine title and body
+        words = tokenize(body + " " + title, _stop_words)
+        tokens += len(words)
+        counts = Counter(words)
+        postings_count += len(counts)
+        for word, count in counts.items():
+            postings[partition_of(word, partitions)].setdefault(word, []).append((doc_id, count))
+
+        size += len(counts) * POSTING_BYTES
+        if size >= block_bytes:
+            spill()
+            size = 0
+            block += 1
+    spill()
+    return len(rows), tokens, postings_count, max_doc_id
+
+
+def reduce_partition(partition: int, doc_count: int, max_doc_id: int, tmp_dir: str,
+                     compress: bool = False, fan_in: int = MERGE_FAN_IN) -> Tuple[array, int]:
+    """
+    Merge one partition's runs and compute idf.
+
+    Returns:
+        Sum of (tf * idf)^2 over the partition's words, indexed by doc_id,
+        and the number of words
+    """
+    runs = sorted(glob(os.path.join(tmp_dir, f'run-{partition}-*')))
+    level = 0
+    while len(runs) > fan_in:
+        merged = []
+        for start in range(0, len(runs), fan_in):
+            path = os.path.join(tmp_dir, f'merge-{partition}-{level}-{start // fan_in:06d}')
+            _write_run(path, _merge_runs(runs[start:start + fan_in]), compress)
+            for run in runs[start:start + fan_in]:
+                os.remove(run)
+            merged.append(path)
+        runs = merged
+        level += 1
+
+    partial_norms = array('d', bytes(8 * (max_doc_id + 1)))
+    words = 0
+
+    def terms():
+        nonlocal words
+        for word, postings in _merge_runs(runs):
+            words += 1
+            postings.sort()
+            idf = math.log10(doc_count / len(postings))
+            for doc_id, tf in postings:
+                partial_norms[doc_id] += (tf * idf) ** 2
+            yield word, idf, postings
+
+    _write_run(os.path.join(tmp_dir, f'reduce-{partition}'), terms(), compress)
+    for run in runs:
+        os.remove(run)
+    return partial_norms, words
+
+
+def write_partition(partition: int, norms: array, tmp_dir: str, output_dir: str) -> Dict:
+    """
+    Write part-0000N: one line per word, "word idf (doc_id tf norm)...".
+
+    Returns:
+        The part's manifest entry (see manifest.part_info)
+    """
+    path = os.path.join(tmp_dir, f'reduce-{partition}')
+    name = f'part-{partition:05d}'
+    part = os.path.join(output_dir, name)
+    digest = hashlib.sha256()
+    terms = postings_count = 0
+    max_doc_id = 0
+    with open(part + '.tmp', mode='wb') as file:
+        for word, idf, postings in _read_run(path):
+            entries = ' '.join(f"{doc_id} {tf} {norms[doc_id]}" for doc_id, tf in postings)
+            line = f"{word} {idf} {entries}\n".encode('utf-8')
+            digest.update(line)
+            file.write(line)
+            terms += 1
+            postings_count += len(postings)
+            max_doc_id = max(max_doc_id, postings[-1][0])
+    os.replace(part + '.tmp', part)
+    os.remove(path)
+    return {"name": name, "terms": terms, "postings": postings_count,
+            "bytes": os.path.getsize(part), "max_doc_id": max_doc_id,
+            "sha256": digest.hexdigest()}
+
+
+def _profiled(func, *args):
+    """Run a pool task, also returning the worker's CPU seconds and peak RSS."""
+    cpu = time.process_time()
+    result = func(*args)
+    return result, time.process_time() - cpu, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class _PhaseProfile:
+    """Wall time, CPU time (this process and its pool tasks) and peak RSS of a phase."""
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.cpu = time.process_time()
+        self.task_cpu = 0.0
+        self.peak_rss = 0
+
+    def task(self, profiled):
+        """Unwrap a _profiled() result, accounting for its CPU and memory."""
+        result, cpu, rss = profiled
+        self.task_cpu += cpu
+        # ru_maxrss is the worker's peak so far, possibly from an earlier phase
+        self.peak_rss = max(self.peak_rss, rss)
+        return result
+
+    def finish(self, records_in: int, records_out: int, bytes_in: int, bytes_out: int) -> Dict:
+        seconds = time.perf_counter() - self.start
+        own_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+        return {"seconds": seconds,
+                "cpu_seconds": time.process_time() - self.cpu + self.task_cpu,
+                "peak_rss_bytes": max(self.peak_rss, own_rss),
+                "records_in": records_in, "records_out": records_out,
+                "records_per_second": records_in / seconds if seconds else 0.0,
+                "bytes_in": bytes_in, "bytes_out": bytes_out}
+
+
+def _read_chunks(input_path, chunk_size):
+    with open(input_path, mode='r', encoding='utf-8', newline='') as file:
+        reader = csv.reader(file)
+        while True:
+            rows = list(islice(reader, chunk_size))
+            if not rows:
+                return
+            yield rows
+
+
+def build_index(input_path: str, output_dir: str, stopwords_path: str = STOPWORDS_PATH,
+                partitions: int = 3, workers: Optional[int] = None,
+                chunk_size: int = 1000, compress: bool = False,
+                memory_mb: int = 1024, fan_in: int = MERGE_FAN_IN) -> Dict[str, float]:
+    """
+    Build part-00000 .. part-{partitions - 1} from a doc_id,title,body CSV.
+
+    Args:
+        input_path: CSV written by the scraper or `./bin/wikidb export`
+        output_dir: Directory for the part files and stop_words.txt
+        stopwords_path: Words left out of the index
+        partitions: Number of part files, listed in manifest.json
+        workers: Worker processes, defaults to the CPU count
+        chunk_size: Documents per map task
+        compress: gzip-compress intermediate runs, trading CPU for disk
+            traffic between the phases
+        memory_mb: Approximate budget for the in-memory map dictionaries of
+            all workers together; smaller budgets spill more, smaller runs
+        fan_in: Runs merged at once
+
+    Returns:
+        Document, token, term, run and timing counts, and per phase
+        ("map", "reduce", "write") wall/CPU time, records, bytes and peak RSS
+    """
+    logger = logging.getLogger(__name__)
+    workers = workers or os.cpu_count() or 1
+    block_bytes = memory_mb * 2**20 // workers
+    os.makedirs(output_dir, exist_ok=True)
+    stages = {}
+
+    with tempfile.TemporaryDirectory(prefix='build_index-', dir=output_dir) as tmp_dir, \
+            Pool(workers, initializer=_init_worker, initargs=(stopwords_path,)) as pool:
+        profile = _PhaseProfile()
+        # bounded window of map tasks so the CSV is not read ahead into memory
+        pending = deque()
+        doc_count = 0
+        token_count = 0
+        postings_count = 0
+        max_doc_id = -1
+
+        def collect(result):
+            nonlocal doc_count, token_count, postings_count, max_doc_id
+            docs, tokens, postings, chunk_max = profile.task(result.get())
+            doc_count += docs
+            token_count += tokens
+            postings_count += postings
+            max_doc_id = max(max_doc_id, chunk_max)
+
+        for chunk_id, rows in enumerate(_read_chunks(input_path, chunk_size)):
+            if len(pending) >= 2 * workers:
+                collect(pending.popleft())
+            pending.append(pool.apply_async(
+                _profiled, (map_chunk, chunk_id, rows, partitions, tmp_dir, block_bytes, compress)))
+        while pending:
+            collect(pending.popleft())
+        runs = list(os.scandir(tmp_dir))
+        intermediate_bytes = sum(entry.stat().st_size for entry in runs)
+        stages["map"] = profile.finish(doc_count, postings_count,
+                                       os.path.getsize(input_path), intermediate_bytes)
+
+        profile = _PhaseProfile()
+        norms = array('d', bytes(8 * (max_doc_id + 1)))
+        terms = 0
+        for result in pool.starmap(
+                _profiled,
+                [(reduce_partition, partition, doc_count, max_doc_id, tmp_dir, compress, fan_in)
+                 for partition in range(partitions)]):
+            partial_norms, words = profile.task(result)
+            terms += words
+            for doc_id, value in enumerate(partial_norms):
+                if value:
+                    norms[doc_id] += value
+        reduced_bytes = sum(os.path.getsize(path)
+                            for path in glob(os.path.join(tmp_dir, 'reduce-*')))
+        stages["reduce"] = profile.finish(postings_count, terms, intermediate_bytes, reduced_bytes)
+
+        profile = _PhaseProfile()
+        parts = [profile.task(result) for result in pool.starmap(
+            _profiled,
+            [(write_partition, partition, norms, tmp_dir, output_dir)
+             for partition in range(partitions)])]
+        stages["write"] = profile.finish(terms, sum(part["terms"] for part in parts), reduced_bytes,
+                                         sum(part["bytes"] for part in parts))
+
+    # parts of an earlier build with more partitions are not in the manifest
+    write_manifest(output_dir, parts, doc_count, corpus_stats(doc_count, token_count, terms))
+    shutil.copyfile(stopwords_path, os.path.join(output_dir, 'stop_words.txt'))
+    stats = {"documents": doc_count, "tokens": token_count, "terms": terms, "workers": workers,
+             "partitions": partitions, "runs": len(runs),
+             "intermediate_bytes": intermediate_bytes,
+             **{f"{name}_seconds": stage["seconds"] for name, stage in stages.items()},
+             "total_seconds": sum(stage["seconds"] for stage in stages.values()),
+             "stages": stages}
+    logger.info(f"Built index: {stats}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the inverted index with a process pool")
+    parser.add_argument('input', nargs='?', default='data.csv',
+                        help='doc_id,title,body CSV (default: data.csv)')
+    parser.add_argument('output_dir', nargs='?', default='data',
+                        help='Directory for part-0000N files (default: data)')
+    parser.add_argument('--stopwords', default=STOPWORDS_PATH)
+    parser.add_argument('-j', '--workers', type=int, default=None,
+                        help='Worker processes (default: CPU count)')
+    parser.add_argument('--partitions', type=int, default=3)
+    parser.add_argument('--chunk-size', type=int, default=1000,
+                        help='Documents per map task')
+    parser.add_argument('--memory-mb', type=int, default=1024,
+                        help='In-memory dictionary budget of all workers before '
+                             'spilling sorted runs to disk (default: 1024)')
+    parser.add_argument('--compress-intermediates', action='store_true',
+                        help='gzip-compress the runs passed between phases')
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        filename='index_performance.log',
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+    stats = build_index(args.input, args.output_dir, args.stopwords,
+                        args.partitions, args.workers, args.chunk_size,
+                        args.compress_intermediates, args.memory_mb)
+    print(f"Indexed {stats['documents']} documents, {stats['terms']} terms "
+          f"in {stats['total_seconds']:.2f}s with {stats['workers']} workers "
+          f"(map {stats['map_seconds']:.2f}s, reduce {stats['reduce_seconds']:.2f}s, "
+          f"write {stats['write_seconds']:.2f}s, {stats['runs']} runs, "
+          f"{stats['intermediate_bytes'] / 2**20:.1f} MiB intermediates)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Write manifest.json describing the part files of an inverted index.
+
+SearchIndex.load_index reads the part list from the manifest and checks
+each part's size and sha256 before using it, so any number of partitions
+can be built. build_index.py writes the manifest itself; for a Hadoop build,
+run this after copying the parts out of HDFS:
+
+    python3 inverted_index/manifest.py data/ --stats inverted_index/corpus_stats.json
+
+corpus_stats.json holds the document and token counts that map1 collects
+while tokenizing; the vocabulary size is the number of terms in the parts.
+"""
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime
+from typing import Dict, List, Optional
+
+MANIFEST = 'manifest.json'
+FORMAT_VERSION = 1
+
+
+def part_info(path: str) -> Dict:
+    """Term, posting and byte counts, largest doc_id and sha256 of a part file."""
+    digest = hashlib.sha256()
+    terms = postings = 0
+    max_doc_id = 0
+    with open(path, mode='rb') as file:
+        for line in file:
+            digest.update(line)
+            data = line.split()
+            if len(data) < 2:
+                continue
+            terms += 1
+            for i in range(2, len(data) - 2, 3):
+                postings += 1
+                max_doc_id = max(max_doc_id, int(data[i]))
+    return {"name": os.path.basename(path), "terms": terms, "postings": postings,
+            "bytes": os.path.getsize(path), "max_doc_id": max_doc_id,
+            "sha256": digest.hexdigest()}
+
+
+def corpus_stats(documents: int, tokens: int, vocabulary: int) -> Dict:
+    """Global corpus statistics recorded under the manifest's "stats"."""
+    return {"documents": documents, "tokens": tokens,
+            "avg_doc_length": tokens / documents if documents else 0.0,
+            "vocabulary_size": vocabulary}
+
+
+def write_manifest(index_dir: str, parts: List[Dict], documents: Optional[int] = None,
+                   stats: Optional[Dict] = None) -> Dict:
+    """
+    Write index_dir/manifest.json.
+
+    Args:
+        index_dir: Directory of the part files
+        parts: part_info() dicts in partition order
+        documents: Documents indexed, if known
+        stats: Extra corpus statistics to record
+
+    Returns:
+        The manifest
+    """
+    manifest = {
+        "format": FORMAT_VERSION,
+        "created": datetime.now().isoformat(),
+        "documents": documents,
+        "terms": sum(part["terms"] for part in parts),
+        "postings": sum(part["postings"] for part in parts),
+        "max_doc_id": max((part["max_doc_id"] for part in parts), default=0),
+        "partitions": parts,
+    }
+    if stats:
+        manifest["stats"] = stats
+
+    path = os.path.join(index_dir, MANIFEST)
+    with open(path + '.tmp', mode='w', encoding='utf-8') as file:
+        json.dump(manifest, file, indent=2)
+    os.replace(path + '.tmp', path)
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Describe an index's part files in manifest.json")
+    parser.add_argument('index_dir', nargs='?', default='data')
+    parser.add_argument('--documents', type=int, default=None,
+                        help='Documents indexed (e.g. from doc_count.txt)')
+    parser.add_argument('--stats', default=None,
+                        help='corpus_stats.json written by map1 or pipeline.sh')
+    args = parser.parse_args()
+
+    names = sorted(name for name in os.listdir(args.index_dir)
+                   if name.startswith('part-') and not name.endswith('.tmp'))
+    if not names:
+        parser.error(f"no part files in {args.index_dir}")
+    parts = [part_info(os.path.join(args.index_dir, name)) for name in names]
+    documents, stats = args.documents, None
+    if args.stats:
+        with open(args.stats, mode='r', encoding='utf-8') as file:
+            counts = json.load(file)
+        if documents is None:
+            documents = counts["documents"]
+        stats = corpus_stats(documents, counts["tokens"], sum(part["terms"] for part in parts))
+    manifest = write_manifest(args.index_dir, parts, documents, stats)
+    print(f"Wrote {os.path.join(args.index_dir, MANIFEST)}: {len(parts)} partitions, "
+          f"{manifest['terms']} terms, {manifest['postings']} postings")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 import sys
 import csv
-import re
+import json
+from collections import Counter
 import os
 import logging
 
@@ -15,42 +16,68 @@ logging.info(f"Starting {os.path.basename(__file__)}")
 
 sys.path.append(os.path.dirname(__file__))
 
+from util import load_stopwords, tokenize
+
 
 csv.field_size_limit(sys.maxsize)
 
+# Hadoop streaming sets this in every task's environment
+IN_HADOOP = 'mapreduce_task_id' in os.environ
+
+_stop_words = None
+
 def clean_text(text):
     """Prepares text for usage in an inverted index."""
-    # removes non alphanumerics and case sensitivity
-    text = re.sub (r"[^a-zA-Z0-9 ]+", "", text)
-    text = text.casefold()
-
-    # split text into list of whitespace-deliminated words
-    text = text.split()
+    # stop words are read once per task rather than once per document
+    global _stop_words
+    if _stop_words is None:
+        _stop_words = frozenset(load_stopwords("stopwords.txt"))
+    return tokenize(text, _stop_words)
 
-    with open("stopwords.txt", mode='r', encoding='utf-8') as file:
-        stop_words = [word.strip() for word in file]
+def write_corpus_counts(documents, tokens):
+    """
+    Side output of the pass: documents and tokens seen.
 
-    # remove stop words from body of text
-    # for word in text:
-    #     if word in stop_words:
-    #         text.remove(word)
-    word_list = [word for word in text if word not in stop_words]
-    return word_list
+    Under Hadoop each map task adds its counts to the job's "corpus"
+    counters, which pipeline.sh reads back into doc_count.txt and
+    corpus_stats.json once the job has finished. In a Unix pipeline map1
+    sees the whole corpus and writes the two files itself as it exits, each
+    renamed into place so it is never read half-written. They only exist
+    once map1 is done: stages running concurrently in the same pipe must
+    not rely on them, so the local pipe in pipeline.sh runs map1 to
+    completion before map2 (which reads doc_count.txt) starts.
+    """
+    if IN_HADOOP:
+        sys.stderr.write(f"reporter:counter:corpus,documents,{documents}\n"
+                         f"reporter:counter:corpus,tokens,{tokens}\n")
+        return
+    with open("doc_count.txt.tmp", "w") as f:
+        f.write(str(documents))
+    os.replace("doc_count.txt.tmp", "doc_count.txt")
+    with open("corpus_stats.json.tmp", "w") as f:
+        json.dump({"documents": documents, "tokens": tokens}, f)
+    os.replace("corpus_stats.json.tmp", "corpus_stats.json")
 
 def map1():
+    documents = tokens = 0
     # input format: DOC_ID, TITLE, BODY
     for row in csv.reader(sys.stdin):
-        # print(row, "\n")
         doc_id, title, body = row
-        
+
         # combine title and body
         body = body + " " + title
 
-        word_list = clean_text(body)
-        
-        for word in word_list:
-            print(f"{word} {doc_id}\t{1}")
-            
+        # in-mapper combining: one {WORD DOC_ID} line per distinct word of
+        # the document carrying its count, instead of one line per occurrence
+        words = clean_text(body)
+        counts = Counter(words)
+        sys.stdout.write(''.join(f"{word} {doc_id}\t{count}\n"
+                                 for word, count in counts.items()))
+        documents += 1
+        tokens += len(words)
+
+    write_corpus_counts(documents, tokens)
+
 
 if __name__ == "__main__":
     map1()
@@ -1,10 +1,16 @@
 #!/usr/bin/env python3
-"""Simple timing comparison between Unix pipes and Hadoop MapReduce with basic CPU monitoring."""
+"""Simple timing comparison between Unix pipes and Hadoop MapReduce with basic CPU monitoring.
+
+Total wall time only; ../index_benchmark.py profiles each stage.
+"""
 import subprocess
 import time
 import logging
 import psutil
 
+# GNU sort spills to temp files once its input outgrows memory; compress them
+SORT = "sort --compress-program=gzip"
+
 # Setup basic logging
 logging.basicConfig(
     filename='pipeline_timing.log',
@@ -37,33 +43,19 @@ def monitor_cpu_usage(process_name, start_time):
 def run_unix_pipeline():
     """Run the Unix pipeline and measure time."""
     try:
-        # Document count pipeline
-        logging.info("Starting document count pipeline")
-        start_time = time.time()
-        last_update = start_time
-        update_interval = 30  # 30 seconds between updates
-        
-        cmd = "cat ./input/data.csv | ./map0.py | sort | ./reduce0.py"
-        process = subprocess.Popen(cmd, shell=True)
-        
-        while process.poll() is None:
-            current_time = time.time()
-            if current_time - last_update >= update_interval:
-                monitor_cpu_usage("Document Count", start_time)
-                last_update = current_time
-            time.sleep(1)
-
-        if process.returncode != 0:
-            raise subprocess.CalledProcessError(process.returncode, cmd)
-        
-        # Main pipeline
+        # map1 also counts documents and tokens, so there is no separate
+        # counting pass over the corpus; it writes doc_count.txt as it exits,
+        # so it runs to completion before map2 reads the file
         logging.info("Starting main indexing pipeline")
         start_time = time.time()
         last_update = start_time
+        update_interval = 30  # 30 seconds between updates
         
-        cmd = ("cat ./input/data.csv | ./map1.py | sort | ./reduce1.py | "
-              "./map2.py | sort | ./reduce2.py | ./map3.py | sort | ./reduce3.py | "
-              "./map4.py | sort | ./reduce4.py | ./map5.py | sort | ./reduce5.py")
+        cmd = (f"cat ./input/data.csv | ./map1.py > map1.out && "
+               f"{SORT} map1.out | ./reduce1.py | "
+               f"./map2.py | {SORT} | ./reduce2.py | ./map3.py | {SORT} | ./reduce3.py | "
+               f"./map4.py | {SORT} | ./reduce4.py | ./map5.py | {SORT} | ./reduce5.py; "
+               f"status=$?; rm -f map1.out; exit $status")
         process = subprocess.Popen(cmd, shell=True)
         
         while process.poll() is None:
@@ -5,11 +5,16 @@ BASE_HDFS_PATH=
 # stop on errors
 set -Eeuo pipefail
 
-# run pipeline via bash commands (pipes)
-# cat ./input/data.csv | ./map0.py | sort | ./reduce0.py
-# cat ./input/data.csv | ./map1.py | sort | ./reduce1.py | ./map2.py | sort | ./reduce2.py | \
-#                        ./map3.py | sort | ./reduce3.py | ./map4.py | sort | ./reduce4.py | \
-#                        ./map5.py | sort | ./reduce5.py
+# run pipeline via bash commands (pipes); --compress-program compresses the
+# temp files sort spills to disk
+# SORT="sort --compress-program=gzip"
+# map1 also writes doc_count.txt and corpus_stats.json (documents, tokens),
+# but only as it exits; every stage of a pipe starts at once, so map1 runs to
+# completion first and map2 (which reads doc_count.txt) only starts after it
+# cat ./input/data.csv | ./map1.py > map1.out
+# $SORT map1.out | ./reduce1.py | ./map2.py | $SORT | ./reduce2.py | \
+#                  ./map3.py | $SORT | ./reduce3.py | ./map4.py | $SORT | ./reduce4.py | \
+#                  ./map5.py | $SORT | ./reduce5.py
 
 # # Hadoop pipeline program -> chaining MapReduce jobs
 # # mapred streaming -files {FILE1,FILE2...}\
@@ -33,45 +38,64 @@ set -Eeuo pipefail
 # jps - checks to see if processes are running
 # $ ./ pipeline.sh
 
+# Number of part-0000N files (reducers of the last job); the search app
+# finds them through the manifest written by manifest.py (with
+# --stats corpus_stats.json)
+PARTITIONS=${PARTITIONS:-3}
+
+# Compressed intermediates: map output (the shuffle) of every job, and the
+# output of jobs 1-4 that only feeds the next job. output5 stays plain text
+# for the search app. COMPRESS_INTERMEDIATES=false turns both off.
+COMPRESS=${COMPRESS_INTERMEDIATES:-true}
+CODEC=org.apache.hadoop.io.compress.DefaultCodec
+SHUFFLE_OPTS="-D mapreduce.map.output.compress=${COMPRESS} -D mapreduce.map.output.compress.codec=${CODEC}"
+OUTPUT_OPTS="-D mapreduce.output.fileoutputformat.compress=${COMPRESS} -D mapreduce.output.fileoutputformat.compress.codec=${CODEC}"
+
 # # rid of previous output directories
 rm -rf output output[0-9] || true
 
-hdfs dfs -rm -r /user/maspayne/inverted_index/output[0-5]
+hdfs dfs -rm -r /user/maspayne/inverted_index/output[1-5]
 
-hdfs dfs -put -f ./input/data.csv /user/maspayne/input/
+# INPUT_CSV overrides the corpus (index_benchmark.py passes its sample)
+hdfs dfs -put -f "${INPUT_CSV:-./input/data.csv}" /user/maspayne/input/data.csv
 
-mapred streaming -files map0.py,reduce0.py\
-    -input /${BASE_HDFS_PATH}/input \
-    -output ${BASE_HDFS_PATH}/inverted_index/output0 \
-    -mapper ./map0.py \
-    -reducer ./reduce0.py
-
-mapred streaming -files map1.py,reduce1.py,stopwords.txt\
+# map1 counts documents and tokens into the job's "corpus" counters while it
+# tokenizes, so the corpus is read once; the job id is taken from the log
+# to read them back
+JOB1_LOG=$(mktemp)
+mapred streaming ${SHUFFLE_OPTS} ${OUTPUT_OPTS} -files map1.py,reduce1.py,util.py,stopwords.txt\
     -input ${BASE_HDFS_PATH}/input \
     -output ${BASE_HDFS_PATH}/inverted_index/output1 \
     -mapper ./map1.py \
-    -reducer ./reduce1.py
+    -reducer ./reduce1.py 2>&1 | tee "${JOB1_LOG}"
+
+JOB1_ID=$(grep -o 'job_[0-9]*_[0-9]*' "${JOB1_LOG}" | head -n 1)
+rm -f "${JOB1_LOG}"
+DOCUMENTS=$(mapred job -counter "${JOB1_ID}" corpus documents)
+TOKENS=$(mapred job -counter "${JOB1_ID}" corpus tokens)
+echo -n "${DOCUMENTS}" > doc_count.txt
+echo "{\"documents\": ${DOCUMENTS}, \"tokens\": ${TOKENS}}" > corpus_stats.json
 
-mapred streaming -files map2.py,reduce2.py,doc_count.txt\
+mapred streaming ${SHUFFLE_OPTS} ${OUTPUT_OPTS} -files map2.py,reduce2.py,doc_count.txt\
     -input ${BASE_HDFS_PATH}/inverted_index/output1 \
     -output ${BASE_HDFS_PATH}/inverted_index/output2 \
     -mapper ./map2.py \
     -reducer ./reduce2.py
 
-mapred streaming -files map3.py,reduce3.py\
+mapred streaming ${SHUFFLE_OPTS} ${OUTPUT_OPTS} -files map3.py,reduce3.py\
     -input ${BASE_HDFS_PATH}/inverted_index/output2 \
     -output ${BASE_HDFS_PATH}/inverted_index/output3 \
     -mapper ./map3.py \
     -reducer ./reduce3.py
 
-mapred streaming -files map4.py,reduce4.py\
+mapred streaming ${SHUFFLE_OPTS} ${OUTPUT_OPTS} -files map4.py,reduce4.py\
     -input ${BASE_HDFS_PATH}/inverted_index/output3 \
     -output ${BASE_HDFS_PATH}/inverted_index/output4 \
     -mapper ./map4.py \
     -reducer ./reduce4.py
 
-mapred streaming -files map5.py,reduce5.py\
-    -D mapreduce.job.reduces=3 \
+mapred streaming ${SHUFFLE_OPTS} -files map5.py,reduce5.py\
+    -D mapreduce.job.reduces=${PARTITIONS} \
     -input ${BASE_HDFS_PATH}/inverted_index/output4 \
     -output ${BASE_HDFS_PATH}/inverted_index/output5 \
     -mapper ./map5.py \
@@ -0,0 +1,499 @@
+#!/usr/bin/env python3
+"""
+Incremental indexing into small immutable segments (LSM style).
+
+New articles (doc_id above the last indexed one) and the doc_ids that
+`wiki_scraper.py --refresh` lists in changed_docs.*.txt batch files are
+indexed into a new segment under <index>/segments/, next to the part files of the last full
+build; doc_ids that no longer exist become deletions. The search app polls
+the manifest and serves the base index and all segments together, with idf
+computed across them (wikipedia_search/search/segments.py).
+
+Segments are merged in the background once merge_factor adjacent segments
+of a similar size accumulate, dropping superseded postings. A full rebuild
+(`./bin/inverted_index build`) followed by `reset` starts over. Only one
+indexer process may write a segments directory at a time.
+
+    python inverted_index/segment_indexer.py update    # index what changed once
+    python inverted_index/segment_indexer.py watch     # keep indexing and merging
+    python inverted_index/segment_indexer.py merge     # merge all segments into one
+    python inverted_index/segment_indexer.py reset
+"""
+import argparse
+import glob
+import json
+import logging
+import math
+import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+sys.path.append(os.path.dirname(__file__))
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from util import load_stopwords, tokenize  # noqa: E402
+from database import decompress_content  # noqa: E402
+from near_duplicates import near_duplicate_ids  # noqa: E402
+
+STOPWORDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'stopwords.txt')
+MANIFEST = 'manifest.json'
+
+# Unreferenced segment files are kept this long so a server that read the
+# previous manifest can still load them
+GRACE_SECONDS = 60
+
+
+def _write_json(path, data):
+    with open(path + '.tmp', mode='w', encoding='utf-8') as file:
+        json.dump(data, file)
+    os.replace(path + '.tmp', path)
+
+
+def base_max_doc_id(index_dir: str) -> int:
+    """Largest doc_id in the part files of the last full build, 0 if none."""
+    manifest_path = os.path.join(index_dir, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, mode='r', encoding='utf-8') as file:
+            return json.load(file)["max_doc_id"]
+
+    max_doc_id = 0
+    for name in sorted(os.listdir(index_dir)) if os.path.isdir(index_dir) else []:
+        if not name.startswith('part-'):
+            continue
+        with open(os.path.join(index_dir, name), mode='r', encoding='utf-8') as file:
+            for line in file:
+                data = line.split()
+                for i in range(2, len(data) - 2, 3):
+                    max_doc_id = max(max_doc_id, int(data[i]))
+    return max_doc_id
+
+
+def base_frequencies(index_dir: str) -> Tuple[int, Dict[str, int]]:
+    """
+    Documents and per-word document frequencies of the last full build.
+
+    Returns:
+        (document count, word -> df), (0, {}) without part files
+    """
+    documents = None
+    manifest_path = os.path.join(index_dir, MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, mode='r', encoding='utf-8') as file:
+            documents = json.load(file).get("documents")
+
+    frequencies = Counter()
+    doc_ids = set()
+    for name in sorted(os.listdir(index_dir)) if os.path.isdir(index_dir) else []:
+        if not name.startswith('part-') or name.endswith('.tmp'):
+            continue
+        with open(os.path.join(index_dir, name), mode='r', encoding='utf-8') as file:
+            for line in file:
+                data = line.split()
+                if len(data) < 5:
+                    continue
+                # a word can span several parts of a document-partitioned build
+                frequencies[data[0]] += (len(data) - 2) // 3
+                if documents is None:
+                    doc_ids.update(data[2::3])
+    return (documents if documents is not None else len(doc_ids)), frequencies
+
+
+class SegmentWriter:
+    def __init__(self, index_dir: str, stopwords_path: str = STOPWORDS_PATH,
+                 merge_factor: int = 4):
+        """
+        Args:
+            index_dir: Directory of the part files; segments go in its
+                segments/ subdirectory
+            stopwords_path: Words left out of the index
+            merge_factor: Adjacent segments of one size tier merged at once
+        """
+        self.path = os.path.join(index_dir, 'segments')
+        self.merge_factor = merge_factor
+        self.stop_words = load_stopwords(stopwords_path)
+        self.logger = logging.getLogger(__name__)
+        self.index_dir = index_dir
+        self._base_frequencies = None  # read on the first add()
+        # guards the manifest against the background merge
+        self._lock = threading.Lock()
+
+        os.makedirs(self.path, exist_ok=True)
+        manifest_path = os.path.join(self.path, MANIFEST)
+        if os.path.exists(manifest_path):
+            with open(manifest_path, mode='r', encoding='utf-8') as file:
+                self.manifest = json.load(file)
+        else:
+            self.manifest = {"generation": 0, "next_segment": 1, "last_update": 0,
+                             "indexed_doc_id": base_max_doc_id(index_dir), "segments": []}
+
+    def _save_manifest(self):
+        self.manifest["generation"] += 1
+        _write_json(os.path.join(self.path, MANIFEST), self.manifest)
+
+    def _segment_name(self):
+        name = f'seg-{self.manifest["next_segment"]:06d}'
+        self.manifest["next_segment"] += 1
+        return name
+
+    def _write_segment(self, name: str, postings: Dict[str, Dict[int, int]],
+                       documents: Set[int], deleted: Set[int],
+                       norms: Dict[int, float]) -> dict:
+        with open(os.path.join(self.path, f'{name}.postings.tmp'), mode='w', encoding='utf-8') as file:
+            for word in sorted(postings):
+                entries = ' '.join(f"{doc_id} {tf}" for doc_id, tf in sorted(postings[word].items()))
+                file.write(f"{word} {entries}\n")
+        os.replace(os.path.join(self.path, f'{name}.postings.tmp'),
+                   os.path.join(self.path, f'{name}.postings'))
+        _write_json(os.path.join(self.path, f'{name}.json'),
+                    {"documents": sorted(documents), "deleted": sorted(deleted),
+                     "norms": {str(doc_id): norms[doc_id] for doc_id in sorted(documents)}})
+        return {"name": name, "documents": len(documents), "deleted": len(deleted),
+                "terms": len(postings), "created": time.time()}
+
+    def _read_segment(self, name: str) -> Tuple[Dict[str, Dict[int, int]], Set[int], Set[int],
+                                                Dict[int, float]]:
+        with open(os.path.join(self.path, f'{name}.json'), mode='r', encoding='utf-8') as file:
+            docs = json.load(file)
+        postings = {}
+        with open(os.path.join(self.path, f'{name}.postings'), mode='r', encoding='utf-8') as file:
+            for line in file:
+                data = line.split()
+                postings[data[0]] = {int(data[i]): int(data[i + 1])
+                                     for i in range(1, len(data) - 1, 2)}
+        norms = {int(doc_id): norm for doc_id, norm in docs.get("norms", {}).items()}
+        return postings, set(docs["documents"]), set(docs["deleted"]), norms
+
+    def _norms(self, postings: Dict[str, Dict[int, int]], documents: Set[int]) -> Dict[int, float]:
+        """
+        Squared tf-idf norm of each document, the norm_factor of the part
+        files. As there, idf is that of the build: the base index plus this
+        segment; the search app recomputes magnitudes with current idf.
+        """
+        if self._base_frequencies is None:
+            self._base_frequencies = base_frequencies(self.index_dir)
+        base_documents, frequencies = self._base_frequencies
+        total = base_documents + len(documents)
+        norms = dict.fromkeys(documents, 0.0)
+        for word, word_postings in postings.items():
+            idf = math.log10(total / min(frequencies.get(word, 0) + len(word_postings), total))
+            for doc_id, tf in word_postings.items():
+                norms[doc_id] += (tf * idf) ** 2
+        return norms
+
+    def add(self, documents: Iterable[Tuple[int, str, str]], deleted: Iterable[int] = (),
+            indexed_doc_id: Optional[int] = None) -> Optional[str]:
+        """
+        Index documents and deletions into a new segment.
+
+        Args:
+            documents: (doc_id, title, content) of new or changed articles
+            deleted: doc_ids to remove from the index
+            indexed_doc_id: New high-water mark of indexed doc_ids
+
+        Returns:
+            Name of the new segment, or None if there was nothing to index
+        """
+        postings = {}
+        doc_ids = set()
+        for doc_id, title, content in documents:
+            doc_ids.add(doc_id)
+            # combine title and body, as map1 does
+            for word, count in Counter(tokenize(content + " " + title, self.stop_words)).items():
+                postings.setdefault(word, {})[doc_id] = count
+        deleted = set(deleted) - doc_ids
+        if not doc_ids and not deleted:
+            return None
+
+        with self._lock:
+            name = self._segment_name()
+            self.manifest["last_update"] += 1
+            update_number = self.manifest["last_update"]
+        entry = self._write_segment(name, postings, doc_ids, deleted,
+                                    self._norms(postings, doc_ids))
+        entry["max_update"] = update_number
+
+        with self._lock:
+            self.manifest["segments"].append(entry)
+            if indexed_doc_id is not None:
+                self.manifest["indexed_doc_id"] = max(self.manifest["indexed_doc_id"], indexed_doc_id)
+            self._save_manifest()
+        self.logger.info(f"Wrote {name}: {len(doc_ids)} documents, {len(deleted)} deletions")
+        return name
+
+    def merge_candidates(self) -> Optional[List[dict]]:
+        """
+        First run of merge_factor adjacent segments in the same size tier
+        (log base merge_factor of the document count), or None.
+        """
+        with self._lock:
+            segments = list(self.manifest["segments"])
+
+        def tier(entry):
+            size = max(entry["documents"] + entry["deleted"], 1)
+            return int(math.log(size, self.merge_factor))
+
+        run = []
+        for entry in segments:
+            if run and tier(run[-1]) != tier(entry):
+                run = []
+            run.append(entry)
+            if len(run) == self.merge_factor:
+                return run
+        return None
+
+    def merge(self, entries: List[dict]) -> str:
+        """
+        Replace adjacent segments by one, keeping only the newest version of
+        each document. Deletions are kept since they can still supersede
+        documents in older segments or the base index.
+        """
+        names = [entry["name"] for entry in entries]
+        merged_postings = {}
+        owner = {}  # doc_id -> index of the newest segment mentioning it
+        segments = [self._read_segment(name) for name in names]
+        for position, (_, documents, deleted, _) in enumerate(segments):
+            for doc_id in documents | deleted:
+                owner[doc_id] = position
+
+        # documents the merged segments supersede in newer segments stay superseded
+        with self._lock:
+            current = [entry["name"] for entry in self.manifest["segments"]]
+        newer = set()
+        for name in current[current.index(names[-1]) + 1:]:
+            _, documents, deleted, _ = self._read_segment(name)
+            newer |= documents | deleted
+
+        merged_documents = set()
+        merged_deleted = set()
+        merged_norms = {}
+        for position, (postings, documents, deleted, norms) in enumerate(segments):
+            live = {doc_id for doc_id in documents
+                    if owner[doc_id] == position and doc_id not in newer}
+            merged_documents |= live
+            # segments written before norms were stored have none
+            merged_norms.update((doc_id, norms.get(doc_id, 0.0)) for doc_id in live)
+            merged_deleted |= {doc_id for doc_id in deleted
+                               if owner[doc_id] == position and doc_id not in newer}
+            for word, word_postings in postings.items():
+                for doc_id, tf in word_postings.items():
+                    if doc_id in live:
+                        merged_postings.setdefault(word, {})[doc_id] = tf
+
+        with self._lock:
+            name = self._segment_name()
+        entry = self._write_segment(name, merged_postings, merged_documents, merged_deleted,
+                                    merged_norms)
+        entry["max_update"] = max(e.get("max_update", 0) for e in entries)
+
+        with self._lock:
+            segments_list = self.manifest["segments"]
+            start = [e["name"] for e in segments_list].index(names[0])
+            assert [e["name"] for e in segments_list[start:start + len(names)]] == names
+            segments_list[start:start + len(names)] = [entry]
+            self._save_manifest()
+        self.logger.info(f"Merged {', '.join(names)} into {name}")
+        return name
+
+    def merge_all(self) -> Optional[str]:
+        with self._lock:
+            entries = list(self.manifest["segments"])
+        return self.merge(entries) if len(entries) > 1 else None
+
+    def reset(self, index_dir: str) -> None:
+        """
+        Drop all segments, e.g. after a full rebuild. Counters keep
+        increasing so running servers notice the change.
+        """
+        with self._lock:
+            self.manifest["segments"] = []
+            self.manifest["indexed_doc_id"] = base_max_doc_id(index_dir)
+            self._save_manifest()
+        self._base_frequencies = None
+        self.remove_unreferenced(grace_seconds=0)
+
+    def remove_unreferenced(self, grace_seconds: float = GRACE_SECONDS) -> None:
+        """Delete segment files no longer in the manifest once they are old enough."""
+        with self._lock:
+            referenced = {entry["name"] for entry in self.manifest["segments"]}
+        now = time.time()
+        for entry in os.scandir(self.path):
+            name = entry.name.split('.')[0]
+            if (name.startswith('seg-') and name not in referenced
+                    and now - entry.stat().st_mtime > grace_seconds):
+                os.remove(entry.path)
+
+
+def changed_batches(changed_path: str) -> List[str]:
+    """
+    Batch files of changed doc_ids waiting to be indexed.
+
+    wiki_scraper.py --refresh renames each batch into place complete
+    (<stem>.<time>-<pid>-<n><ext> for changed_path <stem><ext>), so every
+    listed file can be read in full and deleted once indexed. A plain
+    changed_path left by an older scraper is included too.
+    """
+    stem, ext = os.path.splitext(changed_path)
+    batches = sorted(path for path in glob.glob(f"{glob.escape(stem)}.*{ext}")
+                     if not path.endswith('.tmp'))
+    if os.path.exists(changed_path):
+        batches.append(changed_path)
+    return batches
+
+
+def read_changed(batches: Iterable[str]) -> Set[int]:
+    """doc_ids listed in the batch files."""
+    changed = set()
+    for path in batches:
+        with open(path, mode='r', encoding='utf-8') as file:
+            changed.update(int(line) for line in file if line.strip())
+    return changed
+
+
+def pending_changes(conn: sqlite3.Connection, indexed_doc_id: int,
+                    changed: Iterable[int] = (), batch_size: int = 1000,
+                    skip_near_duplicates: bool = False):
+    """
+    Articles to (re)index and doc_ids to delete.
+
+    Args:
+        conn: Article database
+        indexed_doc_id: Articles above this doc_id are new
+        changed: doc_ids of rewritten articles
+        skip_near_duplicates: Leave out articles in duplicate_clusters (all
+            but the first of each cluster); rewritten ones become deletions
+            so their earlier version leaves the index too
+
+    Returns:
+        (list of (doc_id, title, content), deleted doc_ids, highest doc_id)
+    """
+    changed = set(changed)
+    skipped = near_duplicate_ids(conn) if skip_near_duplicates else set()
+
+    documents = []
+    max_doc_id = indexed_doc_id
+    for doc_id, title, content in conn.execute(
+            "SELECT d.doc_id, d.title, c.content FROM documents d "
+            "JOIN document_content c ON c.doc_id = d.doc_id "
+            "WHERE d.doc_id > ? ORDER BY d.doc_id", (indexed_doc_id,)):
+        max_doc_id = max(max_doc_id, doc_id)
+        changed.discard(doc_id)
+        if doc_id not in skipped:
+            documents.append((doc_id, title, decompress_content(content)))
+
+    changed = sorted(changed)
+    found = set()
+    for i in range(0, len(changed), batch_size):
+        batch = changed[i:i + batch_size]
+        placeholders = ','.join('?' * len(batch))
+        for doc_id, title, content in conn.execute(
+                f"SELECT d.doc_id, d.title, c.content FROM documents d "
+                f"JOIN document_content c ON c.doc_id = d.doc_id "
+                f"WHERE d.doc_id IN ({placeholders})", batch):
+            if doc_id in skipped:
+                continue
+            documents.append((doc_id, title, decompress_content(content)))
+            found.add(doc_id)
+    return documents, set(changed) - found, max_doc_id
+
+
+def update(writer: SegmentWriter, database_path: str,
+           changed_path: Optional[str] = 'changed_docs.txt',
+           skip_near_duplicates: bool = False) -> Optional[str]:
+    """Index new and changed articles into one segment."""
+    # batches written from here on are left for the next update
+    batches = changed_batches(changed_path) if changed_path else []
+    conn = sqlite3.connect(database_path, timeout=30)
+    try:
+        documents, deleted, max_doc_id = pending_changes(
+            conn, writer.manifest["indexed_doc_id"], read_changed(batches),
+            skip_near_duplicates=skip_near_duplicates)
+    finally:
+        conn.close()
+
+    name = writer.add(documents, deleted, indexed_doc_id=max_doc_id)
+    for path in batches:
+        os.remove(path)
+    return name
+
+
+def watch(writer: SegmentWriter, database_path: str, changed_path: Optional[str],
+          interval: float = 2.0, skip_near_duplicates: bool = False) -> None:
+    """Index changes every interval seconds, merging in a background thread."""
+    wake_merger = threading.Event()
+
+    def merge_loop():
+        while True:
+            wake_merger.wait()
+            wake_merger.clear()
+            try:
+                while True:
+                    entries = writer.merge_candidates()
+                    if entries is None:
+                        break
+                    writer.merge(entries)
+                writer.remove_unreferenced()
+            except Exception as e:
+                writer.logger.error(f"Segment merge failed: {str(e)}")
+
+    threading.Thread(target=merge_loop, name='segment-merger', daemon=True).start()
+    print(f"Watching {database_path} every {interval}s (Ctrl+C to stop)")
+    while True:
+        try:
+            name = update(writer, database_path, changed_path, skip_near_duplicates)
+            if name:
+                print(f"Indexed {name}")
+                wake_merger.set()
+        except Exception as e:
+            # unindexed batches stay on disk for the next attempt
+            writer.logger.error(f"Segment update failed: {str(e)}")
+            print(f"Segment update failed: {e}")
+        time.sleep(interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incremental index segments")
+    parser.add_argument('command', choices=['update', 'watch', 'merge', 'reset'])
+    parser.add_argument('--db', default='./var/wiki.sqlite3')
+    parser.add_argument('--index', default='data',
+                        help='Directory of the part files (default: data)')
+    parser.add_argument('--changed-docs', default='changed_docs.txt',
+                        help='Name of the changed doc_id batch files a refresh crawl '
+                             'writes; batches are deleted once indexed')
+    parser.add_argument('--interval', type=float, default=2.0)
+    parser.add_argument('--skip-near-duplicates', action='store_true',
+                        help='update/watch: leave out near-duplicate articles')
+    parser.add_argument('--merge-factor', type=int, default=4)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        filename='index_performance.log',
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
+
+    writer = SegmentWriter(args.index, merge_factor=args.merge_factor)
+    if args.command == 'reset':
+        writer.reset(args.index)
+        print(f"Removed all segments, indexing resumes after doc_id "
+              f"{writer.manifest['indexed_doc_id']}")
+    elif args.command == 'update':
+        name = update(writer, args.db, args.changed_docs, args.skip_near_duplicates)
+        print(f"Indexed {name}" if name else "Nothing to index")
+    elif args.command == 'merge':
+        name = writer.merge_all()
+        writer.remove_unreferenced(grace_seconds=0)
+        print(f"Merged into {name}" if name else "Nothing to merge")
+    else:
+        try:
+            watch(writer, args.db, args.changed_docs, args.interval,
+                  args.skip_near_duplicates)
+        except KeyboardInterrupt:
+            print("Stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,20 @@
 import itertools
+import re
+
+_NON_ALPHANUMERIC = re.compile(r"[^a-zA-Z0-9 ]+")
+
 
 def keyfunc(line):
-    return line.partition('\t')[0]
\ No newline at end of file
+    return line.partition('\t')[0]
+
+
+def load_stopwords(path):
+    with open(path, mode='r', encoding='utf-8') as file:
+        return {word.strip() for word in file}
+
+
+def tokenize(text, stop_words):
+    """Words of text for the inverted index, as in map1.clean_text."""
+    # removes non alphanumerics and case sensitivity
+    text = _NON_ALPHANUMERIC.sub("", text).casefold()
+    return [word for word in text.split() if word not in stop_words]
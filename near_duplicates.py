@@ -0,0 +1,318 @@
+"""
+Near-duplicate article detection with MinHash and LSH banding.
+
+Each article is reduced to a MinHash signature over its word shingles;
+the fraction of equal signature slots estimates the Jaccard similarity of
+two articles. Signatures are split into bands and every band is hashed into
+a bucket, so only articles sharing a bucket are compared. An article whose
+estimated similarity to an earlier one reaches the threshold joins that
+article's cluster in the duplicate_clusters table (sql/near_duplicates.sql).
+
+The scraper's ArticleWriter checks articles as they are stored. Existing
+databases can be (re)processed with:
+
+    python near_duplicates.py rebuild --threshold 0.8
+"""
+import hashlib
+import logging
+import os
+import sqlite3
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+SQL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql')
+
+MASK64 = (1 << 64) - 1
+EMPTY = MASK64
+
+
+def _hash64(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), 'little')
+
+
+def lsh_params(threshold: float, num_perm: int,
+               false_negative_weight: float = 0.9) -> Tuple[int, int]:
+    """
+    Bands and rows per band whose S-curve best separates pairs above and
+    below threshold.
+
+    Candidates are verified against their full signatures, so a false
+    positive only costs a comparison while a false negative loses a
+    duplicate; misses are weighted accordingly.
+    """
+    def probability(s, bands, rows):
+        return 1 - (1 - s ** rows) ** bands
+
+    def area(f, low, high, steps=100):
+        width = (high - low) / steps
+        return sum(f(low + (i + 0.5) * width) for i in range(steps)) * width
+
+    best, best_error = (1, num_perm), float('inf')
+    for bands in range(1, num_perm + 1):
+        rows = num_perm // bands
+        false_positive = area(lambda s: probability(s, bands, rows), 0.0, threshold)
+        false_negative = area(lambda s: 1 - probability(s, bands, rows), threshold, 1.0)
+        error = ((1 - false_negative_weight) * false_positive
+                 + false_negative_weight * false_negative)
+        if error < best_error:
+            best, best_error = (bands, rows), error
+    return best
+
+
+class MinHasher:
+    """
+    One-permutation MinHash: each shingle is hashed once and kept as the
+    minimum of one of num_perm bins, with empty bins filled from the next
+    non-empty one (rotation densification). Linear in the article length
+    instead of num_perm hashes per shingle.
+    """
+    def __init__(self, num_perm: int = 128, shingle_size: int = 5):
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        # room for the bin offset added by densification
+        self._offset = 1 << (64 - num_perm.bit_length() - 1)
+
+    def shingles(self, text: str) -> set:
+        words = text.casefold().split()
+        size = self.shingle_size
+        if len(words) <= size:
+            return {' '.join(words)} if words else set()
+        return {' '.join(words[i:i + size]) for i in range(len(words) - size + 1)}
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        num_perm = self.num_perm
+        bins = [EMPTY] * num_perm
+        for shingle in self.shingles(text):
+            value = _hash64(shingle.encode('utf-8'))
+            slot = value % num_perm
+            value = (value // num_perm) % self._offset
+            if value < bins[slot]:
+                bins[slot] = value
+
+        if all(value == EMPTY for value in bins):
+            return tuple(bins)
+
+        signature = list(bins)
+        for i, value in enumerate(bins):
+            if value != EMPTY:
+                continue
+            distance = 1
+            while bins[(i + distance) % num_perm] == EMPTY:
+                distance += 1
+            signature[i] = (bins[(i + distance) % num_perm] + distance * self._offset) & MASK64
+        return tuple(signature)
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> float:
+    """Estimated Jaccard similarity of two signatures."""
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+class NearDuplicateIndex:
+    def __init__(self, conn: sqlite3.Connection, threshold: float = 0.8,
+                 num_perm: int = 128, shingle_size: int = 5):
+        """
+        Args:
+            conn: Connection to wiki.sqlite3; callers own its transactions
+            threshold: Estimated Jaccard similarity at which an article is
+                counted as a near-duplicate
+            num_perm: Signature length
+            shingle_size: Words per shingle
+        """
+        self.conn = conn
+        self.threshold = threshold
+        self.hasher = MinHasher(num_perm, shingle_size)
+        self.bands, self.rows = lsh_params(threshold, num_perm)
+        self.logger = logging.getLogger(__name__)
+
+        with open(os.path.join(SQL_DIR, 'near_duplicates.sql'), mode='r', encoding='utf-8') as file:
+            conn.executescript(file.read())
+        self._check_params()
+
+    def _params(self) -> Dict[str, str]:
+        return {"num_perm": str(self.hasher.num_perm),
+                "shingle_size": str(self.hasher.shingle_size),
+                "bands": str(self.bands), "rows": str(self.rows)}
+
+    def _check_params(self) -> None:
+        stored = dict(self.conn.execute("SELECT key, value FROM minhash_meta"))
+        params = self._params()
+        if not stored:
+            with self.conn:
+                self.conn.executemany("INSERT INTO minhash_meta (key, value) VALUES (?, ?)",
+                                      params.items())
+        elif stored != params:
+            raise ValueError(
+                f"near-duplicate index was built with {stored}, not {params}; "
+                "run `python near_duplicates.py rebuild` to change parameters"
+            )
+
+    def signature(self, text: str) -> Tuple[int, ...]:
+        return self.hasher.signature(text)
+
+    def _buckets(self, signature: Sequence[int]) -> List[int]:
+        rows = self.rows
+        buckets = []
+        for band in range(self.bands):
+            values = array('Q', signature[band * rows:(band + 1) * rows]).tobytes()
+            # signed so it fits an SQLite INTEGER
+            bucket = _hash64(band.to_bytes(2, 'little') + values)
+            buckets.append(bucket - (1 << 64) if bucket >= 1 << 63 else bucket)
+        return buckets
+
+    def add_many(self, items: Iterable[Tuple[int, Sequence[int]]]) -> Dict[int, Tuple[int, float]]:
+        """
+        Store signatures and cluster near-duplicates, in doc_id order.
+
+        Runs inside the caller's transaction. Items are also compared with
+        earlier items of the same call.
+
+        Args:
+            items: (doc_id, signature) pairs of new documents
+
+        Returns:
+            doc_id -> (cluster_id, similarity) for the near-duplicates found
+        """
+        items = sorted(items)
+        if not items:
+            return {}
+
+        item_buckets = {doc_id: self._buckets(signature) for doc_id, signature in items}
+        all_buckets = sorted({bucket for buckets in item_buckets.values() for bucket in buckets})
+        stored = {}  # bucket -> doc_ids already in the table
+        for start in range(0, len(all_buckets), 500):
+            chunk = all_buckets[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for bucket, doc_id in self.conn.execute(
+                    f"SELECT bucket, doc_id FROM minhash_buckets WHERE bucket IN ({placeholders})",
+                    chunk):
+                stored.setdefault(bucket, []).append(doc_id)
+
+        candidates = {doc_id: set() for doc_id, _ in items}
+        for doc_id, buckets in item_buckets.items():
+            for bucket in buckets:
+                candidates[doc_id].update(stored.get(bucket, ()))
+        signatures = self._load_signatures({c for ids in candidates.values() for c in ids})
+        clusters = self._load_clusters(set(signatures))
+
+        seen_buckets = {}  # bucket -> earlier doc_ids of this call
+        duplicates = {}
+        for doc_id, signature in items:
+            for bucket in item_buckets[doc_id]:
+                candidates[doc_id].update(seen_buckets.get(bucket, ()))
+
+            best = None
+            for candidate in candidates[doc_id]:
+                if candidate == doc_id:
+                    continue
+                score = similarity(signature, signatures[candidate])
+                if score >= self.threshold and (best is None or score > best[1]):
+                    best = (candidate, score)
+            if best is not None:
+                cluster_id = clusters.get(best[0], best[0])
+                duplicates[doc_id] = (cluster_id, best[1])
+                clusters[doc_id] = cluster_id
+
+            signatures[doc_id] = signature
+            for bucket in item_buckets[doc_id]:
+                seen_buckets.setdefault(bucket, []).append(doc_id)
+
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO document_minhash (doc_id, signature) VALUES (?, ?)",
+            ((doc_id, array('Q', signature).tobytes()) for doc_id, signature in items)
+        )
+        self.conn.executemany(
+            "INSERT INTO minhash_buckets (bucket, doc_id) VALUES (?, ?)",
+            ((bucket, doc_id) for doc_id, buckets in item_buckets.items() for bucket in buckets)
+        )
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO duplicate_clusters (doc_id, cluster_id, similarity) "
+            "VALUES (?, ?, ?)",
+            ((doc_id, cluster_id, score) for doc_id, (cluster_id, score) in duplicates.items())
+        )
+        return duplicates
+
+    def _load_signatures(self, doc_ids) -> Dict[int, Tuple[int, ...]]:
+        doc_ids = sorted(doc_ids)
+        signatures = {}
+        for start in range(0, len(doc_ids), 500):
+            chunk = doc_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            for doc_id, blob in self.conn.execute(
+                    f"SELECT doc_id, signature FROM document_minhash WHERE doc_id IN ({placeholders})",
+                    chunk):
+                signatures[doc_id] = tuple(array('Q', blob))
+        return signatures
+
+    def _load_clusters(self, doc_ids) -> Dict[int, int]:
+        doc_ids = sorted(doc_ids)
+        clusters = {}
+        for start in range(0, len(doc_ids), 500):
+            chunk = doc_ids[start:start + 500]
+            placeholders = ','.join('?' * len(chunk))
+            clusters.update(self.conn.execute(
+                f"SELECT doc_id, cluster_id FROM duplicate_clusters WHERE doc_id IN ({placeholders})",
+                chunk))
+        return clusters
+
+
+def near_duplicate_ids(conn: sqlite3.Connection) -> set:
+    """doc_ids of non-canonical cluster members, empty if never computed."""
+    try:
+        return {row[0] for row in conn.execute("SELECT doc_id FROM duplicate_clusters")}
+    except sqlite3.OperationalError:
+        return set()
+
+
+def rebuild(database_path: str = './var/wiki.sqlite3', threshold: float = 0.8,
+            num_perm: int = 128, shingle_size: int = 5, batch_size: int = 500) -> Dict[str, int]:
+    """
+    Recompute signatures and clusters for every stored article.
+
+    Returns:
+        Counts of documents and near-duplicates
+    """
+    from database import decompress_content
+
+    conn = sqlite3.connect(database_path)
+    try:
+        conn.executescript(
+            "DROP TABLE IF EXISTS minhash_meta; DROP TABLE IF EXISTS document_minhash;"
+            "DROP TABLE IF EXISTS minhash_buckets; DROP TABLE IF EXISTS duplicate_clusters;"
+        )
+        index = NearDuplicateIndex(conn, threshold, num_perm, shingle_size)
+        read_cur = conn.cursor()
+        read_cur.execute(
+            "SELECT d.doc_id, d.title, c.content FROM documents d "
+            "JOIN document_content c ON c.doc_id = d.doc_id ORDER BY d.doc_id"
+        )
+        documents = duplicates = 0
+        while True:
+            rows = read_cur.fetchmany(batch_size)
+            if not rows:
+                break
+            items = [(doc_id, index.signature(decompress_content(content)))
+                     for doc_id, _, content in rows]
+            with conn:
+                duplicates += len(index.add_many(items))
+            documents += len(rows)
+        return {"documents": documents, "near_duplicates": duplicates,
+                "bands": index.bands, "rows": index.rows}
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Near-duplicate article detection")
+    parser.add_argument('command', choices=['rebuild'])
+    parser.add_argument('--db', default='./var/wiki.sqlite3')
+    parser.add_argument('--threshold', type=float, default=0.8)
+    parser.add_argument('--num-perm', type=int, default=128)
+    parser.add_argument('--shingle-size', type=int, default=5)
+    args = parser.parse_args()
+
+    result = rebuild(args.db, args.threshold, args.num_perm, args.shingle_size)
+    print(f"Processed {result['documents']} documents: {result['near_duplicates']} "
+          f"near-duplicates ({result['bands']} bands x {result['rows']} rows)")
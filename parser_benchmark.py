@@ -0,0 +1,124 @@
+"""Micro-benchmark of article parsing, in pages per CPU-second.
+
+Runs wiki_parser.parse_article with each available parser backend, and the
+old approach (full html.parser tree, then separate lookups of the heading,
+text and links) as a baseline. Point it at a directory of saved pages,
+
+    curl -s https://en.wikipedia.org/wiki/Dune_\\(novel\\) -o pages/dune.html
+    python parser_benchmark.py pages/
+
+or omit the directory to use the canned pages from scraper_benchmark.py.
+"""
+import argparse
+import glob
+import json
+import os
+import re
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List
+
+from bs4 import BeautifulSoup
+
+import wiki_parser
+
+
+def full_tree_parse(html):
+    """Baseline: whole-document tree and three independent passes."""
+    soup = BeautifulSoup(html, 'html.parser')
+    heading = soup.find(id='firstHeading')
+    if not heading or not heading.get_text():
+        return None
+
+    body = soup.find(id='bodyContent')
+    pattern = re.compile(r'\[[^\]]*\]')
+    text = [' '.join(pattern.sub('', tag.get_text()).split())
+            for tag in body.find_all(['p', 'h2', 'h3'])] if body else []
+    content = ' '.join(block for block in text if block)
+
+    body = soup.find(id='bodyContent')
+    links = [a['href'] for a in body.find_all('a', href=True)
+             if wiki_parser._article_link(a['href'])] if body else []
+    return heading.get_text(), content, content[:250], links
+
+
+def load_pages(pages_dir: str = None) -> List[bytes]:
+    if pages_dir is None:
+        from scraper_benchmark import render_page
+        return [render_page(i, 200) for i in range(200)]
+
+    pages = []
+    for path in sorted(glob.glob(os.path.join(pages_dir, '*.htm*'))):
+        with open(path, mode='rb') as file:
+            pages.append(file.read())
+    return pages
+
+
+def measure(parse: Callable, pages: List[bytes], repeat: int) -> Dict[str, Any]:
+    """Parse every page repeat times, timing CPU rather than wall time."""
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for _ in range(repeat):
+        for page in pages:
+            parse(page)
+    cpu_time = time.process_time() - cpu_start
+    wall_time = time.perf_counter() - wall_start
+
+    parsed = len(pages) * repeat
+    return {
+        "pages": parsed,
+        "cpu_seconds": cpu_time,
+        "pages_per_cpu_second": parsed / cpu_time if cpu_time else 0.0,
+        "ms_per_page": cpu_time * 1000 / parsed if parsed else 0.0,
+        "wall_seconds": wall_time
+    }
+
+
+def available_parsers() -> List[str]:
+    parsers = ['html.parser']
+    try:
+        import lxml  # noqa: F401
+        parsers.append('lxml')
+    except ImportError:
+        pass
+    return parsers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('pages_dir', nargs='?', help='Directory of saved .html pages')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    pages = load_pages(args.pages_dir)
+    if not pages:
+        parser.error(f"no .html pages in {args.pages_dir}")
+
+    candidates = {'full_tree (html.parser)': full_tree_parse}
+    for backend in available_parsers():
+        candidates[f'targeted ({backend})'] = \
+            lambda page, backend=backend: wiki_parser.parse_article(page, backend)
+
+    report = {
+        "test_info": {
+            "pages": len(pages),
+            "bytes": sum(len(page) for page in pages),
+            "repeat": args.repeat,
+            "source": args.pages_dir or "canned",
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+    for name, parse in candidates.items():
+        report[name] = measure(parse, pages, args.repeat)
+        print(f"{name:<26} {report[name]['pages_per_cpu_second']:8.1f} pages/cpu-sec "
+              f"({report[name]['ms_per_page']:.2f} ms/page)")
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f'parser_benchmark_{timestamp}.json'
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved to {filename}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,366 @@
+"""Measure crawler throughput against a local stand-in for Wikipedia.
+
+A separate process serves generated wiki pages (firstHeading, bodyContent,
+paragraphs and /wiki/ links) over keep-alive HTTP/1.1 with a simulated
+network latency, so crawls are repeatable and never touch the real site.
+Each crawler runs in a fresh temporary working directory with its own
+var/wiki.sqlite3 and data.csv:
+
+    python scraper_benchmark.py --pages 500 --latency-ms 50
+    python scraper_benchmark.py --modes refresh    # conditional re-crawl
+"""
+import argparse
+import glob
+import json
+import logging
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime
+from email.utils import formatdate, parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict
+
+logging.basicConfig(
+    filename='scraper_benchmark.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+SCHEMA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'sql', 'schema.sql')
+SERVER_EPOCH = 1700000000  # Last-Modified of unrevised pages
+WORDS = ("sand spice desert planet empire house guild novel water worm "
+         "history science ocean river mountain language music city").split()
+
+
+def page_name(i: int) -> str:
+    return f"Page_{i}"
+
+
+def render_page(i: int, num_pages: int, links_per_page: int = 20,
+                paragraphs: int = 8, nav_links: int = 100,
+                revision: int = 0, chrome_revision: int = 0) -> bytes:
+    """
+    Canned article with the same structure the scraper parses.
+
+    revision changes the article text, chrome_revision only the markup
+    outside it (the page changes, the extracted text does not).
+    """
+    rng = random.Random(i)
+    links = [f'<a href="/wiki/{page_name(rng.randrange(num_pages))}">link</a>'
+             for _ in range(links_per_page)]
+    # links the scraper has to skip
+    links.append('<a href="/wiki/File:Example.jpg">file</a>')
+    links.append('<a href="/wiki/Category:Examples">category</a>')
+    body = []
+    for p in range(paragraphs):
+        words = ' '.join(rng.choice(WORDS) for _ in range(80))
+        body.append(f"<p>{words}[{p + 1}] {links[p % len(links)]}</p>")
+    if revision:
+        body.append(f"<p>Revised {revision} times.</p>")
+    body.append(f"<h2>See also</h2><ul>{''.join(f'<li>{link}</li>' for link in links)}</ul>")
+    # page chrome outside the article, as on the real site
+    navigation = ''.join(f'<li><a href="/wiki/Special:Nav_{n}">Navigation {n}</a></li>'
+                         for n in range(nav_links))
+    navigation += f'<li>Skin {chrome_revision}</li>'
+    return (f'<html><head><title>{page_name(i)}</title>'
+            f'<script>{"var config = {};" * 200}</script></head><body>'
+            f'<div id="mw-navigation"><ul>{navigation}</ul></div>'
+            f'<h1 id="firstHeading">{page_name(i).replace("_", " ")}</h1>'
+            f'<div id="bodyContent">{"".join(body)}</div>'
+            f'<div id="footer"><ul>{navigation}</ul></div>'
+            f'</body></html>').encode('utf-8')
+
+
+def _serve(port_conn, num_pages: int, latency: float) -> None:
+    """
+    Child process: serve the canned pages until terminated.
+
+    Pages carry ETag and Last-Modified and conditional requests get 304s.
+    GET /__edit/<page> changes a page's text and /__touch/<page> only its
+    markup; /__stats returns request counters.
+    """
+    paths = {f"/wiki/{page_name(i)}": i for i in range(num_pages)}
+    revisions = {i: [0, 0] for i in range(num_pages)}  # text, chrome
+    pages = {i: render_page(i, num_pages) for i in range(num_pages)}
+    counters = {"requests": 0, "connections": 0, "not_modified": 0}
+    lock = threading.Lock()
+
+    def validators(i):
+        revision, chrome_revision = revisions[i]
+        modified = SERVER_EPOCH + revision * 86400 + chrome_revision * 3600
+        return f'"{i}-{revision}-{chrome_revision}"', formatdate(modified, usegmt=True)
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive
+
+        def setup(self):
+            super().setup()
+            with lock:
+                counters["connections"] += 1
+
+        def do_GET(self):
+            if self.path == '/__stats':
+                return self._send(200, json.dumps(counters).encode('utf-8'))
+            if self.path.startswith(('/__edit/', '/__touch/')):
+                return self._revise()
+
+            with lock:
+                counters["requests"] += 1
+            if latency:
+                time.sleep(latency)
+            i = paths.get(self.path)
+            if i is None:
+                return self._send(404, b'not found')
+
+            with lock:
+                page = pages[i]
+                etag, last_modified = validators(i)
+            headers = {'ETag': etag, 'Last-Modified': last_modified}
+            if self._not_modified(etag, last_modified):
+                with lock:
+                    counters["not_modified"] += 1
+                return self._send(304, b'', headers)
+            self._send(200, page, headers)
+
+        def _not_modified(self, etag, last_modified) -> bool:
+            if_none_match = self.headers.get('If-None-Match')
+            if if_none_match is not None:
+                return etag in [tag.strip() for tag in if_none_match.split(',')]
+            if_modified_since = self.headers.get('If-Modified-Since')
+            if if_modified_since is not None:
+                return (parsedate_to_datetime(last_modified)
+                        <= parsedate_to_datetime(if_modified_since))
+            return False
+
+        def _revise(self):
+            _, action, name = self.path.split('/', 2)
+            i = paths.get(f"/wiki/{name}")
+            if i is None:
+                return self._send(404, b'not found')
+            with lock:
+                revisions[i][0 if action == '__edit' else 1] += 1
+                revision, chrome_revision = revisions[i]
+                pages[i] = render_page(i, num_pages, revision=revision,
+                                       chrome_revision=chrome_revision)
+            self._send(200, b'ok')
+
+        def _send(self, status: int, body: bytes, headers: Dict[str, str] = None):
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            if status != 304:
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+
+        def handle_error(self, request, client_address):
+            # interrupted crawls drop their connections mid-request
+            pass
+
+    server = Server(('127.0.0.1', 0), Handler)
+    port_conn.send(server.server_address[1])
+    port_conn.close()
+    server.serve_forever()
+
+
+@contextmanager
+def stand_in_server(num_pages: int, latency: float):
+    """Start the page server in its own process and yield its base URL."""
+    parent_conn, child_conn = multiprocessing.Pipe(duplex=False)
+    process = multiprocessing.Process(target=_serve, args=(child_conn, num_pages, latency),
+                                      daemon=True)
+    process.start()
+    try:
+        yield f"http://127.0.0.1:{parent_conn.recv()}"
+    finally:
+        process.terminate()
+        process.join()
+
+
+def _server_stats(base_url: str) -> Dict[str, int]:
+    import requests
+    return requests.get(f"{base_url}/__stats").json()
+
+
+@contextmanager
+def scratch_workdir():
+    """Temporary cwd holding a fresh var/wiki.sqlite3, removed afterwards."""
+    previous = os.getcwd()
+    workdir = tempfile.mkdtemp(prefix='scraper_benchmark_')
+    os.makedirs(os.path.join(workdir, 'var'))
+    conn = sqlite3.connect(os.path.join(workdir, 'var', 'wiki.sqlite3'))
+    with open(SCHEMA_PATH, mode='r') as file:
+        conn.executescript(file.read())
+    conn.close()
+    os.chdir(workdir)
+    try:
+        yield workdir
+    finally:
+        os.chdir(previous)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def run_crawler(mode: str, base_url: str, num_pages: int, workers: int,
+                request_interval: float) -> Dict[str, Any]:
+    """Crawl the whole stand-in site with one crawler and time it."""
+    from wiki_scraper import WikiScraper
+
+    before = _server_stats(base_url)
+    with scratch_workdir():
+        if mode == 'async':
+            from async_scraper import AsyncWikiScraper
+            scraper = AsyncWikiScraper('./var/wiki.sqlite3', concurrency=workers,
+                                       base_url=base_url, request_interval=request_interval)
+        else:
+            scraper = WikiScraper('./var/wiki.sqlite3', max_workers=workers,
+                                  base_url=base_url, request_interval=request_interval)
+
+        logging.info(f"Crawling {num_pages} pages with {mode} crawler ({workers} workers)")
+        start_time = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            scraper.scrape_wikipedia(f"/wiki/{page_name(0)}")
+        elapsed = time.perf_counter() - start_time
+
+        with sqlite3.connect(os.path.join('var', 'wiki.sqlite3')) as conn:
+            stored = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            orphans = conn.execute(
+                "SELECT COUNT(*) FROM documents d LEFT JOIN document_content c "
+                "ON d.doc_id = c.doc_id WHERE c.doc_id IS NULL").fetchone()[0]
+        if orphans:
+            logging.warning(f"{mode}: {orphans} documents without content")
+    after = _server_stats(base_url)
+
+    requests_made = after["requests"] - before["requests"]
+    connections = after["connections"] - before["connections"]
+    return {
+        "mode": mode,
+        "workers": workers,
+        "pages_stored": stored,
+        "elapsed_seconds": elapsed,
+        "pages_per_second": stored / elapsed if elapsed else 0.0,
+        "requests": requests_made,
+        "connections": connections,
+        "requests_per_connection": requests_made / connections if connections else 0.0,
+        "write_batches": scraper.writer.batches_written
+    }
+
+
+def run_refresh(base_url: str, num_pages: int, workers: int, request_interval: float,
+                edit_fraction: float, touch_fraction: float) -> Dict[str, Any]:
+    """
+    Crawl the site, change some pages on the server, then time a refresh and
+    check its changed-docs list against the pages that were edited.
+    """
+    import requests
+    from wiki_scraper import WikiScraper
+
+    rng = random.Random(0)
+    with scratch_workdir():
+        scraper = WikiScraper('./var/wiki.sqlite3', max_workers=workers,
+                              base_url=base_url, request_interval=request_interval)
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            scraper.scrape_wikipedia(f"/wiki/{page_name(0)}")
+
+        with sqlite3.connect(os.path.join('var', 'wiki.sqlite3')) as conn:
+            doc_ids = {url: doc_id for doc_id, url in conn.execute("SELECT doc_id, url FROM documents")}
+        urls = sorted(doc_ids)
+        edited = rng.sample(urls, int(len(urls) * edit_fraction))
+        touched = rng.sample([url for url in urls if url not in edited],
+                             int(len(urls) * touch_fraction))
+        for url in edited:
+            requests.get(f"{base_url}/__edit/{url.split('/wiki/', 1)[1]}")
+        for url in touched:
+            requests.get(f"{base_url}/__touch/{url.split('/wiki/', 1)[1]}")
+
+        logging.info(f"Refreshing {len(urls)} pages, {len(edited)} edited, {len(touched)} touched")
+        before = _server_stats(base_url)
+        start_time = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, redirect_stdout(devnull):
+            counts = scraper.refresh_articles('changed_docs.txt')
+        elapsed = time.perf_counter() - start_time
+        after = _server_stats(base_url)
+
+        changed = set()
+        for path in glob.glob('changed_docs.*.txt'):
+            with open(path, mode='r') as file:
+                changed.update(int(line) for line in file if line.strip())
+
+    return {
+        "mode": "refresh",
+        "documents": len(urls),
+        "edited": len(edited),
+        "touched": len(touched),
+        "elapsed_seconds": elapsed,
+        "pages_per_second": len(urls) / elapsed if elapsed else 0.0,
+        "not_modified_responses": after["not_modified"] - before["not_modified"],
+        "counts": counts,
+        "changed_docs_match": changed == {doc_ids[url] for url in edited}
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=500, help='Pages on the stand-in site')
+    parser.add_argument('--latency-ms', type=float, default=50,
+                        help='Simulated server latency per request')
+    parser.add_argument('--threads', type=int, default=25, help='Threaded crawler workers')
+    parser.add_argument('--concurrency', type=int, default=100, help='Async crawler concurrency')
+    parser.add_argument('--request-interval', type=float, default=0.0,
+                        help='Rate limit between requests (the crawlers default to 0.02)')
+    parser.add_argument('--modes', nargs='+', default=['threaded', 'async'],
+                        choices=['threaded', 'async', 'refresh'])
+    parser.add_argument('--edit-fraction', type=float, default=0.1,
+                        help='refresh mode: share of pages whose text changes')
+    parser.add_argument('--touch-fraction', type=float, default=0.1,
+                        help='refresh mode: share of pages whose markup only changes')
+    args = parser.parse_args()
+
+    report = {
+        "test_info": {
+            "pages": args.pages,
+            "latency_ms": args.latency_ms,
+            "request_interval": args.request_interval,
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+    with stand_in_server(args.pages, args.latency_ms / 1000) as base_url:
+        for mode in args.modes:
+            if mode == 'refresh':
+                result = run_refresh(base_url, args.pages, args.threads, args.request_interval,
+                                     args.edit_fraction, args.touch_fraction)
+                report[mode] = result
+                print(f"refresh: {result['documents']} pages in {result['elapsed_seconds']:.2f}s "
+                      f"({result['not_modified_responses']} not modified, {result['counts']}, "
+                      f"changed list {'matches' if result['changed_docs_match'] else 'DIFFERS'})")
+                continue
+
+            workers = args.concurrency if mode == 'async' else args.threads
+            result = run_crawler(mode, base_url, args.pages, workers, args.request_interval)
+            report[mode] = result
+            print(f"{mode}: {result['pages_stored']} pages in {result['elapsed_seconds']:.2f}s "
+                  f"({result['pages_per_second']:.1f} pages/sec, "
+                  f"{result['requests_per_connection']:.1f} requests/connection)")
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f'scraper_benchmark_{timestamp}.json'
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved to {filename}")
+
+
+if __name__ == "__main__":
+    main()
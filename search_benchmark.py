@@ -0,0 +1,206 @@
+"""Compare the TF-IDF and FTS5 search backends on the same query set.
+
+Each backend is started in its own process so startup time and memory are
+measured in isolation. Run from the repository root after building the
+index (`./bin/inverted_index run`) and the FTS table (`./bin/wikidb fts`):
+
+    python search_benchmark.py --num-queries 200
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import random
+import resource
+import sqlite3
+import statistics
+import time
+from datetime import datetime
+from typing import Any, Dict, List
+
+logging.basicConfig(
+    filename='search_benchmark.log',
+    level=logging.INFO,
+    format='%(asctime)s - %(levelname)s - %(message)s'
+)
+
+BACKENDS = ('tfidf', 'fts5')
+
+
+def _current_rss() -> int:
+    """Current resident set size in bytes (Linux), else peak RSS."""
+    try:
+        with open('/proc/self/statm', mode='r') as file:
+            return int(file.read().split()[1]) * resource.getpagesize()
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def sample_queries(db_path: str, num_queries: int, seed: int = 0) -> List[str]:
+    """Build queries from random one/two-word slices of document titles."""
+    conn = sqlite3.connect(db_path)
+    try:
+        titles = [row[0] for row in conn.execute("SELECT title FROM documents")]
+    finally:
+        conn.close()
+
+    rng = random.Random(seed)
+    queries = []
+    for title in rng.sample(titles, min(num_queries, len(titles))):
+        words = title.split()
+        length = min(len(words), rng.choice((1, 2)))
+        start = rng.randrange(len(words) - length + 1)
+        queries.append(' '.join(words[start:start + length]))
+    return queries
+
+
+def _run_backend(backend: str, queries: List[str], k: int, strict: bool, conn) -> None:
+    """Child process: start the app with one backend and time the queries."""
+    try:
+        rss_before = _current_rss()
+        start_time = time.perf_counter()
+
+        from wikipedia_search.config import config, DevelopmentConfig
+        config['benchmark'] = type('BenchmarkConfig', (DevelopmentConfig,), {
+            'SEARCH_BACKEND': backend,
+            'SPELLING_CORRECTION': False,
+        })
+        from wikipedia_search import create_app
+        create_app('benchmark')
+        from wikipedia_search.search import search_engine
+
+        startup_time = time.perf_counter() - start_time
+        rss_after_load = _current_rss()
+
+        query_times = []
+        results = []
+        for query in queries:
+            query_start = time.perf_counter()
+            # bypass the result cache so every query is actually scored
+            hits = search_engine._search(query, k, strict, None)
+            query_times.append(time.perf_counter() - query_start)
+            results.append([doc_id for doc_id, _ in hits])
+
+        conn.send({
+            "backend": backend,
+            "startup_seconds": startup_time,
+            "memory_bytes": rss_after_load - rss_before,
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            "query_times": query_times,
+            "results": results
+        })
+    except Exception as e:
+        logging.error(f"{backend} benchmark failed: {e}")
+        conn.send({"backend": backend, "error": str(e)})
+    finally:
+        conn.close()
+
+
+def _summarize(run: Dict[str, Any]) -> Dict[str, Any]:
+    times = run.pop("query_times")
+    run.pop("results")
+    if not times:
+        return run
+
+    run.update({
+        "queries": len(times),
+        "avg_query_time_ms": statistics.mean(times) * 1000,
+        "median_query_time_ms": statistics.median(times) * 1000,
+        "p95_query_time_ms": (statistics.quantiles(times, n=20)[-1] * 1000
+                              if len(times) > 1 else times[0] * 1000),
+        "max_query_time_ms": max(times) * 1000,
+        "queries_per_second": len(times) / sum(times) if sum(times) else 0
+    })
+    return run
+
+
+def run_benchmark(queries: List[str], k: int = 10, strict: bool = True,
+                  backends=BACKENDS) -> Dict[str, Any]:
+    """Run every backend in a fresh process on the same queries.
+
+    Args:
+        queries: Query strings
+        k: Results requested per query
+        strict: AND (True) or OR (False) matching
+        backends: Backends to compare
+
+    Returns:
+        Dictionary containing per-backend statistics and result overlap
+    """
+    context = multiprocessing.get_context('spawn')
+    runs = {}
+    for backend in backends:
+        logging.info(f"Benchmarking {backend} backend on {len(queries)} queries")
+        parent_conn, child_conn = context.Pipe(duplex=False)
+        process = context.Process(target=_run_backend,
+                                  args=(backend, queries, k, strict, child_conn))
+        process.start()
+        child_conn.close()
+        runs[backend] = parent_conn.recv()
+        process.join()
+
+    report = {
+        "test_info": {
+            "queries": len(queries),
+            "k": k,
+            "strict_match": strict,
+            "timestamp": datetime.now().isoformat()
+        }
+    }
+
+    # top-k agreement between the two rankings
+    if all("results" in runs.get(b, {}) for b in BACKENDS):
+        overlaps = []
+        for tfidf_hits, fts_hits in zip(runs['tfidf']["results"], runs['fts5']["results"]):
+            if tfidf_hits or fts_hits:
+                overlaps.append(len(set(tfidf_hits) & set(fts_hits)) /
+                                len(set(tfidf_hits) | set(fts_hits)))
+        report["top_k_jaccard"] = statistics.mean(overlaps) if overlaps else 0.0
+
+    for backend, run in runs.items():
+        report[backend] = _summarize(run) if "error" not in run else run
+
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--queries', help='File with one query per line')
+    parser.add_argument('--num-queries', type=int, default=200,
+                        help='Queries sampled from titles when --queries is not given')
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--or', dest='strict', action='store_false',
+                        help='Use OR matching instead of AND')
+    parser.add_argument('--db', default=os.path.join('.', 'var', 'wiki.sqlite3'))
+    args = parser.parse_args()
+
+    if args.queries:
+        with open(args.queries, mode='r', encoding='utf-8') as file:
+            queries = [line.strip() for line in file if line.strip()]
+    else:
+        queries = sample_queries(args.db, args.num_queries)
+
+    report = run_benchmark(queries, k=args.k, strict=args.strict)
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f'search_benchmark_{timestamp}.json'
+    with open(filename, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    for backend in BACKENDS:
+        result = report.get(backend, {})
+        if "error" in result:
+            print(f"{backend}: failed ({result['error']})")
+            continue
+        print(f"{backend}: startup {result['startup_seconds']:.2f}s, "
+              f"memory {result['memory_bytes'] / 2**20:.1f} MiB, "
+              f"avg {result.get('avg_query_time_ms', 0):.3f}ms, "
+              f"p95 {result.get('p95_query_time_ms', 0):.3f}ms")
+    if "top_k_jaccard" in report:
+        print(f"Top-{args.k} overlap (Jaccard): {report['top_k_jaccard']:.2f}")
+    print(f"Saved to {filename}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+-- Crawl frontier and visited set used by the scraper (crawl_frontier.py).
+-- state: 0 pending, 1 claimed by a running crawl, 2 done. Claimed rows left
+-- behind by an interrupted crawl are put back to pending on the next start.
+CREATE TABLE IF NOT EXISTS crawl_frontier(
+    url TEXT PRIMARY KEY,
+    inbound INTEGER NOT NULL DEFAULT 1,
+    state INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE INDEX IF NOT EXISTS idx_crawl_frontier_pending
+    ON crawl_frontier(inbound DESC) WHERE state = 0;
@@ -0,0 +1,14 @@
+-- Optional SQLite FTS5 full-text index over documents/document_content,
+-- used by the 'fts5' search backend. Contentless (content='') so article
+-- bodies are not stored twice; only rowid (= doc_id) and bm25 are needed.
+DROP TABLE IF EXISTS documents_fts_vocab;
+DROP TABLE IF EXISTS documents_fts;
+
+CREATE VIRTUAL TABLE documents_fts USING fts5(
+    title,
+    content,
+    content=''
+);
+
+-- Per-term document counts, used to build the spelling index
+CREATE VIRTUAL TABLE documents_fts_vocab USING fts5vocab(documents_fts, 'row');
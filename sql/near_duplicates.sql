@@ -0,0 +1,28 @@
+-- MinHash/LSH near-duplicate detection (near_duplicates.py).
+-- minhash_meta records the signature/banding parameters the stored data was
+-- built with; changing them requires `python near_duplicates.py rebuild`.
+CREATE TABLE IF NOT EXISTS minhash_meta(
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS document_minhash(
+    doc_id INTEGER PRIMARY KEY,
+    signature BLOB NOT NULL
+);
+
+-- one row per (document, LSH band); bucket hashes the band number and values
+CREATE TABLE IF NOT EXISTS minhash_buckets(
+    bucket INTEGER NOT NULL,
+    doc_id INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_minhash_buckets ON minhash_buckets(bucket);
+
+-- only near-duplicates are listed; cluster_id is the doc_id of the first
+-- (canonical) article of the cluster, which itself has no row
+CREATE TABLE IF NOT EXISTS duplicate_clusters(
+    doc_id INTEGER PRIMARY KEY,
+    cluster_id INTEGER NOT NULL,
+    similarity REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_duplicate_clusters_cluster ON duplicate_clusters(cluster_id);
@@ -2,7 +2,11 @@ CREATE TABLE documents(
     doc_id INTEGER PRIMARY KEY AUTOINCREMENT,
     title TEXT NOT NULL,
     url TEXT,
-    summary VARCHAR(250)
+    summary VARCHAR(250),
+    -- HTTP validators and text hash from the last fetch, used by refresh crawls
+    etag TEXT,
+    last_modified TEXT,
+    content_hash TEXT
 );
 
 -- Create index for title searches and URL lookups
@@ -10,8 +14,10 @@ CREATE INDEX idx_documents_title ON documents(title);
 CREATE INDEX idx_documents_url ON documents(url);
 CREATE UNIQUE INDEX idx_documents_url_unique ON documents(url);
 
+-- content is zlib-compressed UTF-8 (see database.compress_content); older
+-- databases may still hold plain TEXT until `./bin/wikidb compress` is run
 CREATE TABLE document_content(
     doc_id INTEGER PRIMARY KEY,
-    content TEXT NOT NULL,
+    content BLOB NOT NULL,
     FOREIGN KEY (doc_id) REFERENCES documents(doc_id)
 )
\ No newline at end of file
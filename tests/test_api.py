@@ -0,0 +1,163 @@
+"""/api/v1 routes over a small index and database built in a temporary directory."""
+import os
+import sqlite3
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import database  # noqa: E402
+
+# doc 1 to 7 all have python, doc 2 and 3 also snake
+PART = (
+    "python 0.1 1 1.0 1.0 2 1.0 1.0 3 1.0 1.0 4 1.0 1.0 5 1.0 1.0 6 1.0 1.0 7 1.0 1.0\n"
+    "snake 0.5 2 1.0 1.0 3 1.0 1.0\n"
+)
+
+
+@pytest.fixture(scope="module")
+def app(tmp_path_factory):
+    """
+    One app for the module: the search package keeps its index, engine and
+    caches in module globals, so loading a second index would mix them.
+    """
+    root = tmp_path_factory.mktemp("wiki")
+    (root / "data").mkdir()
+    (root / "var" / "log").mkdir(parents=True)
+    (root / "data" / "part-00000").write_text(PART, encoding="utf-8")
+    (root / "data" / "stop_words.txt").write_text("the\na\n", encoding="utf-8")
+
+    database_path = str(root / "var" / "wiki.sqlite3")
+    with open(os.path.join(ROOT, "sql", "schema.sql"), encoding="utf-8") as file:
+        schema = file.read()
+    conn = sqlite3.connect(database_path)
+    conn.executescript(schema)
+    for doc_id in range(1, 8):
+        conn.execute("INSERT INTO documents(doc_id, title, url, summary) VALUES (?, ?, ?, ?)",
+                     (doc_id, f"Article {doc_id}", f"https://example.org/{doc_id}", "summary"))
+        conn.execute("INSERT INTO document_content(doc_id, content) VALUES (?, ?)",
+                     (doc_id, database.compress_content("python and a snake")))
+    conn.commit()
+    conn.close()
+
+    from wikipedia_search.config import Config, config
+
+    class TestConfig(Config):
+        TESTING = True
+        DATABASE_PATH = database_path
+        DATABASE_POOL_MODE = 'default'
+        INDEX_PATH = str(root / "data")
+        STOPWORDS_PATH = str(root / "data" / "stop_words.txt")
+        INDEX_SEGMENTS_PATH = None
+        INDEX_SHARED_MEMORY = False
+        SEARCH_BACKEND = 'tfidf'
+        SEARCH_TIMEOUT_MS = 0
+        SPELLING_MIN_DOC_FREQ = 1
+        METADATA_CACHE_MODE = 'none'
+        METADATA_HOT_DOCS_PATH = None
+        WORD_POSTINGS_LIMIT = 3
+
+    config['test'] = TestConfig
+
+    cwd = os.getcwd()
+    # the index and engine log to var/log relative to the working directory
+    os.chdir(root)
+    try:
+        from wikipedia_search import create_app
+        yield create_app('test')
+    finally:
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+def test_flag_parsing():
+    from wikipedia_search.api.routes import flag
+
+    assert all(flag(value) for value in ("1", "true", "True", "YES"))
+    assert not any(flag(value) for value in ("0", "false", "no", "", "on"))
+
+
+def test_hits_if_none_match_returns_304(client):
+    first = client.get('/api/v1/hits/', query_string={'q': 'python snake'})
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+
+    revalidated = client.get('/api/v1/hits/', query_string={'q': 'python snake'},
+                             headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.headers['ETag'] == etag
+    assert not revalidated.data
+
+    other = client.get('/api/v1/hits/', query_string={'q': 'python snake'},
+                       headers={'If-None-Match': '"stale"'})
+    assert other.status_code == 200
+    assert other.data == first.data
+
+
+def test_hits_normalized_queries_share_one_entry(client):
+    from wikipedia_search.search import response_cache
+
+    responses = [client.get('/api/v1/hits/', query_string={'q': q})
+                 for q in ('Snake', 'snake ', 'the snake')]
+    assert len({response.headers['ETag'] for response in responses}) == 1
+    assert responses[0].json['query'] == 'snake'
+    assert ('snake', 10, True, False) in response_cache
+
+
+def test_hits_cache_emptied_when_index_version_changes(client):
+    from wikipedia_search.search import response_cache, search_index
+
+    client.get('/api/v1/hits/', query_string={'q': 'python'})
+    hits = response_cache.hits
+    client.get('/api/v1/hits/', query_string={'q': 'python'})
+    assert response_cache.hits == hits + 1
+
+    # what a reload or a segment changing documents does
+    search_index.version += 1
+    misses = response_cache.misses
+    response = client.get('/api/v1/hits/', query_string={'q': 'python'})
+    assert response.status_code == 200
+    assert response_cache.misses == misses + 1
+    assert len(response_cache) == 1
+
+
+def test_word_pages_follow_next_offset(client):
+    doc_ids = []
+    offset = 0
+    while offset is not None:
+        page = client.get('/api/v1/word/python/', query_string={'offset': offset}).json
+        assert page['data']['df'] == 7
+        assert page['offset'] == offset
+        assert page['limit'] == len(page['data']['documents']) <= 3
+        doc_ids.extend(doc['doc_id'] for doc in page['data']['documents'])
+        offset = page['next_offset']
+    assert doc_ids == list(range(1, 8))
+
+
+def test_word_limit_and_offset_bounds(client):
+    page = client.get('/api/v1/word/python/', query_string={'offset': 5, 'limit': 10}).json
+    assert [doc['doc_id'] for doc in page['data']['documents']] == [6, 7]
+    assert page['next_offset'] is None
+
+    page = client.get('/api/v1/word/python/', query_string={'offset': 2, 'limit': 2}).json
+    assert page['limit'] == 2
+    assert page['next_offset'] == 4
+
+    # limit=0 is stats only, so there is no page to continue from
+    page = client.get('/api/v1/word/python/', query_string={'limit': 0}).json
+    assert page['data']['documents'] == [] and page['next_offset'] is None
+
+    assert client.get('/api/v1/word/python/', query_string={'offset': -1}).status_code == 400
+
+
+def test_word_stream_sends_every_posting_from_offset(client):
+    response = client.get('/api/v1/word/python/', query_string={'offset': 1, 'stream': 1})
+    page = response.get_json()
+    assert [doc['doc_id'] for doc in page['data']['documents']] == list(range(2, 8))
+    assert page['next_offset'] is None
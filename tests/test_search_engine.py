@@ -0,0 +1,69 @@
+"""Deadline-cut strict searches and spelling suggestions of SearchEngine."""
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from wikipedia_search.search.index_loader import SearchIndex  # noqa: E402
+from wikipedia_search.search.search_engine import SearchEngine  # noqa: E402
+from wikipedia_search.search.spelling import SpellingIndex  # noqa: E402
+
+# the package rebinds search_engine to its engine instance
+search_engine_module = sys.modules[SearchEngine.__module__]
+
+
+def _engine(postings, stopwords=()):
+    """Engine over term -> (idf, doc ids), every doc with magnitude 1."""
+    index = SearchIndex()
+    index.stopwords = set(stopwords)
+    for term, (idf, doc_ids) in postings.items():
+        index.inverted_index[term] = {"idf": idf, "documents": [
+            {"doc_id": doc_id, "tfk": 1.0, "norm_factor": 1.0} for doc_id in doc_ids
+        ]}
+    engine = SearchEngine(index)
+    engine._doc_magnitudes = {doc_id: 1.0
+                              for _, doc_ids in postings.values() for doc_id in doc_ids}
+    return engine
+
+
+def test_strict_search_cut_by_deadline_returns_no_doc_missing_a_term(monkeypatch):
+    # alpha is the rarest term, so its docs seed the intersection
+    engine = _engine({"alpha": (2.0, [1, 2, 3]), "beta": (0.5, range(3, 50))})
+    monkeypatch.setattr(search_engine_module, "DEADLINE_CHECK_INTERVAL", 1)
+
+    complete = engine._search("alpha beta", k=10, strict_match=True)
+    assert [doc_id for doc_id, _ in complete] == [3]
+    assert not complete.partial
+
+    cut = engine._search("alpha beta", k=10, strict_match=True, deadline=time.monotonic())
+    assert cut.partial
+    assert {doc_id for doc_id, _ in cut} <= {3}
+
+
+def test_lookup_ranks_by_distance_then_frequency():
+    spelling = SpellingIndex(max_edit_distance=2, prefix_length=7)
+    spelling.build([("python", 5), ("pythons", 9), ("typhoon", 50), ("marathon", 1)])
+
+    assert spelling.lookup("python") == [("python", 0, 5)]
+    # one edit away beats the more frequent term two edits away
+    assert [term for term, _, _ in spelling.lookup("pythn")] == ["python", "pythons"]
+    assert spelling.correct("pythonss") == "pythons"
+    assert spelling.correct("zzzzzz") is None
+
+
+def test_lookup_skips_terms_below_min_doc_freq():
+    spelling = SpellingIndex(min_doc_freq=2)
+    spelling.build([("science", 1), ("sciences", 3)])
+
+    assert spelling.correct("sciense") == "sciences"
+    assert "science" not in spelling.frequencies
+
+
+def test_suggest_query_replaces_only_unknown_terms():
+    engine = _engine({"python": (1.0, [1, 2]), "snake": (1.0, [2])}, stopwords={"the"})
+    engine.build_spelling_index(max_edit_distance=2, prefix_length=7)
+
+    assert engine.suggest_query("the pyhton snake") == "python snake"
+    assert engine.suggest_query("python snake") is None
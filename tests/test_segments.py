@@ -0,0 +1,74 @@
+"""SegmentedIndex over segments written by inverted_index/segment_indexer.py."""
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'inverted_index'))
+
+from segment_indexer import SegmentWriter  # noqa: E402
+from wikipedia_search.search.segments import Segment, SegmentedIndex, read_manifest  # noqa: E402
+
+BASE_PART = (
+    "alpha 0.0 1 1 1.0 2 1 1.0\n"
+    "beta 0.3 1 1 1.0\n"
+)
+
+
+def _base_index():
+    index = {}
+    for line in BASE_PART.splitlines():
+        data = line.split()
+        index[data[0]] = {"idf": float(data[1]), "documents": [
+            {"doc_id": int(data[i]), "tfk": float(data[i + 1]), "norm_factor": float(data[i + 2])}
+            for i in range(2, len(data), 3)
+        ]}
+    return index
+
+
+def _view(writer):
+    """The view a restarted server builds from the segments on disk."""
+    segments = [Segment.load(writer.path, entry)
+                for entry in read_manifest(writer.path)["segments"]]
+    return SegmentedIndex(_base_index(), {1, 2}, segments)
+
+
+def _assert_consistent(view):
+    items = dict(view.items())
+    assert set(items) == set(view)
+    assert len(view) == len(items)
+    assert all(entry["documents"] for entry in items.values())
+
+
+def test_added_then_deleted_document_leaves_no_terms(tmp_path):
+    with open(tmp_path / 'part-00000', mode='w', encoding='utf-8') as file:
+        file.write(BASE_PART)
+    writer = SegmentWriter(str(tmp_path))
+
+    writer.add([(3, "Quux", "quuxification")], indexed_doc_id=3)
+    added = set(_view(writer).segments[0].postings)
+    writer.add([], deleted=[3])
+
+    view = _view(writer)
+    _assert_consistent(view)
+    assert not added & set(view)
+    assert view.total_docs == 2
+
+
+def test_rewritten_document_keeps_only_current_terms(tmp_path):
+    with open(tmp_path / 'part-00000', mode='w', encoding='utf-8') as file:
+        file.write(BASE_PART)
+    writer = SegmentWriter(str(tmp_path))
+
+    for version in ("version1 alpha", "version2 alpha", "version3"):
+        writer.add([(1, "Rewritten", version)])
+
+    view = _view(writer)
+    _assert_consistent(view)
+    current = set(view.segments[-1].postings)
+    superseded = set(view.segments[0].postings) | set(view.segments[1].postings)
+    assert current <= set(view)
+    assert not (superseded - current - {"alpha"}) & set(view)
+    # doc 1 was the only document with beta
+    assert "beta" not in set(view)
+    assert [doc["doc_id"] for doc in view["alpha"]["documents"]] == [2]
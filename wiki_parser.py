@@ -0,0 +1,85 @@
+"""
+Targeted parsing of fetched Wikipedia articles.
+
+Only the #firstHeading and #bodyContent subtrees are built into a tree (the
+navigation, sidebars and footer are tokenized but dropped), and the body is
+walked once to collect both the text blocks and the article links. lxml is
+used as the parser backend when it is installed.
+"""
+import re
+from typing import List, Optional, Tuple
+
+from bs4 import BeautifulSoup, SoupStrainer
+
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = 'lxml'
+except ImportError:
+    DEFAULT_PARSER = 'html.parser'
+
+TEXT_TAGS = {'p', 'h2', 'h3'}
+SUMMARY_LENGTH = 250
+
+SKIP_PREFIXES = (
+    "File:", "Category:", "Help:", "Template:",
+    "Wikipedia:", "Portal:", "Talk:", "Special:",
+    "User:", "Special:BookSources", "Editing"
+)
+
+_ARTICLE_PARTS = SoupStrainer(id=['firstHeading', 'bodyContent'])
+_FOOTNOTES = re.compile(r'\[[^\]]*\]')
+
+
+def parse_article(html, parser: Optional[str] = None
+                  ) -> Optional[Tuple[str, str, str, List[str]]]:
+    """
+    Extract an article's title, text, summary and links.
+
+    Args:
+        html: Page HTML (bytes or str)
+        parser: BeautifulSoup parser backend, defaults to DEFAULT_PARSER
+
+    Returns:
+        (title, content, summary, links), or None if the page has no
+        title. content and links are empty if there is no bodyContent.
+    """
+    soup = BeautifulSoup(html, parser or DEFAULT_PARSER, parse_only=_ARTICLE_PARTS)
+
+    heading = soup.find(id='firstHeading')
+    title = heading.get_text() if heading else ''
+    if not title:
+        return None
+
+    body = soup.find(id='bodyContent')
+    if not body:
+        return title, '', '', []
+
+    text_blocks = []
+    links = []
+    for tag in body.find_all(_is_text_or_link):
+        if tag.name == 'a':
+            link = _article_link(tag['href'])
+            if link:
+                links.append(link)
+        else:
+            # clean text of [] footnote markers and whitespace
+            cleaned_text = ' '.join(_FOOTNOTES.sub('', tag.get_text()).split())
+            if cleaned_text:
+                text_blocks.append(cleaned_text)
+
+    content = ' '.join(text_blocks)
+    return title, content, content[:SUMMARY_LENGTH], links
+
+
+def _is_text_or_link(tag) -> bool:
+    return tag.name in TEXT_TAGS or (tag.name == 'a' and tag.has_attr('href'))
+
+
+def _article_link(href: str) -> Optional[str]:
+    """href if it points to another article, None otherwise."""
+    if not href.startswith("/wiki/"):
+        return None
+    page_name = href.split('#')[0].split('/wiki/', 1)[1]
+    if page_name.startswith(SKIP_PREFIXES):
+        return None
+    return href
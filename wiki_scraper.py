@@ -1,33 +1,293 @@
 import argparse
+import itertools
+import logging
+import os
 import requests
-import re
 import time
 import csv
 import random
 import sqlite3
-from bs4 import BeautifulSoup
 from collections import deque
-from queue import Empty, Queue
+from queue import Empty, Full, Queue
 import threading
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, NamedTuple, Optional
 
 import database
+from crawl_frontier import BloomFilter, CrawlFrontier
+from near_duplicates import MinHasher, NearDuplicateIndex
+from wiki_parser import parse_article
+
+WIKI_BASE_URL = "https://en.wikipedia.org"
+
+
+class FetchResult(NamedTuple):
+    status: Optional[int]  # None on request errors
+    html: Optional[bytes]  # only set for 200
+    etag: Optional[str]
+    last_modified: Optional[str]
+
+
+def conditional_headers(etag=None, last_modified=None) -> Dict[str, str]:
+    """If-None-Match / If-Modified-Since headers for a re-fetch."""
+    headers = {}
+    if etag:
+        headers['If-None-Match'] = etag
+    if last_modified:
+        headers['If-Modified-Since'] = last_modified
+    return headers
+
+
+_changed_batches = itertools.count()
+
+
+def write_changed_batch(changed_path: str, doc_ids) -> Optional[str]:
+    """
+    Hand changed doc_ids to the segment indexer as a new batch file.
+
+    Batches are written next to changed_path with a unique infix
+    (changed_docs.<time>-<pid>-<n>.txt) and renamed into place once
+    complete, so the indexer never reads a partial list; it deletes the
+    batches it has indexed.
+
+    Returns:
+        Path of the batch, or None if doc_ids is empty
+    """
+    if not doc_ids:
+        return None
+    stem, ext = os.path.splitext(changed_path)
+    path = f"{stem}.{time.time_ns()}-{os.getpid()}-{next(_changed_batches)}{ext}"
+    with open(path + '.tmp', mode='w', encoding='utf-8') as file:
+        file.writelines(f"{doc_id}\n" for doc_id in doc_ids)
+    os.replace(path + '.tmp', path)
+    return path
+
+
+class ArticleWriterError(RuntimeError):
+    """The writer thread stopped on an error; queued articles are not stored."""
+
+
+class ArticleWriter:
+    """
+    Single writer thread persisting scraped articles.
+
+    Workers hand articles over through a bounded queue (put blocks when the
+    writer falls behind) and the writer commits them in batches with
+    executemany, appending the same rows to one open data.csv. Doc ids are
+    assigned here, continuing from MAX(doc_id), so rows can be inserted
+    without a per-article round trip for lastrowid. Each batch is also run
+    through the MinHash near-duplicate index, which records clusters of
+    near-identical articles.
+
+    A batch that fails to commit is retried one article at a time, so only
+    the offending rows are lost. If the thread itself dies, put() and
+    close() raise ArticleWriterError instead of blocking on the queue.
+    """
+    _STOP = object()
+
+    def __init__(self, db_path: str, csv_path: str = "data.csv", batch_size: int = 100,
+                 flush_interval: float = 1.0, queue_size: int = 1000,
+                 near_duplicate_threshold: Optional[float] = 0.8):
+        """
+        Args:
+            db_path: SQLite database path
+            csv_path: CSV file the articles are appended to
+            batch_size: Articles per transaction
+            flush_interval: Seconds a partial batch may wait before it is
+                committed anyway
+            queue_size: Articles buffered before workers block in put()
+            near_duplicate_threshold: Estimated Jaccard similarity at which
+                an article is clustered as a near-duplicate, None disables
+        """
+        self.db_path = db_path
+        self.csv_path = csv_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.near_duplicate_threshold = near_duplicate_threshold
+        self.minhasher = MinHasher() if near_duplicate_threshold else None
+        self.queue = Queue(maxsize=queue_size)
+        self.thread = None
+        self.conn = None
+        self.near_duplicates = None
+        self.error = None  # exception that stopped the writer thread
+        self.logger = logging.getLogger(__name__)
+
+        self.articles_written = 0
+        self.batches_written = 0
+        self.duplicates_skipped = 0
+        self.near_duplicates_found = 0
+
+    def start(self):
+        # connect here so schema/parameter errors surface in the caller
+        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        database.migrate_documents(self.conn)
+        if self.near_duplicate_threshold:
+            self.near_duplicates = NearDuplicateIndex(self.conn, self.near_duplicate_threshold)
+        self.thread = threading.Thread(target=self._run, name="article-writer", daemon=True)
+        self.thread.start()
+
+    def put(self, title, url, content, summary, etag=None, last_modified=None):
+        """Queue an article, compressing, hashing and MinHashing it on the caller's thread."""
+        signature = self.minhasher.signature(content) if self.minhasher else None
+        self._enqueue((title, url, database.compress_content(content), content, summary,
+                       etag, last_modified, database.content_hash(content), signature))
+
+    def close(self):
+        """
+        Flush everything still queued and stop the writer thread.
+
+        Raises:
+            ArticleWriterError: If the writer thread stopped on an error
+        """
+        if self.thread is None:
+            return
+        try:
+            self._enqueue(self._STOP)
+        except ArticleWriterError:
+            pass  # the thread is gone, nothing to flush
+        self.thread.join()
+        self.thread = None
+        self._check()
+
+    def _check(self):
+        if self.error is not None:
+            raise ArticleWriterError(f"Article writer stopped: {self.error}") from self.error
+
+    def _enqueue(self, item):
+        # a dead writer never empties the queue, so don't block on it for good
+        while True:
+            self._check()
+            try:
+                self.queue.put(item, timeout=0.5)
+                return
+            except Full:
+                pass
+
+    def _run(self):
+        try:
+            self._write_queued()
+        except Exception as e:
+            self.logger.exception("Article writer stopped")
+            self.error = e
+        finally:
+            self.conn.close()
+
+    def _write_queued(self):
+        conn = self.conn
+        next_doc_id = (conn.execute("SELECT MAX(doc_id) FROM documents").fetchone()[0] or 0) + 1
+
+        with open(self.csv_path, mode='a', newline='\n', encoding='utf-8') as file:
+            writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+            batch = []
+            stopping = False
+            flush_at = time.monotonic() + self.flush_interval
+            while not stopping:
+                try:
+                    item = self.queue.get(timeout=max(flush_at - time.monotonic(), 0))
+                    if item is self._STOP:
+                        stopping = True
+                    else:
+                        batch.append(item)
+                except Empty:
+                    pass
+
+                if batch and (stopping or len(batch) >= self.batch_size
+                              or time.monotonic() >= flush_at):
+                    next_doc_id = self._write_batch(conn, writer, batch, next_doc_id)
+                    file.flush()
+                    batch = []
+                if not batch:
+                    flush_at = time.monotonic() + self.flush_interval
+
+    def _write_batch(self, conn, writer, batch, next_doc_id: int) -> int:
+        """Commit one batch, returns the next free doc id."""
+        placeholders = ','.join('?' * len(batch))
+        existing = {row[0] for row in conn.execute(
+            f"SELECT url FROM documents WHERE url IN ({placeholders})",
+            [item[1] for item in batch]
+        )}
+
+        documents, contents, rows, signatures = [], [], [], []
+        for (title, url, compressed, content, summary, etag, last_modified,
+             digest, signature) in batch:
+            if url in existing:
+                self.duplicates_skipped += 1
+                continue
+            existing.add(url)
+            documents.append((next_doc_id, title, url, summary, etag, last_modified, digest))
+            contents.append((next_doc_id, compressed))
+            rows.append((next_doc_id, title, content))
+            if signature is not None:
+                signatures.append((next_doc_id, signature))
+            next_doc_id += 1
+
+        try:
+            found = self._insert(conn, documents, contents, signatures)
+        except sqlite3.Error as e:
+            self.logger.warning(f"Error storing {len(documents)} articles, retrying one by one: {e}")
+            found, stored = {}, []
+            signature_of = dict(signatures)
+            for document, content, row in zip(documents, contents, rows):
+                doc_id = document[0]
+                signature = [(doc_id, signature_of[doc_id])] if doc_id in signature_of else []
+                try:
+                    found.update(self._insert(conn, [document], [content], signature))
+                except sqlite3.Error as e:
+                    self.logger.error(f"Error storing article {document[2]}: {e}")
+                    continue
+                stored.append(row)
+            rows = stored
+
+        writer.writerows(rows)
+        self.near_duplicates_found += len(found)
+        self.articles_written += len(rows)
+        self.batches_written += 1
+        return next_doc_id
+
+    def _insert(self, conn, documents, contents, signatures) -> dict:
+        """Insert articles in one transaction, returns the near-duplicates found."""
+        with conn:
+            conn.executemany(
+                "INSERT INTO documents (doc_id, title, url, summary, etag, "
+                "last_modified, content_hash) VALUES (?, ?, ?, ?, ?, ?, ?)", documents
+            )
+            conn.executemany(
+                "INSERT INTO document_content (doc_id, content) "
+                "VALUES (?, ?)", contents
+            )
+            if self.near_duplicates is not None:
+                return self.near_duplicates.add_many(signatures)
+        return {}
+
 
 class WikiScraper:
-    def __init__(self, db_path: str, max_workers: int = 25):
+    def __init__(self, db_path: str, max_workers: int = 25,
+                 base_url: str = WIKI_BASE_URL, request_interval: float = 0.02,
+                 batch_size: int = 100, flush_interval: float = 1.0,
+                 max_in_flight: Optional[int] = None, request_timeout: float = 30,
+                 near_duplicate_threshold: Optional[float] = 0.8):
         self.db_path = db_path
-        self.seen_links = set()
-        self.queued_links = set()
-        self.links_queue = Queue()
-        self.seen_titles = set()
+        self.base_url = base_url.rstrip('/')
+        self.request_interval = request_interval
+        # opened by load_visited_titles() when a crawl starts
+        self.frontier = None
+        self.seen_titles = None
         self.max_workers = max_workers
+        self.max_in_flight = max_in_flight or max_workers * 2
+        self.request_timeout = request_timeout
 
         # Locks for separate resources to reduce blocking
-        self.article_lock = threading.Lock()
         self.rate_limit_lock = threading.Lock()
-        self.file_lock = threading.Lock()
         self.title_lock = threading.Lock()
 
+        # all database and data.csv writes go through this thread
+        self.writer = ArticleWriter(db_path, batch_size=batch_size,
+                                    flush_interval=flush_interval,
+                                    queue_size=max(1000, max_workers * 4),
+                                    near_duplicate_threshold=near_duplicate_threshold)
+
         self.request_times = deque(maxlen=50)
         self.min_delay = 0.05
 
@@ -36,6 +296,15 @@ class WikiScraper:
             'Accept': 'text/html,application/xhtml+xml'
         }
 
+        # keep-alive connections shared by all workers instead of a new
+        # TCP+TLS handshake per article
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        adapter = requests.adapters.HTTPAdapter(pool_connections=1,
+                                                pool_maxsize=max_workers)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
     def _rate_limit(self):
         """Thread-safe rate limiting."""
         sleep_duration = 0
@@ -43,237 +312,279 @@ class WikiScraper:
             now = time.time()
             if len(self.request_times) > 0:
                 elapsed = now - self.request_times[-1]
-                if elapsed < 0.02:
-                    sleep_duration = 0.02 - elapsed
+                if elapsed < self.request_interval:
+                    sleep_duration = self.request_interval - elapsed
             self.request_times.append(now)
 
         if sleep_duration > 0:
             time.sleep(sleep_duration)
             
-    def get_wiki_text(self, soup: BeautifulSoup):
-        """Extracts body of text from a wikipedia article."""
-        body = soup.find(id='bodyContent')
-        if not body:
-            return "", ""
-        
-        found_text = body.find_all(['p', 'h2', 'h3'])
-
-        final_text = []
-        pattern = re.compile(r'\[[^\]]*\]')
-        for text in found_text:
-            # clean text of [] and \n
-            element = text.get_text()
-            cleaned_text = pattern.sub('', element)
-            # Clean whitespace
-            cleaned_text = ' '.join(cleaned_text.split())
-            if cleaned_text:
-                final_text.append(cleaned_text)
-
-        full_text = ' '.join(final_text)
-        summary = full_text[:250] if full_text else ""
-        return full_text, summary
-
-    def store_article(self, title, url, content, summary) -> bool:
-        """Store article data in var/wiki.sqlite3."""
+    def load_visited_titles(self, seen_capacity: int = 5_000_000):
+        """Open the persistent frontier and load stored titles into a Bloom filter."""
+        self.frontier = CrawlFrontier(self.db_path, seen_capacity=seen_capacity)
         with database.get_db() as conn:
-            try:
-                conn.execute("BEGIN EXCLUSIVE TRANSACTION")
-
-                cur = conn.execute(
-                    "SELECT 1 FROM documents WHERE url = ?", (url,)
-                )
-                if cur.fetchone():
-                    conn.rollback()
-                    return False
-
-                # store document metadata
-                cur = conn.execute(
-                    "INSERT INTO documents (title, url, summary) "
-                    "VALUES (?, ?, ?)", (title, url, summary)
-                )
-
-                doc_id = cur.lastrowid
-
-                # store document body text
-                conn.execute(
-                    "INSERT INTO document_content (doc_id, content) "
-                    "VALUES (?, ?)", (doc_id, content)
-                )
-                conn.commit()
-                return doc_id
-            except sqlite3.Error as e:
-                print(f"Error storing article: {e}")
-                conn.rollback()
-                return False
-
-    def get_links_from_article(self, soup: BeautifulSoup):
-        """Collects all links to other wikipedia articles from a single wiki article."""
-        body = soup.find(id="bodyContent")
-        if not body:
-            return []
-        
-        skip_prefixes = {
-            "File:", "Category:", "Help:", "Template:",
-            "Wikipedia:", "Portal:", "Talk:", "Special:",
-            "User:", "Special:BookSources", "Editing"
-        }
-        links = []
-        for link in body.find_all('a', href=True):
-            href = link['href']
-            if not href.startswith("/wiki/"):
-                continue
-
-            base_url = href.split('#')[0]
-            page_name = base_url.split('/wiki/', 1)[1]
-            if any(page_name.startswith(prefix) for prefix in skip_prefixes):
-                continue
-            
-            links.append(href)
+            count = conn.execute("SELECT COUNT(*) FROM documents").fetchone()[0]
+            self.seen_titles = BloomFilter(max(seen_capacity, 2 * count))
+            for row in conn.execute("SELECT title FROM documents"):
+                self.seen_titles.add(row['title'])
+
+    def _process_article(self, url: str):
+        """
+        Fetch, parse and queue one article for storage.
+
+        Returns:
+            (stored, links) where links are the article links found on the
+            page, deduplicated, for the scheduler to add to the frontier
+        """
+        try:
+            fetched = self.get_article(url)
+            if not fetched.html:
+                return False, []
 
-        return links
+            page = parse_article(fetched.html)
+            if not page:
+                return False, []
+            title, content, summary, new_links = page
 
-    def load_visited_titles(self):
-        with database.get_db() as conn:
-            cur = conn.execute(
-                "SELECT url FROM documents"
-            )
-            results = cur.fetchall()
-            self.seen_links = {row['url'] for row in results}
-            self.seen_titles = {row['url'] for row in results}
-
-    def _process_article(self, url: str) -> bool:
-        """Process single article."""
-        with self.article_lock:
-            if url in self.seen_links:
-                return False    
-            self.seen_links.add(url)
-        
-        try:
-            soup = self.get_article(url)
-            if not soup:
-                return False
-        
-            title = soup.find(id="firstHeading").get_text()
-            if not title:
-                return False
-            
             with self.title_lock:
                 if title in self.seen_titles:
                     print(f"Skipping dup article: {title}")
-                    return False
+                    return False, []
                 self.seen_titles.add(title)
 
-            content, summary = self.get_wiki_text(soup)
             if not content:
-                return False
-            
-            with self.article_lock:
-                doc_id = self.store_article(title, url, content, summary)
-                if not doc_id:
-                    return False
-
-            new_links = self.get_links_from_article(soup)
-            
-            with self.article_lock:
-                unseen_links = [link for link in new_links
-                                if link not in self.seen_links
-                                and link not in self.queued_links]
-
-                for link in unseen_links:
-                    self.links_queue.put(link)
-                    self.queued_links.add(link)
+                return False, []
 
+            self.writer.put(title, url, content, summary,
+                            fetched.etag, fetched.last_modified)
             print(f"Visiting... {title}")
+            return True, list(dict.fromkeys(new_links))
 
-            with self.file_lock:
-                with open("data.csv", mode='a', newline='\n', encoding='utf-8') as file:
-                    wiki_data_entry = [(doc_id, title, content)]
-                    writer = csv.writer(file, quoting=csv.QUOTE_ALL)
-                    writer.writerows(wiki_data_entry)
-            return True
-
+        except ArticleWriterError:
+            raise
         except Exception as e:
             print(f"Error processing article {url}: {e}")
-        return False
-
-    def scrape_wikipedia(self,start_url: str="/wiki/Dune_(novel)"):
-        """Scapes initial wiki article for text and links to branch and build data.csv."""
-        # planned to keep track of origin article and all 
-        # linked articles to create a graph
-        
+        return False, []
+
+    def scrape_wikipedia(self, start_url: str = "/wiki/Dune_(novel)",
+                         max_pages: Optional[int] = None):
+        """
+        Scrapes from start_url, following article links, to build data.csv.
+
+        Only the scheduler (this thread) touches the frontier. At most
+        max_in_flight articles are submitted at once; the next ones are
+        chosen by inbound link count as workers finish. The frontier is
+        persistent, so a later run continues where this one stopped.
+        """
         # initialize set pair meant to track previously visited wikis
         # and wikis visited this script run
         self.load_visited_titles()
-        self.links_queue.put(start_url)
-        self.queued_links.add(start_url)
+        self.frontier.add(start_url)
         articles_scraped = 0
-        running = True
+        in_flight = set()
+        self.writer.start()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
 
         try:
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                futures = set()
-
-                while running:
-                    if self.links_queue.empty() and not futures:
+            while True:
+                while (len(in_flight) < self.max_in_flight
+                       and (max_pages is None or articles_scraped + len(in_flight) < max_pages)):
+                    url = self.frontier.pop()
+                    if url is None:
                         break
+                    future = executor.submit(self._process_article, url)
+                    future.url = url
+                    in_flight.add(future)
 
-                    # process completed futures before getting new work
-                    done = {f for f in futures if f.done()}
-                    for f in done:
-                        try:
-                            if f.result():
-                                articles_scraped += 1
-                        except Exception as e:
-                            print(f"Error in future: {e}")
-                        futures.remove(f)
-
-                    if self.links_queue.empty():
-                        continue
+                if not in_flight:
+                    break
 
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.frontier.done(future.url)
                     try:
-                        curr_wiki = self.links_queue.get(block=False)
-                        if curr_wiki in self.seen_links:
-                            continue
-                        future = executor.submit(self._process_article, curr_wiki)
-                        futures.add(future)
+                        stored, links = future.result()
+                    except ArticleWriterError:
+                        # nothing more can be stored, close() reports why
+                        raise
                     except Exception as e:
+                        print(f"Error in future: {e}")
                         continue
+                    if stored:
+                        articles_scraped += 1
+                    self.frontier.add_many(links)
 
         except KeyboardInterrupt:
-            running = False
-
-            for future in futures: 
-                future.cancel()
-
-            while not self.links_queue.empty():
-                try:
-                    self.links_queue.get_nowait()
-                except Empty:
-                    break
-
-            executor._threads.clear()
-            executor._shutdown = True
-            executor._broken = True
-
             print("\nScraping interrupted by user")
-            
         except Exception as e:
             print(f"\nError during scraping: {e}")
         finally:
+            # drop queued work and let the running fetches finish so their
+            # articles still reach the writer
+            executor.shutdown(wait=True, cancel_futures=True)
+            for future in in_flight:
+                # cancelled URLs stay claimed and go back to pending on restart
+                if future.cancelled():
+                    continue
+                self.frontier.done(future.url)
+                if future.exception() is None:
+                    stored, links = future.result()
+                    articles_scraped += stored
+                    self.frontier.add_many(links)
+            try:
+                self.writer.close()
+            finally:
+                self.frontier.close()
             print(f"\nScraped {articles_scraped} articles")
-    
-    def get_article(self, url):
+        return articles_scraped
+
+    def refresh_articles(self, changed_path: str = "changed_docs.txt",
+                         batch_size: int = 100) -> Dict[str, int]:
+        """
+        Re-fetch every stored article with conditional requests and rewrite
+        only the ones whose text changed.
+
+        Pages answered with 304, or whose extracted text hashes the same as
+        before, are left alone (only their validators are updated). The
+        doc_ids of rewritten articles are handed to incremental indexing as
+        one batch file per committed batch (see write_changed_batch).
+        data.csv is not touched; regenerate
+        it with `./bin/wikidb export` for a full rebuild.
+
+        Args:
+            changed_path: Name the changed doc_id batch files are derived from
+            batch_size: Results committed per transaction
+
+        Returns:
+            Counts of not_modified, unchanged, updated and failed articles
+        """
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute('PRAGMA journal_mode=WAL')
+        database.migrate_documents(conn)
+        docs = conn.execute(
+            "SELECT doc_id, url, etag, last_modified, content_hash FROM documents "
+            "WHERE url IS NOT NULL ORDER BY doc_id"
+        )
+
+        counts = {"not_modified": 0, "unchanged": 0, "updated": 0, "failed": 0}
+        results = []
+        in_flight = set()
+        executor = ThreadPoolExecutor(max_workers=self.max_workers)
+        try:
+            while True:
+                while len(in_flight) < self.max_in_flight:
+                    doc = docs.fetchone()
+                    if doc is None:
+                        break
+                    in_flight.add(executor.submit(self._refresh_article, *doc))
+                if not in_flight:
+                    break
+
+                done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                results.extend(future.result() for future in done)
+                if len(results) >= batch_size:
+                    self._write_refresh_batch(conn, results, counts, changed_path)
+                    results = []
+        except KeyboardInterrupt:
+            print("\nRefresh interrupted by user")
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            results.extend(future.result() for future in in_flight
+                           if not future.cancelled())
+            self._write_refresh_batch(conn, results, counts, changed_path)
+            conn.close()
+
+        print(f"\nRefreshed articles: {counts}")
+        return counts
+
+    def _refresh_article(self, doc_id, url, etag, last_modified, old_hash):
+        """
+        Worker side of refresh_articles.
+
+        Returns:
+            (status, doc_id, values) where status is not_modified, fetched
+            or failed and values holds what the writer needs
+        """
+        try:
+            fetched = self.get_article(url, etag, last_modified)
+            if fetched.status == 304:
+                return "not_modified", doc_id, None
+            page = parse_article(fetched.html) if fetched.html else None
+            if not page or not page[1]:
+                return "failed", doc_id, None
+
+            title, content, summary, _ = page
+            digest = database.content_hash(content)
+            return "fetched", doc_id, (title, summary, content, digest, old_hash,
+                                       fetched.etag, fetched.last_modified)
+        except Exception as e:
+            print(f"Error refreshing article {url}: {e}")
+            return "failed", doc_id, None
+
+    def _write_refresh_batch(self, conn, results, counts, changed_path):
+        fetched = [(doc_id, values) for status, doc_id, values in results if status == "fetched"]
+        for status, _, _ in results:
+            if status != "fetched":
+                counts[status] += 1
+
+        # articles stored before content hashes existed: hash what is stored
+        missing = [doc_id for doc_id, values in fetched if values[4] is None]
+        stored_hashes = {}
+        if missing:
+            placeholders = ','.join('?' * len(missing))
+            stored_hashes = {
+                row[0]: database.content_hash(database.decompress_content(row[1]))
+                for row in conn.execute(
+                    f"SELECT doc_id, content FROM document_content WHERE doc_id IN ({placeholders})",
+                    missing
+                )
+            }
+
+        validators, documents, contents, changed = [], [], [], []
+        for doc_id, (title, summary, content, digest, old_hash, etag, last_modified) in fetched:
+            if digest == (old_hash or stored_hashes.get(doc_id)):
+                counts["unchanged"] += 1
+                validators.append((etag, last_modified, digest, doc_id))
+                continue
+            counts["updated"] += 1
+            documents.append((title, summary, etag, last_modified, digest, doc_id))
+            contents.append((database.compress_content(content), doc_id))
+            changed.append(doc_id)
+
+        with conn:
+            conn.executemany(
+                "UPDATE documents SET etag = ?, last_modified = ?, content_hash = ? "
+                "WHERE doc_id = ?", validators
+            )
+            conn.executemany(
+                "UPDATE documents SET title = ?, summary = ?, etag = ?, last_modified = ?, "
+                "content_hash = ? WHERE doc_id = ?", documents
+            )
+            conn.executemany(
+                "UPDATE document_content SET content = ? WHERE doc_id = ?", contents
+            )
+        # after the commit, so the indexer only sees rewritten content
+        write_changed_batch(changed_path, sorted(changed))
+
+    def get_article(self, url, etag=None, last_modified=None) -> FetchResult:
+        """
+        Fetch an article, conditionally if validators from an earlier fetch
+        are given (the server then answers 304 when it has not changed).
+        """
         self._rate_limit()
+        headers = conditional_headers(etag, last_modified)
         try:
-            response = requests.get(f"https://en.wikipedia.org{url}",
-                                    headers=self.headers)
+            response = self.session.get(f"{self.base_url}{url}", headers=headers,
+                                        timeout=self.request_timeout)
             if response.status_code == 200:
-                return BeautifulSoup(response.content, 'html.parser')
-            print(f"Failed to fetch {url}: {response.status_code}")
-            return None
+                return FetchResult(200, response.content, response.headers.get('ETag'),
+                                   response.headers.get('Last-Modified'))
+            if response.status_code != 304:
+                print(f"Failed to fetch {url}: {response.status_code}")
+            return FetchResult(response.status_code, None, etag, last_modified)
         except requests.RequestException as e:
             print(f"Request error for {url}: {e}")
-            return None
+            return FetchResult(None, None, etag, last_modified)
     
     def get_wiki_token(self):
         """Get next available document ID."""
@@ -285,27 +596,59 @@ class WikiScraper:
         return (max_id or 0) + 1
 
 
-parser = argparse.ArgumentParser()
-
-# -r -s INITIAL_WIKI
-parser.add_argument("-r", '--randomize', action='store_true')
-parser.add_argument('-s', '--search', action='store')
-
-args = parser.parse_args()
-
-
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+
+    # -r -s INITIAL_WIKI
+    parser.add_argument("-r", '--randomize', action='store_true')
+    parser.add_argument('-s', '--search', action='store')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='Use the asyncio crawler (requires aiohttp)')
+    parser.add_argument('-c', '--concurrency', type=int, default=100,
+                        help='Concurrent requests for --async')
+    parser.add_argument('--base-url', default=WIKI_BASE_URL)
+    parser.add_argument('--refresh', action='store_true',
+                        help='Re-fetch stored articles, rewriting only changed ones')
+    parser.add_argument('--changed-docs', default='changed_docs.txt',
+                        help='Name of the batch files --refresh writes changed doc_ids to')
+    parser.add_argument('--max-in-flight', type=int,
+                        help='Articles submitted at once (default: twice the workers)')
+    parser.add_argument('--batch-size', type=int, default=100,
+                        help='Articles committed per transaction')
+    parser.add_argument('--flush-interval', type=float, default=1.0,
+                        help='Seconds before a partial batch is committed')
+    parser.add_argument('--near-duplicate-threshold', type=float, default=0.8,
+                        help='Similarity at which articles are clustered as near-duplicates '
+                             '(0 disables)')
+
+    args = parser.parse_args()
+
     print("Press ctrl + c to end search")
 
-    scraper = WikiScraper("./var/wiki.sqlite3")
+    # refresh always runs on the threaded scraper
+    if args.use_async and not args.refresh:
+        from async_scraper import AsyncWikiScraper
+        scraper = AsyncWikiScraper("./var/wiki.sqlite3", concurrency=args.concurrency,
+                                   base_url=args.base_url, batch_size=args.batch_size,
+                                   flush_interval=args.flush_interval,
+                                   near_duplicate_threshold=args.near_duplicate_threshold)
+    else:
+        scraper = WikiScraper("./var/wiki.sqlite3", base_url=args.base_url,
+                              max_in_flight=args.max_in_flight,
+                              batch_size=args.batch_size,
+                              flush_interval=args.flush_interval,
+                              near_duplicate_threshold=args.near_duplicate_threshold)
 
     if not args.search:
         args.search = "Dune_(novel)"
 
     start_time = time.time()
-    scraper.scrape_wikipedia(
-        f"/wiki/{args.search}"
-    )
+    if args.refresh:
+        scraper.refresh_articles(args.changed_docs, batch_size=args.batch_size)
+    else:
+        scraper.scrape_wikipedia(
+            f"/wiki/{args.search}"
+        )
     end_time = time.time()
 
     print("Elapsed time:", end_time - start_time, "seconds")
\ No newline at end of file
@@ -1,26 +1,15 @@
 """Initialize Flask app."""
 from flask import Flask
 from typing import Optional
-import sqlite3
 from contextlib import contextmanager
 
 @contextmanager
 def get_db():
-    """Get database connection."""
-    from flask import current_app
-    
-    db_path = current_app.config['DATABASE_PATH']
-    print(db_path)
-    conn = sqlite3.connect(db_path)
-    
-    try:
+    """Get database connection from the shared pool."""
+    import database
+
+    with database.get_db() as conn:
         yield conn
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
 
 
 def create_app(config_name: str = 'default') -> Flask:
@@ -48,8 +37,10 @@ def create_app(config_name: str = 'default') -> Flask:
     # Register blueprints
     from wikipedia_search.api import routes as api_routes
     from wikipedia_search.views import routes as view_routes
+    from wikipedia_search.metrics import metrics_bp
     app.register_blueprint(api_routes.api_bp)
     app.register_blueprint(view_routes.views_bp)
+    app.register_blueprint(metrics_bp)
 
     return app
 
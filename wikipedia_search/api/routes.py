@@ -1,44 +1,47 @@
 """API routes for the search engine."""
+import time
 import flask
-from flask import Blueprint, jsonify, request
-from wikipedia_search.search import search_index, search_engine
-from database import get_db
+from flask import Blueprint, current_app, jsonify, request
+from wikipedia_search.search import (
+    search_index, search_engine, snippet_generator, metadata_store, response_cache
+)
 from typing import List, Tuple
 
 api_bp = Blueprint('api', __name__, url_prefix='/api/v1')
 
+def flag(value: str) -> bool:
+    """Query string flag: 1, true or yes (any case) mean on, anything else off."""
+    return value.lower() in ('1', 'true', 'yes')
+
 def enhance_search_results(results: List[Tuple[int, float]]) -> List[dict]:
     """
     Enhance search results with document information from database.
+
+    Metadata comes from the metadata store, which needs at most one batched
+    query for docs it does not already hold.
     
     Args:
         results: List of (doc_id, score) tuples from search engine
         
     Returns:
-        List of dictionaries containing enhanced result information
+        List of dictionaries containing enhanced result information, in
+        score order
     """
     enhanced_results = []
     try:
-        with get_db() as conn:
-            for doc_id, score in results:
-                # Get document metadata
-                cur = conn.execute(
-                    """
-                    SELECT title, summary, url
-                    FROM documents 
-                    WHERE doc_id = ?
-                    """, 
-                    (doc_id,)
-                )
-                doc = cur.fetchone()
-                if doc:
-                    enhanced_results.append({
-                        "doc_id": doc_id,
-                        "score": float(score),
-                        "title": doc['title'],
-                        "summary": doc['summary'] or "No summary available",
-                        "url": doc['url']
-                    })
+        metadata = metadata_store.get_many(doc_id for doc_id, _ in results)
+
+        for doc_id, score in results:
+            doc = metadata.get(doc_id)
+            if doc:
+                title, summary, url = doc
+                enhanced_results.append({
+                    "doc_id": doc_id,
+                    "score": float(score),
+                    "title": title,
+                    "summary": summary or "No summary available",
+                    "url": url
+                })
 
     except Exception as e:
         print(f"Error enhancing results: {str(e)}")
@@ -47,6 +50,20 @@ def enhance_search_results(results: List[Tuple[int, float]]) -> List[dict]:
         
     return enhanced_results
 
+def add_snippets(results: List[dict], terms: List[str]) -> None:
+    """
+    Attach query-highlighted snippets to enhanced results in place.
+
+    Results whose content has no query term (e.g. a title-only match) keep
+    just their summary.
+    """
+    snippets = snippet_generator.generate([r["doc_id"] for r in results], terms)
+    for result in results:
+        snippet = snippets.get(result["doc_id"])
+        if snippet:
+            result["snippet"] = snippet["text"]
+            result["highlights"] = snippet["highlights"]
+
 @api_bp.route('/hello')
 def hello():
     """Test endpoint."""
@@ -55,19 +72,82 @@ def hello():
         "status": "success"
     })
 
+def posting_rows(documents, start: int, stop: int):
+    """
+    (doc_id, tfk, norm_factor) of postings[start:stop].
+
+    Shared index postings are read from their columns, without building a
+    dict per posting.
+    """
+    rows = getattr(documents, "rows", None)
+    if rows is not None:
+        return rows(start, stop)
+    return ((doc["doc_id"], doc["tfk"], doc["norm_factor"]) for doc in documents[start:stop])
+
+def postings_json(documents, start: int, stop: int, chunk: int):
+    """Yield postings[start:stop] as comma separated JSON objects, chunk at a time."""
+    for chunk_start in range(start, stop, chunk):
+        prefix = "," if chunk_start > start else ""
+        yield prefix + ",".join(
+            '{"doc_id":%d,"tfk":%r,"norm_factor":%r}' % row
+            for row in posting_rows(documents, chunk_start, min(chunk_start + chunk, stop)))
+
 @api_bp.route('/word/<string:word>/', methods=['GET'])
 def get_word(word: str):
-    """Get index entry for a specific word."""
-    
-    if word in search_index.inverted_index:
-        return jsonify({
-            "word": word,
-            "data": search_index.inverted_index[word]
-        })
-    
-    return flask.jsonify({
-        "error": f"Word '{word}' not found in index"
-    }), 404
+    """
+    Term statistics and a page of its postings.
+
+    Query parameters are offset (default 0) and limit (default and at most
+    WORD_POSTINGS_LIMIT; 0 returns only idf and df). next_offset is null
+    unless postings were returned and more follow. With stream=1 every
+    posting from offset on is sent, serialized a chunk at a time.
+    """
+    entry = search_index.inverted_index.get(word)
+    if entry is None:
+        return flask.jsonify({
+            "error": f"Word '{word}' not found in index"
+        }), 404
+
+    page_size = current_app.config.get('WORD_POSTINGS_LIMIT', 1000)
+    offset = request.args.get('offset', default=0, type=int)
+    limit = request.args.get('limit', default=page_size, type=int)
+    stream = request.args.get('stream', default=False, type=flag)
+    if offset < 0 or limit < 0:
+        return flask.jsonify({"error": "offset and limit must not be negative"}), 400
+
+    documents = entry["documents"]
+    df = len(documents)
+    start = min(offset, df)
+    stop = df if stream else min(start + min(limit, page_size), df)
+
+    head = '{"word":%s,"data":{"idf":%s,"df":%d,"documents":[' % (
+        flask.json.dumps(word), flask.json.dumps(entry["idf"]), df)
+    tail = ']},"offset":%d,"limit":%d,"next_offset":%s}' % (
+        # null once nothing more follows, or when this page was empty
+        offset, stop - start, stop if start < stop < df else "null")
+
+    if not stream:
+        return current_app.response_class(
+            head + "".join(postings_json(documents, start, stop, page_size)) + tail,
+            mimetype='application/json')
+
+    def generate():
+        yield head
+        yield from postings_json(documents, start, stop, page_size)
+        yield tail
+
+    return current_app.response_class(generate(), mimetype='application/json')
+
+def cached_response(etag: str, body: bytes) -> flask.Response:
+    """JSON response with validators; 304 if the client already has this ETag."""
+    if request.if_none_match.contains(etag):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = (
+        f"public, max-age={current_app.config.get('HTTP_CACHE_MAX_AGE', 0)}, must-revalidate")
+    return response
 
 @api_bp.route('/hits/', methods=['GET'])
 def get_hits():
@@ -79,21 +159,63 @@ def get_hits():
         
         # set optional parameters
         k = request.args.get('k', default=10, type=int)
-        strict = request.args.get('strict', default=True, type=bool)
+        strict = request.args.get('strict', default=True, type=flag)
+        timeout_ms = request.args.get(
+            'timeout_ms',
+            default=current_app.config.get('SEARCH_TIMEOUT_MS', 0),
+            type=int
+        )
+
+        autocorrect = request.args.get('autocorrect', default=False, type=flag)
+
+        # normalized query and parsed parameters, so "Python", "python " and
+        # "python" with or without k=10 share an entry; timeout_ms is left
+        # out as only complete (budget-independent) results are kept
+        normalized = ' '.join(search_engine.clean_query(query))
+        cache_key = (normalized, k, strict, autocorrect)
+        index_version = search_index.version
+        start_time = time.perf_counter()
+        cached = response_cache.lookup(cache_key, index_version)
+        if cached is not None:
+            etag, body, doc_ids = cached
+            # still a search as far as the metrics and hot docs are concerned
+            search_engine.metrics.record_search_time(time.perf_counter() - start_time, len(doc_ids))
+            metadata_store.record_returned(doc_ids)
+            return cached_response(etag, body)
+
+        # only unknown terms are looked up, so this is cheap for clean queries
+        did_you_mean = search_engine.suggest_query(query)
+        search_query = did_you_mean if autocorrect and did_you_mean else query
 
         # use search engine to search query
-        search_results = search_engine.search(query, k=k, strict_match=strict)
-        # print(search_results)
+        search_results = search_engine.search(
+            search_query, k=k, strict_match=strict, timeout_ms=timeout_ms
+        )
 
         enhanced_results = enhance_search_results(search_results)
 
-        return jsonify({
-            "query": query,
+        if current_app.config.get('SNIPPETS_ENABLED', False):
+            add_snippets(enhanced_results, search_engine.clean_query(search_query))
+
+        response = jsonify({
+            # the normalized form, as the body is shared by every spelling
+            "query": normalized,
             "num_results": len(enhanced_results),
             "results": enhanced_results,
             "strict_match": strict,
+            "partial": search_results.partial,
+            "did_you_mean": did_you_mean,
+            "corrected": search_query != query,
+            # kept in cached responses: the time of the search that built it
             "search_time" : search_engine.metrics.most_recent_search_time
         })
+        # partial results depend on the budget, never reuse them
+        if search_results.partial:
+            return response
+        body = response.get_data()
+        doc_ids = [doc_id for doc_id, _ in search_results]
+        return cached_response(
+            response_cache.store(cache_key, index_version, body, doc_ids), body)
 
     except Exception as e:
         return jsonify({
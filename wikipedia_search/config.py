@@ -12,11 +12,72 @@ class Config:
     DATABASE_POOL_SIZE = 10
     DATABASE_TIMEOUT = 30
 
+    # 'read_only' serves requests from read-only, query_only connections with
+    # per-thread affinity and tuned pragmas; 'default' is the read/write queue pool
+    DATABASE_POOL_MODE = 'read_only'
+    DATABASE_MMAP_SIZE = 256 * 1024 * 1024
+    DATABASE_CACHE_SIZE_KIB = 64 * 1024
+
     INDEX_PATH = os.path.join(BASE_DIR, '../data/')
     STOPWORDS_PATH = os.path.join(BASE_DIR, '../data/stop_words.txt')
 
+    # Incremental segments written by inverted_index/segment_indexer.py,
+    # polled every INDEX_SEGMENT_POLL_SECONDS (0 loads them only at startup)
+    INDEX_SEGMENTS_PATH = os.path.join(BASE_DIR, '../data/segments/')
+    INDEX_SEGMENT_POLL_SECONDS = 2.0
+    # Terms whose merged base + segment postings are cached (LRU) per view
+    INDEX_SEGMENT_CACHE_SIZE = 10000
+    # Recompute every document magnitude (the idf they use) once segments
+    # have changed the live document count by this fraction
+    INDEX_MAGNITUDE_DRIFT = 0.05
+
+    # Serve the index from one read-only file that every worker process
+    # mmaps (written from the part files on first start) instead of
+    # per-process dicts, for pre-fork servers with several workers
+    INDEX_SHARED_MEMORY = os.getenv('INDEX_SHARED_MEMORY', '0') == '1'
+    INDEX_SHARED_PATH = os.path.join(BASE_DIR, '../data/index.shared')
+
     MAX_SEARCH_RESULTS = 10
 
+    # Postings per /api/v1/word/<word>/ page: the default and largest limit
+    # (stream=1 sends every posting from offset on, in chunks of this size)
+    WORD_POSTINGS_LIMIT = 1000
+
+    # Serialized /api/v1/hits/ responses, keyed by query parameters and
+    # emptied when the index changes; 0 disables. Responses carry an ETag
+    # and clients may reuse them for HTTP_CACHE_MAX_AGE seconds before
+    # revalidating with If-None-Match (answered with 304 Not Modified)
+    RESPONSE_CACHE_SIZE = 2000
+    HTTP_CACHE_MAX_AGE = 0
+
+    # 'tfidf' (in-memory inverted index) or 'fts5' (SQLite full-text index
+    # built with `./bin/wikidb fts`)
+    SEARCH_BACKEND = os.getenv('SEARCH_BACKEND', 'tfidf')
+
+    # Default per-request latency budget for /api/v1/hits/, overridable with
+    # ?timeout_ms=. 0 disables the budget.
+    SEARCH_TIMEOUT_MS = 250
+
+    # Symmetric-delete spelling index for "did you mean" / ?autocorrect=1.
+    # Memory grows with vocabulary * deletes per term, so rare terms (likely
+    # corpus typos) are left out and only a prefix of each term is expanded.
+    SPELLING_CORRECTION = True
+    SPELLING_MAX_EDIT_DISTANCE = 2
+    SPELLING_PREFIX_LENGTH = 7
+    SPELLING_MIN_DOC_FREQ = 2
+
+    # Query-highlighted snippets read from document_content for the top-k
+    SNIPPETS_ENABLED = True
+    SNIPPET_LENGTH = 200
+    SNIPPET_CACHE_SIZE = 5000
+
+    # Result metadata (title/summary/url): 'memory' loads every document row
+    # at startup, 'lru' caches METADATA_CACHE_SIZE docs and warms from the
+    # most returned docs of the previous run, 'none' always queries SQLite
+    METADATA_CACHE_MODE = 'lru'
+    METADATA_CACHE_SIZE = 20000
+    METADATA_HOT_DOCS_PATH = os.path.join(BASE_DIR, '..', 'var', 'hot_docs.txt')
+
     DEBUG = False
 
 class DevelopmentConfig(Config):
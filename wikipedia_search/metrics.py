@@ -0,0 +1,217 @@
+"""Prometheus-compatible metrics endpoint for the search engine."""
+import time
+import resource
+import threading
+from bisect import bisect_left
+from typing import Dict, List, Sequence
+
+from flask import Blueprint, Response
+
+metrics_bp = Blueprint('metrics', __name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Latency buckets in seconds, roughly 0.5ms to 2.5s
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                   0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+RESULT_COUNT_BUCKETS = (0, 1, 5, 10, 20, 50, 100)
+
+_PROCESS_START_TIME = time.time()
+_PAGE_SIZE = resource.getpagesize()
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram.
+
+    Observations only increment a counter, so recording and scraping stay
+    O(number of buckets) no matter how many searches have been served.
+    """
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """Record a single observation."""
+        # first bucket whose upper bound is >= value; past the end means +Inf only
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            if i < len(self.counts):
+                self.counts[i] += 1
+            self.count += 1
+            self.sum += value
+
+    def snapshot(self):
+        """Return (cumulative bucket counts, count, sum) taken atomically."""
+        with self._lock:
+            counts = list(self.counts)
+            count, total = self.count, self.sum
+
+        cumulative = []
+        running = 0
+        for c in counts:
+            running += c
+            cumulative.append(running)
+        return cumulative, count, total
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        if value == float('inf'):
+            return '+Inf'
+        return repr(value)
+    return str(value)
+
+
+def _add_metric(lines: List[str], name: str, metric_type: str, help_text: str,
+                samples: Dict[str, float]) -> None:
+    """Append one metric family; samples maps label string -> value."""
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {metric_type}")
+    for labels, value in samples.items():
+        lines.append(f"{name}{labels} {_format_value(value)}")
+
+
+def _add_histogram(lines: List[str], name: str, help_text: str,
+                   histogram: Histogram) -> None:
+    cumulative, count, total = histogram.snapshot()
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for bound, value in zip(histogram.buckets, cumulative):
+        lines.append(f'{name}_bucket{{le="{_format_value(float(bound))}"}} {value}')
+    lines.append(f'{name}_bucket{{le="+Inf"}} {count}')
+    lines.append(f"{name}_sum {_format_value(float(total))}")
+    lines.append(f"{name}_count {count}")
+
+
+def _process_memory() -> Dict[str, float]:
+    """Current RSS/VMS from /proc (Linux), falling back to peak RSS."""
+    memory = {}
+    try:
+        with open('/proc/self/statm', mode='r') as file:
+            vms_pages, rss_pages = file.read().split()[:2]
+        memory['resident'] = int(rss_pages) * _PAGE_SIZE
+        memory['virtual'] = int(vms_pages) * _PAGE_SIZE
+    except (OSError, ValueError):
+        pass
+
+    # ru_maxrss is KiB on Linux
+    memory['max_resident'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    memory.setdefault('resident', memory['max_resident'])
+    return memory
+
+
+def render_metrics() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    import database
+    from wikipedia_search.search import (
+        search_index, search_engine, metadata_store, response_cache
+    )
+
+    lines = []
+    metrics = search_engine.metrics
+
+    # Search
+    _add_histogram(lines, 'wiki_search_latency_seconds',
+                   'Time spent answering search queries.',
+                   metrics.latency_histogram)
+    _add_histogram(lines, 'wiki_search_results',
+                   'Number of results returned per search.',
+                   metrics.results_histogram)
+
+    cache_hits, cache_misses = metrics.cache_counts()
+    _add_metric(lines, 'wiki_search_cache_hits_total', 'counter',
+                'Searches answered from the result cache.', {'': cache_hits})
+    _add_metric(lines, 'wiki_search_cache_misses_total', 'counter',
+                'Searches that had to be scored.', {'': cache_misses})
+    _add_metric(lines, 'wiki_search_partial_total', 'counter',
+                'Searches that hit their latency budget and returned partial results.',
+                {'': metrics.partial_searches})
+    _add_metric(lines, 'wiki_search_cache_entries', 'gauge',
+                'Entries currently held in the result cache.',
+                {'': search_engine.cache_size()})
+
+    _add_metric(lines, 'wiki_response_cache_hits_total', 'counter',
+                'Search responses served as cached bytes.', {'': response_cache.hits})
+    _add_metric(lines, 'wiki_response_cache_misses_total', 'counter',
+                'Search responses that had to be built.', {'': response_cache.misses})
+    _add_metric(lines, 'wiki_response_cache_entries', 'gauge',
+                'Responses currently held in the response cache.',
+                {'': len(response_cache)})
+
+    _add_metric(lines, 'wiki_metadata_cache_hits_total', 'counter',
+                'Result metadata lookups served without SQLite.',
+                {'': metadata_store.hits})
+    _add_metric(lines, 'wiki_metadata_cache_misses_total', 'counter',
+                'Result metadata lookups that queried SQLite.',
+                {'': metadata_store.misses})
+
+    # Index
+    index_stats = search_index.stats()
+    _add_metric(lines, 'wiki_index_terms', 'gauge',
+                'Distinct terms in the inverted index.', {'': index_stats['terms']})
+    _add_metric(lines, 'wiki_index_postings', 'gauge',
+                'Postings in the inverted index.', {'': index_stats['postings']})
+    _add_metric(lines, 'wiki_index_documents', 'gauge',
+                'Documents in the inverted index.', {'': index_stats['documents']})
+    _add_metric(lines, 'wiki_index_segments', 'gauge',
+                'Incremental segments loaded on top of the index parts.',
+                {'': index_stats['segments']})
+    _add_metric(lines, 'wiki_index_size_bytes', 'gauge',
+                'On-disk size of the loaded index parts.', {'': index_stats['bytes']})
+    _add_metric(lines, 'wiki_index_load_seconds', 'gauge',
+                'Time taken by the last index load.',
+                {'': float(index_stats['load_time'])})
+
+    # Database pool
+    if database.pool is not None:
+        pool_stats = database.pool.stats()
+        _add_metric(lines, 'wiki_db_pool_connections', 'gauge',
+                    'Database pool connections by state.', {
+                        '{state="active"}': pool_stats['active'],
+                        '{state="idle"}': pool_stats['idle'],
+                    })
+        _add_metric(lines, 'wiki_db_pool_saturation', 'gauge',
+                    'Fraction of the pool checked out.', {'': float(pool_stats['saturation'])})
+        _add_metric(lines, 'wiki_db_pool_max_connections', 'gauge',
+                    'Configured maximum pool size.', {'': pool_stats['max_connections']})
+        _add_metric(lines, 'wiki_db_pool_waits_total', 'counter',
+                    'Connection requests that had to wait for a free connection.',
+                    {'': pool_stats['waits']})
+        _add_metric(lines, 'wiki_db_pool_wait_seconds_total', 'counter',
+                    'Total time spent waiting for a free connection.',
+                    {'': float(pool_stats['wait_time'])})
+        _add_metric(lines, 'wiki_db_pool_timeouts_total', 'counter',
+                    'Connection requests that timed out.', {'': pool_stats['timeouts']})
+
+    # Process
+    memory = _process_memory()
+    _add_metric(lines, 'process_resident_memory_bytes', 'gauge',
+                'Resident memory size in bytes.', {'': memory['resident']})
+    if 'virtual' in memory:
+        _add_metric(lines, 'process_virtual_memory_bytes', 'gauge',
+                    'Virtual memory size in bytes.', {'': memory['virtual']})
+    _add_metric(lines, 'process_max_resident_memory_bytes', 'gauge',
+                'Peak resident memory size in bytes.', {'': memory['max_resident']})
+
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    _add_metric(lines, 'process_cpu_seconds_total', 'counter',
+                'Total user and system CPU time spent in seconds.',
+                {'': float(usage.ru_utime + usage.ru_stime)})
+    _add_metric(lines, 'process_start_time_seconds', 'gauge',
+                'Start time of the process since unix epoch in seconds.',
+                {'': float(_PROCESS_START_TIME)})
+    _add_metric(lines, 'process_threads', 'gauge',
+                'Number of Python threads.', {'': threading.active_count()})
+
+    lines.append('')
+    return '\n'.join(lines)
+
+
+@metrics_bp.route('/metrics')
+def metrics():
+    """Expose metrics for Prometheus scraping."""
+    return Response(render_metrics(), content_type=CONTENT_TYPE)
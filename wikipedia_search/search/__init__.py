@@ -1,20 +1,84 @@
 """Search package initialization. Manages the search index instance."""
 from wikipedia_search.search.index_loader import SearchIndex
 from wikipedia_search.search.search_engine import SearchEngine
+from wikipedia_search.search.snippets import SnippetGenerator
+from wikipedia_search.search.metadata import DocumentMetadataStore
+from wikipedia_search.search.cache import LRUCache, ResponseCache
+import atexit
 
 # Create global search index and engine instances
 print("Creating empty search objects...")
 search_index = SearchIndex()
 search_engine = SearchEngine(search_index)
+snippet_generator = SnippetGenerator()
+metadata_store = DocumentMetadataStore()
+response_cache = ResponseCache()
 
 def init_app(app):
     """Initialize search index with application config."""
-    print("Loading index data")
-    search_index.load_index(
-        app.config['INDEX_PATH'],
-        app.config['STOPWORDS_PATH']
+    global search_engine
+
+    if app.config.get('SEARCH_BACKEND', 'tfidf') == 'fts5':
+        # rebinds the module global, so this must run before anything does
+        # `from wikipedia_search.search import search_engine` (create_app
+        # registers the blueprints afterwards)
+        from wikipedia_search.search.fts_engine import FTSSearchEngine
+        print("Using FTS5 search backend")
+        search_engine = FTSSearchEngine(search_index)
+        search_index.load_stopwords(app.config['STOPWORDS_PATH'])
+    else:
+        if app.config.get('INDEX_SHARED_MEMORY', False):
+            print("Mapping shared index")
+            search_index.load_shared_index(
+                app.config['INDEX_PATH'],
+                app.config['STOPWORDS_PATH'],
+                app.config['INDEX_SHARED_PATH'],
+                search_engine.title_terms
+            )
+        else:
+            print("Loading index data")
+            search_index.load_index(
+                app.config['INDEX_PATH'],
+                app.config['STOPWORDS_PATH']
+            )
+        search_index.on_segments_loaded = _apply_segments
+        search_index.segment_cache_size = app.config.get('INDEX_SEGMENT_CACHE_SIZE', 10000)
+        search_engine.magnitude_drift = app.config.get('INDEX_MAGNITUDE_DRIFT', 0.05)
+        segments_path = app.config.get('INDEX_SEGMENTS_PATH')
+        if segments_path:
+            search_index.load_segments(segments_path)
+            search_index.start_segment_poller(
+                segments_path, app.config.get('INDEX_SEGMENT_POLL_SECONDS', 0))
+    search_engine.metrics.last_load_time = search_index.load_time
+
+    snippet_generator.snippet_length = app.config.get('SNIPPET_LENGTH', 200)
+    snippet_generator.cache = LRUCache(maxsize=app.config.get('SNIPPET_CACHE_SIZE', 5000))
+    response_cache.maxsize = app.config.get('RESPONSE_CACHE_SIZE', 1000)
+
+    metadata_store.configure(
+        app.config.get('METADATA_CACHE_MODE', 'none'),
+        cache_size=app.config.get('METADATA_CACHE_SIZE', 20000),
+        hot_docs_path=app.config.get('METADATA_HOT_DOCS_PATH')
     )
+    metadata_store.load()
+    atexit.register(metadata_store.save_hot_docs)
+
+    if app.config.get('SPELLING_CORRECTION', False):
+        search_engine.build_spelling_index(
+            max_edit_distance=app.config['SPELLING_MAX_EDIT_DISTANCE'],
+            prefix_length=app.config['SPELLING_PREFIX_LENGTH'],
+            min_doc_freq=app.config['SPELLING_MIN_DOC_FREQ']
+        )
     print("Index Loaded!")
 
+def _apply_segments(index, changed_doc_ids):
+    """Update the engine and drop cached data of re-indexed documents."""
+    search_engine.apply_segments(index, changed_doc_ids)
+    if changed_doc_ids:
+        metadata_store.invalidate(changed_doc_ids)
+        # snippet keys include the query terms, so drop them all
+        snippet_generator.cache.clear()
+
 # Make these available when importing from search package
-__all__ = ['search_index', 'init_app', 'search_engine']
\ No newline at end of file
+__all__ = ['search_index', 'init_app', 'search_engine', 'snippet_generator',
+           'metadata_store', 'response_cache']
\ No newline at end of file
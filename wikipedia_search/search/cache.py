@@ -0,0 +1,102 @@
+"""Small thread-safe LRU cache shared by the search components."""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Hashable, List, Optional, Tuple
+
+
+class LRUCache:
+    """
+    Thread-safe least-recently-used cache.
+
+    Unlike functools.lru_cache the caller decides what gets stored, which lets
+    the search engine skip caching partial (deadline-cut) results.
+    """
+    def __init__(self, maxsize: int = 1000):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Return cached value for key (marking it recently used) or default."""
+        with self._lock:
+            try:
+                self._data.move_to_end(key)
+            except KeyError:
+                return default
+            return self._data[key]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        """Store value, evicting the least recently used entry when full."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Optional[Any] = None) -> Any:
+        """Remove and return the value for key, or default."""
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class ResponseCache(LRUCache):
+    """
+    LRU cache of serialized HTTP responses, (etag, body bytes, doc ids of
+    the results in the body) per key.
+
+    Entries belong to one index version: the first lookup with a newer
+    version empties the cache, so a reload invalidates every response
+    without the loaders knowing about the cache.
+    """
+    def __init__(self, maxsize: int = 1000):
+        super().__init__(maxsize)
+        self.version = None
+        self.hits = 0
+        self.misses = 0
+
+    def lookup(self, key: Hashable, version: Hashable) -> Optional[Tuple[str, bytes, List[int]]]:
+        """Cached (etag, body, doc ids) for key under index version, or None."""
+        with self._lock:
+            if version != self.version:
+                self._data.clear()
+                self.version = version
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+            else:
+                self._data.move_to_end(key)
+                self.hits += 1
+            return entry
+
+    def store(self, key: Hashable, version: Hashable, body: bytes,
+              doc_ids: List[int]) -> str:
+        """
+        Cache a response body and return its ETag.
+
+        Bodies built while the index changed underneath are not kept.
+
+        Args:
+            key: Request parameters
+            version: Index version the response was built from
+            body: Serialized response
+            doc_ids: Result doc ids in the body, for the metrics of hits
+        """
+        etag = hashlib.sha1(body).hexdigest()
+        if version == self.version:
+            self.put(key, (etag, body, doc_ids))
+        return etag
@@ -0,0 +1,95 @@
+"""
+Alternate search backend on SQLite's FTS5 full-text index.
+
+Shares SearchEngine's query cleaning, result cache, metrics, spelling
+suggestions and latency budget, but ranks with FTS5's built-in BM25 instead
+of the in-memory TF-IDF index. The documents_fts table is built with
+`./bin/wikidb fts`.
+"""
+import sqlite3
+import time
+from typing import Optional
+
+import database
+from wikipedia_search.search.index_loader import SearchIndex
+from wikipedia_search.search.search_engine import SearchEngine, SearchResults
+
+# SQLite VM instructions between deadline checks
+PROGRESS_HANDLER_STEPS = 10000
+
+
+class FTSSearchEngine(SearchEngine):
+    def __init__(self, index: SearchIndex, title_weight: float = 10.0,
+                 content_weight: float = 1.0):
+        """
+        Args:
+            index: SearchIndex, only its stopwords are used
+            title_weight: BM25 weight of the title column
+            content_weight: BM25 weight of the content column
+        """
+        super().__init__(index)
+        self.title_weight = title_weight
+        self.content_weight = content_weight
+
+        # no in-memory postings to post-process
+        self.search_index.on_index_loaded = None
+
+    def _vocabulary(self):
+        with database.get_db() as conn:
+            cur = conn.execute("SELECT term, doc FROM documents_fts_vocab")
+            return [(row[0], row[1]) for row in cur]
+
+    def _has_term(self, term: str) -> bool:
+        if self.spelling is not None:
+            return term in self.spelling.frequencies
+        return True
+
+    def _search(self, query: str, k: int, strict_match: bool,
+                deadline: Optional[float] = None):
+        """
+        Search query with FTS5 BM25 ranking.
+
+        Args:
+            query: Search string
+            k: Number of results requested to return
+            strict_match: Requires all query terms to be present if True
+            deadline: time.monotonic() value after which the SQLite query is
+                interrupted. BM25 ordering needs every match, so an
+                interrupted query returns no results (flagged partial).
+
+        Returns:
+            SearchResults of (doc_id, score) pairs, higher scores first
+        """
+        terms = list(dict.fromkeys(self.clean_query(query)))
+        if not terms:
+            return SearchResults()
+
+        operator = ' AND ' if strict_match else ' OR '
+        match = operator.join(f'"{term}"' for term in terms)
+
+        try:
+            with database.get_db() as conn:
+                if deadline is not None:
+                    conn.set_progress_handler(
+                        lambda: 1 if time.monotonic() >= deadline else 0,
+                        PROGRESS_HANDLER_STEPS
+                    )
+                try:
+                    cur = conn.execute(
+                        "SELECT rowid, bm25(documents_fts, ?, ?) AS rank "
+                        "FROM documents_fts WHERE documents_fts MATCH ? "
+                        "ORDER BY rank LIMIT ?",
+                        (self.title_weight, self.content_weight, match, k)
+                    )
+                    rows = cur.fetchall()
+                finally:
+                    if deadline is not None:
+                        conn.set_progress_handler(None, 0)
+        except sqlite3.OperationalError as e:
+            if deadline is not None and time.monotonic() >= deadline:
+                return SearchResults(partial=True)
+            self.logger.error(f"FTS search error: {str(e)}")
+            raise
+
+        # bm25() is lower-is-better, flip it so results sort like TF-IDF scores
+        return SearchResults([(int(row[0]), -float(row[1])) for row in rows])
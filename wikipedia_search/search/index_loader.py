@@ -1,6 +1,18 @@
 """Load and manage inverted index."""
 import os
+import json
+import time
+import hashlib
 import logging
+import threading
+from typing import List
+
+from wikipedia_search.search.segments import Segment, SegmentedIndex, read_manifest
+from wikipedia_search.search.shared_index import open_shared_index
+
+# Written next to the part files by inverted_index/build_index.py or
+# inverted_index/manifest.py
+INDEX_MANIFEST = 'manifest.json'
 
 class SearchIndex:
     def __init__(self):
@@ -8,8 +20,29 @@ class SearchIndex:
         self.stopwords = set()
         self.doc_lengths = {}
         self.total_docs = 0
+        self.total_postings = 0
+        self.index_bytes = 0
+        self.load_time = 0.0
+        # bumped whenever search results may change (loads, segments that
+        # change documents), for caches of whole responses
+        self.version = 0
+        self.manifest = None
+        # SharedIndex when the index is served from the mmap'd shared file
+        self.shared = None
         self.on_index_loaded = None
 
+        # incremental segments on top of the part files (segments.py)
+        self.base_index = self.inverted_index
+        self.segments: List[Segment] = []
+        self.segments_generation = 0
+        self.segments_max_update = 0
+        # merged posting lists each segment view keeps (SegmentedIndex)
+        self.segment_cache_size = 10000
+        # called with (new view, changed doc ids) before the view is swapped in
+        self.on_segments_loaded = None
+        self._segments_lock = threading.Lock()
+        self._poller = None
+
         logging.basicConfig(
             filename='var/log/index_loader.log',
             level=logging.INFO,
@@ -19,7 +52,7 @@ class SearchIndex:
     
     def load_index(self, index_path, stopwords_path):
         """
-        Load three-part inverted index and stopwords.
+        Load the inverted index parts and stopwords.
         
         Args:
             index_path: Base path to index files
@@ -27,47 +60,175 @@ class SearchIndex:
         
         Raises:
             FileNotFoundError: If index or stopwords files not found
-            ValueError: If index files are malformed
+            ValueError: If index files are malformed or do not match the
+                manifest
         """
         try:
-            self._load_stopwords(stopwords_path)
+            start_time = time.perf_counter()
+            self.load_stopwords(stopwords_path)
+
+            for part, expected in self.index_parts(index_path):
+                self._load_index_part(part, expected)
+                self.index_bytes += os.path.getsize(part)
 
-            for i in range(3):
-                part = os.path.join(index_path, f'part-0000{i}')
-                if not os.path.exists(part):
-                    raise FileNotFoundError(f"Index part not found: {part}")
-                self._load_index_part(part)
+            self.base_index = self.inverted_index
 
             if self.on_index_loaded:
                 self.on_index_loaded()
+            self.version += 1
+
+            self.load_time = time.perf_counter() - start_time
+            self.logger.info(
+                f"Loaded {len(self.inverted_index)} terms in {self.load_time:.2f}s"
+            )
 
         except Exception as e:
             self.logger.error(f"Error loading index: {str(e)}")
             raise
 
 
-    def _load_stopwords(self, stopwords_path):
+    def load_shared_index(self, index_path, stopwords_path, shared_path, title_terms):
+        """
+        Map the index from a shared file instead of loading it into dicts.
+
+        Every process serving the index maps the same read-only file, so
+        memory stays at about one index regardless of the number of
+        workers. The file is written from the part files by the first
+        process to find it missing or out of date (the parts or stopwords
+        changed); titles are those in the database at that time.
+
+        Args:
+            index_path: Base path to index files
+            stopwords_path: Path to stopwords file
+            shared_path: Shared index file, created if needed
+            title_terms: Callable returning (doc_id, title terms) of every
+                document, used when the file is written
+
+        Raises:
+            FileNotFoundError: If index or stopwords files not found
+            ValueError: If index files are malformed or do not match the
+                manifest
+        """
+        try:
+            start_time = time.perf_counter()
+            self.load_stopwords(stopwords_path)
+
+            parts = self.index_parts(index_path)
+
+            def check(checks):
+                for (part, expected), (sha256, terms) in zip(parts, checks):
+                    if expected is not None:
+                        self._check_part(part, expected, sha256, terms)
+
+            shared = open_shared_index(
+                shared_path, self._fingerprint(parts, stopwords_path),
+                [part for part, _ in parts], title_terms, check)
+
+            self.shared = shared
+            self.inverted_index = self.base_index = shared
+            self.doc_lengths = shared.norms
+            self.total_docs = shared.header["max_doc_id"] + 1
+            self.total_postings = shared.total_postings
+            self.index_bytes = shared.size
+
+            if self.on_index_loaded:
+                self.on_index_loaded()
+            self.version += 1
+
+            self.load_time = time.perf_counter() - start_time
+            self.logger.info(
+                f"Mapped {len(shared)} terms from {shared_path} in {self.load_time:.2f}s"
+            )
+
+        except Exception as e:
+            self.logger.error(f"Error loading shared index: {str(e)}")
+            raise
+
+    @staticmethod
+    def _fingerprint(parts, stopwords_path):
+        """Identifies the part files and stopwords a shared index file is built from."""
+        digest = hashlib.sha256()
+        for part, expected in parts:
+            if expected is not None:
+                digest.update(f"{expected['name']} {expected['sha256']}\n".encode('utf-8'))
+            else:
+                stat = os.stat(part)
+                digest.update(f"{part} {stat.st_size} {stat.st_mtime_ns}\n".encode('utf-8'))
+        with open(stopwords_path, mode='rb') as file:
+            digest.update(file.read())
+        return digest.hexdigest()
+
+    def load_stopwords(self, stopwords_path):
+        """Load stopwords only (all the FTS5 backend needs from the index)."""
+        start_time = time.perf_counter()
         if not os.path.exists(stopwords_path):
             raise FileNotFoundError(f"Stopwords file not found: {stopwords_path}")
         
         with open(stopwords_path, mode='r', encoding='utf-8') as file:
             self.stopwords = {line.strip() for line in file}
 
+        self.load_time = time.perf_counter() - start_time
         self.logger.info(f"Loaded {len(self.stopwords)} stopwords")
 
 
-    def _load_index_part(self, file_path):
+    def index_parts(self, index_path):
+        """
+        Part files to load, with their manifest entries.
+
+        The parts listed in manifest.json are used when the build wrote one,
+        after checking they all exist with the recorded sizes. Otherwise
+        every part-* file in index_path is loaded unchecked.
+
+        Returns:
+            List of (path, manifest entry or None)
+        """
+        manifest_path = os.path.join(index_path, INDEX_MANIFEST)
+        if not os.path.exists(manifest_path):
+            names = sorted(name for name in os.listdir(index_path)
+                           if name.startswith('part-') and not name.endswith('.tmp'))
+            if not names:
+                raise FileNotFoundError(f"No index parts found in {index_path}")
+            self.logger.warning(f"No {INDEX_MANIFEST} in {index_path}, loading {len(names)} parts unchecked")
+            return [(os.path.join(index_path, name), None) for name in names]
+
+        with open(manifest_path, mode='r', encoding='utf-8') as file:
+            manifest = json.load(file)
+
+        parts = []
+        for entry in manifest["partitions"]:
+            part = os.path.join(index_path, entry["name"])
+            if not os.path.exists(part):
+                raise FileNotFoundError(f"Index part not found: {part}")
+            size = os.path.getsize(part)
+            if size != entry["bytes"]:
+                raise ValueError(f"Index part {part} is {size} bytes, manifest expects {entry['bytes']}")
+            parts.append((part, entry))
+
+        self.manifest = manifest
+        self.logger.info(
+            f"Index manifest: {len(parts)} partitions, {manifest['terms']} terms, "
+            f"{manifest.get('documents')} documents"
+        )
+        return parts
+
+    def _load_index_part(self, file_path, expected=None):
         """
         Load single part of inverted index.
         
         Args:
             file_path: Path to index part file
+            expected: Manifest entry of the part, checked after loading
             
         Raises:
-            ValueError: If index file data is malformed
+            ValueError: If index file data is malformed or does not match
+                the manifest entry
         """
-        with open(file_path, mode='r', encoding='utf-8') as file:
-            for line_num, line in enumerate(file, 1):
+        digest = hashlib.sha256()
+        terms = 0
+        with open(file_path, mode='rb') as file:
+            for line_num, raw_line in enumerate(file, 1):
+                digest.update(raw_line)
+                line = raw_line.decode('utf-8')
                 try:
                     data = line.split()
                     if len(data) < 2:
@@ -75,6 +236,7 @@ class SearchIndex:
 
                     word = data[0]
                     idf = float(data[1])
+                    terms += 1
 
                     if word not in self.inverted_index:
                         self.inverted_index[word] = {
@@ -97,6 +259,7 @@ class SearchIndex:
                             "norm_factor": norm_factor
                         }
                         self.inverted_index[word]["documents"].append(doc_entry)
+                        self.total_postings += 1
 
                         # update doc tracking
                         self.doc_lengths[doc_id] = norm_factor
@@ -109,5 +272,99 @@ class SearchIndex:
                     raise ValueError(
                         f"Malformed index entry at {line_num}"
                     ) from e
- 
 
+        if expected is not None:
+            self._check_part(file_path, expected, digest.hexdigest(), terms)
+
+    @staticmethod
+    def _check_part(file_path, expected, sha256, terms):
+        """Raise ValueError if a parsed part differs from its manifest entry."""
+        if sha256 != expected["sha256"]:
+            raise ValueError(f"Index part {file_path} does not match its manifest checksum")
+        if terms != expected["terms"]:
+            raise ValueError(
+                f"Index part {file_path} has {terms} terms, manifest expects {expected['terms']}"
+            )
+
+    def load_segments(self, segments_path):
+        """
+        Bring the index up to date with the segments manifest.
+
+        Segments already in memory are kept, new ones are read and the
+        combined view replaces inverted_index in one assignment, so
+        searches see either the old or the new view.
+
+        Args:
+            segments_path: Directory written by segment_indexer.py
+
+        Returns:
+            True if the manifest changed since the last call
+        """
+        with self._segments_lock:
+            manifest = read_manifest(segments_path)
+            if manifest["generation"] == self.segments_generation:
+                return False
+
+            start_time = time.perf_counter()
+            loaded = {segment.name: segment for segment in self.segments}
+            segments = [loaded.get(entry["name"]) or Segment.load(segments_path, entry)
+                        for entry in manifest["segments"]]
+
+            # docs of updates not seen before (merged segments repeat
+            # already applied updates, which only costs a recomputation)
+            changed = set()
+            max_update = self.segments_max_update
+            for segment in segments:
+                if segment.max_update > self.segments_max_update:
+                    changed |= segment.documents | segment.deleted
+                    max_update = max(max_update, segment.max_update)
+
+            view = (SegmentedIndex(self.base_index, self.doc_lengths.keys(), segments,
+                                   self.segment_cache_size)
+                    if segments else self.base_index)
+            if self.on_segments_loaded:
+                self.on_segments_loaded(view, changed)
+
+            self.inverted_index = view
+            self.segments = segments
+            self.segments_generation = manifest["generation"]
+            self.segments_max_update = max_update
+            if changed:
+                self.version += 1
+            self.logger.info(
+                f"Loaded segment generation {self.segments_generation}: "
+                f"{len(segments)} segments, {len(changed)} changed docs "
+                f"in {time.perf_counter() - start_time:.2f}s"
+            )
+            return True
+
+    def start_segment_poller(self, segments_path, interval=2.0):
+        """Poll the segments manifest from a daemon thread."""
+        if self._poller is not None or interval <= 0:
+            return
+
+        def poll():
+            while True:
+                try:
+                    self.load_segments(segments_path)
+                except Exception as e:
+                    # a segment can be half-written or already merged away;
+                    # the next poll retries with a fresh manifest
+                    self.logger.error(f"Error loading segments: {str(e)}")
+                time.sleep(interval)
+
+        self._poller = threading.Thread(target=poll, name='segment-poller', daemon=True)
+        self._poller.start()
+
+    def stats(self):
+        """Size and load statistics, precomputed at load time so this is O(1)."""
+        return {
+            "terms": len(self.inverted_index),
+            "postings": self.total_postings,
+            "documents": getattr(self.inverted_index, "total_docs", len(self.doc_lengths)),
+            "segments": len(self.segments),
+            "bytes": self.index_bytes,
+            "load_time": self.load_time,
+            # tokens, average document length and vocabulary of the base build
+            "corpus": (self.manifest or {}).get("stats")
+        }
@@ -0,0 +1,153 @@
+"""Document metadata (title, summary, url) lookups for search results."""
+import os
+import logging
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import database
+from wikipedia_search.search.cache import LRUCache
+
+# Keep IN (...) lists under SQLite's host parameter limit
+BATCH_SIZE = 500
+
+Metadata = Tuple[str, Optional[str], Optional[str]]
+
+
+class DocumentMetadataStore:
+    """
+    Serves document metadata with as little SQLite access as possible.
+
+    Modes:
+        'memory': every row of documents is loaded once into compact tuples
+        'lru':    bounded LRU, warmed from the most returned docs of the
+                  previous run
+        'none':   no caching, but still one batched query per request
+    """
+    MODES = ('memory', 'lru', 'none')
+
+    def __init__(self, mode: str = 'none', cache_size: int = 20000,
+                 hot_docs_path: Optional[str] = None):
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        self.configure(mode, cache_size, hot_docs_path)
+
+    def configure(self, mode: str, cache_size: int = 20000,
+                  hot_docs_path: Optional[str] = None) -> None:
+        """(Re)configure the store, dropping anything cached so far."""
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown metadata cache mode: {mode}")
+
+        self.mode = mode
+        self.hot_docs_path = hot_docs_path
+        self.hits = 0
+        self.misses = 0
+
+        self._memory: Dict[int, Metadata] = {}
+        self._cache = LRUCache(maxsize=cache_size if mode == 'lru' else 0)
+        self._returned = Counter()
+
+    def load(self) -> None:
+        """Fill the store for the configured mode (call once at startup)."""
+        if self.mode == 'memory':
+            with database.get_db() as conn:
+                cur = conn.execute("SELECT doc_id, title, summary, url FROM documents")
+                self._memory = {row[0]: (row[1], row[2], row[3]) for row in cur}
+            self.logger.info(f"Loaded metadata for {len(self._memory)} documents")
+
+        elif self.mode == 'lru' and self.hot_docs_path and os.path.exists(self.hot_docs_path):
+            with open(self.hot_docs_path, mode='r', encoding='utf-8') as file:
+                doc_ids = [int(line) for line in file if line.strip()]
+            doc_ids = doc_ids[:self._cache.maxsize]
+            for doc_id, metadata in self._fetch(doc_ids).items():
+                self._cache.put(doc_id, metadata)
+            self.logger.info(f"Warmed metadata cache with {len(self._cache)} documents")
+
+    def get_many(self, doc_ids: Iterable[int]) -> Dict[int, Metadata]:
+        """
+        Look up metadata for result docs.
+
+        Args:
+            doc_ids: Doc ids in score order
+
+        Returns:
+            doc_id -> (title, summary, url) for docs that exist
+        """
+        doc_ids = list(doc_ids)
+        found = {}
+        missing = []
+
+        if self.mode == 'memory':
+            for doc_id in doc_ids:
+                metadata = self._memory.get(doc_id)
+                if metadata is not None:
+                    found[doc_id] = metadata
+                else:
+                    missing.append(doc_id)
+        elif self.mode == 'lru':
+            for doc_id in doc_ids:
+                metadata = self._cache.get(doc_id)
+                if metadata is not None:
+                    found[doc_id] = metadata
+                else:
+                    missing.append(doc_id)
+        else:
+            missing = doc_ids
+
+        if missing:
+            fetched = self._fetch(missing)
+            found.update(fetched)
+            if self.mode == 'memory':
+                # docs invalidated or added by index segments since load()
+                with self._lock:
+                    self._memory.update(fetched)
+            elif self.mode == 'lru':
+                for doc_id, metadata in fetched.items():
+                    self._cache.put(doc_id, metadata)
+
+        with self._lock:
+            self.hits += len(doc_ids) - len(missing)
+            self.misses += len(missing)
+        self.record_returned(doc_ids)
+
+        return found
+
+    def record_returned(self, doc_ids: Iterable[int]) -> None:
+        """Count docs returned to a client, including from cached responses."""
+        if self.mode == 'lru':
+            with self._lock:
+                self._returned.update(doc_ids)
+
+    def invalidate(self, doc_ids: Iterable[int]) -> None:
+        """Drop cached metadata of documents that were re-indexed or deleted."""
+        for doc_id in doc_ids:
+            self._memory.pop(doc_id, None)
+            self._cache.pop(doc_id)
+
+    def save_hot_docs(self, limit: Optional[int] = None) -> None:
+        """Write the most returned doc ids so the next start can warm the LRU."""
+        if self.mode != 'lru' or not self.hot_docs_path or not self._returned:
+            return
+
+        with self._lock:
+            hot = self._returned.most_common(limit or self._cache.maxsize)
+
+        os.makedirs(os.path.dirname(self.hot_docs_path) or '.', exist_ok=True)
+        with open(self.hot_docs_path, mode='w', encoding='utf-8') as file:
+            file.writelines(f"{doc_id}\n" for doc_id, _ in hot)
+
+    def _fetch(self, doc_ids: List[int]) -> Dict[int, Metadata]:
+        """One IN (...) query per BATCH_SIZE ids."""
+        fetched = {}
+        with database.get_db() as conn:
+            for i in range(0, len(doc_ids), BATCH_SIZE):
+                batch = doc_ids[i:i + BATCH_SIZE]
+                placeholders = ','.join('?' * len(batch))
+                cur = conn.execute(
+                    f"SELECT doc_id, title, summary, url FROM documents "
+                    f"WHERE doc_id IN ({placeholders})",
+                    batch
+                )
+                for row in cur:
+                    fetched[row[0]] = (row[1], row[2], row[3])
+        return fetched
@@ -6,12 +6,34 @@ import re
 import math
 import time
 import logging
+import threading
 from typing import Dict, List, Set, Tuple, Optional
-from functools import lru_cache
+import heapq
 from wikipedia_search.search.index_loader import SearchIndex
+from wikipedia_search.search.cache import LRUCache
+from wikipedia_search.search.shared_index import SharedTitleTerms
+from wikipedia_search.search.spelling import SpellingIndex
+from wikipedia_search.metrics import Histogram, LATENCY_BUCKETS, RESULT_COUNT_BUCKETS
+from array import array
 from collections import defaultdict
 import database
 
+# Postings processed between deadline checks
+DEADLINE_CHECK_INTERVAL = 4096
+
+
+def posting_columns(documents):
+    """
+    doc_id and tf sequences of a term's postings.
+
+    Shared index postings (shared_index.PostingList) provide them directly,
+    without building a dict per posting.
+    """
+    columns = getattr(documents, "columns", None)
+    if columns is not None:
+        return columns
+    return [doc["doc_id"] for doc in documents], [doc["tfk"] for doc in documents]
+
 
 class SearchEngine:
     def __init__(self, index: SearchIndex):
@@ -19,6 +41,10 @@ class SearchEngine:
         self.stopwords = set()
         self._doc_magnitudes = {}
         self.metrics = SearchMetrics()
+        self._result_cache = LRUCache(maxsize=1000)
+
+        # built after the index loads when spelling correction is enabled
+        self.spelling: Optional[SpellingIndex] = None
 
         # doc id -> title
         self.title_index = {}
@@ -33,13 +59,29 @@ class SearchEngine:
         )
 
         self.logger = logging.getLogger(__name__)        
+        # live documents all magnitudes were last computed for, and the
+        # relative change of that count after which segments recompute them
+        self._magnitude_docs = 0
+        self.magnitude_drift = 0.05
         self.search_index.on_index_loaded = self._init_doc_magnitudes
+        self.search_index.on_segments_loaded = self.apply_segments
 
         print(f"Number of documents with magnitudes: {len(self._doc_magnitudes)}")
 
 
     def _init_doc_magnitudes(self):
         """Pre-calculate document magnitudes for fast scoring"""
+        self._magnitude_docs = len(self.search_index.doc_lengths)
+        shared = self.search_index.shared
+        if shared is not None:
+            # magnitudes (indexed by doc_id) and title terms were computed
+            # into the shared file; see _set_magnitude for segment changes
+            self._doc_magnitudes = shared.magnitude_array
+            self.title_index = {}
+            self.term_title_index = SharedTitleTerms(shared)
+            print(f"Mapped shared index, documents: {shared.header['documents']}")
+            return
+
         self._load_titles()
 
         for term, term_data in self.search_index.inverted_index.items():
@@ -55,18 +97,112 @@ class SearchEngine:
         
         print(f"init doc maginitudes finished, size: {len(self._doc_magnitudes)}")
 
-    def _load_titles(self):
+    def apply_segments(self, index, changed_doc_ids):
+        """
+        Bring magnitudes and titles of documents changed by new index
+        segments up to date, before the new index view is swapped in.
+
+        Magnitudes of other documents keep the idf they were computed with
+        until the live document count has drifted by magnitude_drift since
+        they were, when every magnitude is recomputed with the current idf
+        (changes in document frequencies alone do not trigger this).
+
+        Args:
+            index: SegmentedIndex about to replace the current index
+            changed_doc_ids: Docs added, updated or deleted by the segments
+        """
+        if not changed_doc_ids:
+            return
+
+        current = index.current_terms(changed_doc_ids)
+        if abs(index.total_docs - self._magnitude_docs) > self.magnitude_drift * self._magnitude_docs:
+            self._recompute_magnitudes(index)
+        else:
+            for doc_id, terms in current.items():
+                # deleted docs keep their magnitude; the new view never returns them
+                if terms is None:
+                    continue
+                magnitude = 0.0
+                for term, tf in terms:
+                    weight = tf * index[term]["idf"]
+                    magnitude += weight * weight
+                self._set_magnitude(doc_id, math.sqrt(magnitude))
+
+        for doc_id in changed_doc_ids:
+            self._forget_title(doc_id)
+        self._load_titles([doc_id for doc_id, terms in current.items() if terms is not None])
+
+    def _recompute_magnitudes(self, index):
+        """Magnitudes of every live document with the idf of index."""
+        start_time = time.perf_counter()
+        squares = defaultdict(float)
+        for term_data in index.values():
+            idf = term_data["idf"]
+            doc_ids, tfks = posting_columns(term_data["documents"])
+            for doc_id, tfk in zip(doc_ids, tfks):
+                weight = tfk * idf
+                squares[doc_id] += weight * weight
+
+        if isinstance(self._doc_magnitudes, dict):
+            self._doc_magnitudes = {doc_id: math.sqrt(value) for doc_id, value in squares.items()}
+        else:
+            magnitudes = array('d', bytes(8 * max(len(self._doc_magnitudes), max(squares, default=0) + 1)))
+            for doc_id, value in squares.items():
+                magnitudes[doc_id] = math.sqrt(value)
+            self._doc_magnitudes = magnitudes
+        self._magnitude_docs = index.total_docs
+        self.logger.info(
+            f"Recomputed {len(squares)} document magnitudes for {index.total_docs} live documents "
+            f"in {time.perf_counter() - start_time:.2f}s"
+        )
+
+    def _set_magnitude(self, doc_id, magnitude):
+        magnitudes = self._doc_magnitudes
+        if isinstance(magnitudes, dict):
+            magnitudes[doc_id] = magnitude
+            return
+        if isinstance(magnitudes, memoryview):
+            # first change in this process: copy the shared magnitudes
+            magnitudes = self._doc_magnitudes = array('d', magnitudes)
+        if doc_id >= len(magnitudes):
+            magnitudes.extend([0.0] * (doc_id + 1 - len(magnitudes)))
+        magnitudes[doc_id] = magnitude
+
+    def _forget_title(self, doc_id):
+        title = self.title_index.pop(doc_id, None)
+        terms = self.clean_query(title) if title is not None else []
+        if isinstance(self.term_title_index, SharedTitleTerms):
+            # also hides the title the shared file has for doc_id
+            self.term_title_index.forget(doc_id, terms)
+            return
+        for term in terms:
+            self.term_title_index.get(term, set()).discard(doc_id)
+
+    def _load_titles(self, doc_ids=None):
+        """Load titles of all documents, or only of doc_ids."""
         try:
             with database.get_db() as conn:
-                cur = conn.execute(
-                    "SELECT doc_id, title FROM documents"
-                )
-                for row in cur:
+                if doc_ids is None:
+                    rows = conn.execute("SELECT doc_id, title FROM documents")
+                else:
+                    doc_ids = list(doc_ids)
+                    rows = []
+                    for i in range(0, len(doc_ids), 500):
+                        batch = doc_ids[i:i + 500]
+                        placeholders = ','.join('?' * len(batch))
+                        rows.extend(conn.execute(
+                            f"SELECT doc_id, title FROM documents WHERE doc_id IN ({placeholders})",
+                            batch
+                        ))
+                for row in rows:
                     doc_id = int(row['doc_id'])
                     title = row['title']
 
                     self.title_index[doc_id] = title
                     clean_terms = self.clean_query(title)
+                    if isinstance(self.term_title_index, SharedTitleTerms):
+                        self.term_title_index.add(doc_id, clean_terms)
+                        continue
                     for term in clean_terms:
                         self.term_title_index[term].add(doc_id)
 
@@ -76,6 +212,12 @@ class SearchEngine:
             self.logger.error(f"Title loading failed: {str(e)}")
             raise
 
+    def title_terms(self):
+        """(doc_id, cleaned title terms) of every document, for the shared index file."""
+        with database.get_db() as conn:
+            for row in conn.execute("SELECT doc_id, title FROM documents"):
+                yield int(row['doc_id']), self.clean_query(row['title'])
+
     def _is_term_in_title(self, doc_id, term):
         return doc_id in self.term_title_index.get(term, set())
 
@@ -109,8 +251,99 @@ class SearchEngine:
                          if term not in self.search_index.stopwords]
         return cleaned_terms
     
-    @lru_cache(maxsize=1000)
-    def search(self, query: str, k: int = 10, strict_match: bool = True):
+    def build_spelling_index(self, **kwargs) -> None:
+        """Build the symmetric-delete spelling index over the loaded vocabulary."""
+        start_time = time.perf_counter()
+        spelling = SpellingIndex(**kwargs)
+        spelling.build(self._vocabulary())
+        self.spelling = spelling
+        self.logger.info(
+            f"Spelling index built in {time.perf_counter() - start_time:.2f}s"
+        )
+
+    def _vocabulary(self):
+        """(term, document frequency) pairs for the spelling index."""
+        return ((term, len(data["documents"]))
+                for term, data in self.search_index.inverted_index.items())
+
+    def _has_term(self, term: str) -> bool:
+        return term in self.search_index.inverted_index
+
+    def suggest_query(self, query: str) -> Optional[str]:
+        """
+        "Did you mean" suggestion for a query.
+
+        Terms missing from the index are replaced with their closest
+        in-vocabulary candidate.
+
+        Args:
+            query: query request string
+
+        Returns:
+            Corrected query string, or None if no term needed (or had) a
+            correction
+        """
+        if self.spelling is None:
+            return None
+
+        corrected = []
+        changed = False
+        for term in self.clean_query(query):
+            if not self._has_term(term):
+                replacement = self.spelling.correct(term)
+                if replacement and replacement != term:
+                    term = replacement
+                    changed = True
+            corrected.append(term)
+
+        return ' '.join(corrected) if changed else None
+
+    def search(self, query: str, k: int = 10, strict_match: bool = True,
+               timeout_ms: Optional[int] = None):
+        """
+        Search query, serving repeated queries from the result cache.
+
+        Every call (cache hit or miss) is recorded in the search metrics.
+
+        Args:
+            query: Search string
+            k: Number of results requested to return
+            strict_match: Requires all query terms to be present if True
+            timeout_ms: Latency budget; when it runs out the best results
+                found so far are returned with partial=True. None or 0
+                disables the budget.
+
+        Returns:
+            SearchResults (a list of (doc_id, score) pairs)
+        """
+        start_time = time.perf_counter()
+        # segments that change documents make older cached results stale
+        cache_key = (query, k, strict_match, self.search_index.segments_max_update)
+
+        results = self._result_cache.get(cache_key)
+        if results is None:
+            self.metrics.record_cache_miss()
+            deadline = None
+            if timeout_ms:
+                deadline = time.monotonic() + timeout_ms / 1000
+
+            results = self._search(query, k, strict_match, deadline)
+
+            # partial results depend on the budget, never reuse them
+            if results.partial:
+                self.metrics.record_partial()
+            else:
+                self._result_cache.put(cache_key, results)
+
+        self.metrics.record_search_time(time.perf_counter() - start_time, len(results))
+        return results
+
+    def cache_size(self) -> int:
+        """Number of queries currently held in the result cache."""
+        return len(self._result_cache)
+
+    def _search(self, query: str, k: int, strict_match: bool,
+                deadline: Optional[float] = None):
         """
         Search query using vector space model with cosine similarity 
         (https://en.wikipedia.org/wiki/Cosine_similarity)
@@ -125,91 +358,97 @@ class SearchEngine:
             query: Search string
             k: Number of results requested to return
             strict_match: Requires all query terms to be present if True
+            deadline: time.monotonic() value after which candidate generation
+                and scoring stop early
 
         Returns:
-            List of (doc_id, score) pairs
+            SearchResults of (doc_id, score) pairs
         """
-        cache_info = self.search.cache_info()
-        if cache_info.hits > self.metrics.cache_hits:
-            self.metrics.record_cache_hit()
-
-        start_time = time.time()
         try:
             cleaned_query_terms = self.clean_query(query)
             
             if not cleaned_query_terms:
-                return []
+                return SearchResults()
 
             # find which terms if any are in the index
             found_terms = [term for term in cleaned_query_terms
                            if term in self.search_index.inverted_index]
 
             if not found_terms:
-                return []
+                return SearchResults()
 
-            print(found_terms)
-
-            if strict_match:
-                # get docs which contain all the search terms
-                found_docs = self._find_intersection(found_terms)
-            else:
-                # get all docs containing any query term
-                found_docs = self._find_union(found_terms)
-            
-            if not found_docs:
-                return []
-            
             query_vector = self._calc_query_vector(found_terms)
             query_magnitude = math.sqrt(sum(w * w for w in query_vector.values()))
             
             if query_magnitude == 0:
-                return []
+                return SearchResults()
 
-            results = self._calculate_scores(found_docs, found_terms, query_vector, query_magnitude)
+            # rarest (highest idf) terms first so a cut-off search has
+            # already used the most selective terms
+            terms = sorted(query_vector,
+                           key=lambda term: self.search_index.inverted_index[term]["idf"],
+                           reverse=True)
 
-            # Return top k results
-            sorted_results = sorted(results.items(), key=lambda x: x[1], reverse=True)[:k]
+            partial = False
+            if strict_match:
+                # get docs which contain all the search terms
+                found_docs, partial = self._find_intersection(terms, deadline)
+                if not found_docs:
+                    return SearchResults(partial=partial)
+            else:
+                # any doc containing a query term is a candidate, which the
+                # scoring pass finds on its own
+                found_docs = None
 
-            search_time = time.time() - start_time
-            self.metrics.record_search_time(search_time, len(sorted_results))
+            results, scoring_partial = self._calculate_scores(
+                found_docs, terms, query_vector, query_magnitude, deadline)
 
-            return sorted_results
+            # Return top k results
+            sorted_results = heapq.nlargest(k, results.items(), key=lambda x: x[1])
+
+            return SearchResults(sorted_results, partial=partial or scoring_partial)
 
         except Exception as e:
             self.logger.error(f"Search error: {str(e)}")
             raise
 
-    def _find_intersection(self, terms):
-        """More efficient intersection by starting with shortest posting list"""
-        # Get posting lists with lengths
-        term_docs = [(term, {int(doc["doc_id"]) 
-                    for doc in self.search_index.inverted_index[term]["documents"]})
-                    for term in terms]
-        
-        # Sort by posting list length
-        term_docs.sort(key=lambda x: len(x[1]))
-        
-        if not term_docs:
-            return set()
-            
-        result = term_docs[0][1]
-        for _, docs in term_docs[1:]:
-            result &= docs
+    @staticmethod
+    def _expired(deadline: Optional[float]) -> bool:
+        return deadline is not None and time.monotonic() >= deadline
+
+    def _find_intersection(self, terms, deadline=None):
+        """
+        Intersect posting lists starting with the shortest one.
+
+        If the deadline passes part way through, an empty set flagged as
+        partial is returned: docs matching only the terms processed so far
+        may lack later ones, and checking them means reading the rest of
+        the posting lists anyway.
+
+        Returns:
+            (set of doc ids, partial)
+        """
+        postings = sorted(
+            (self.search_index.inverted_index[term]["documents"] for term in terms),
+            key=len
+        )
+
+        result = set(posting_columns(postings[0])[0])
+        for documents in postings[1:]:
             if not result:  # Early exit if empty
                 break
-                
-        return result
 
-    def _find_union(self, terms):
-        docs_union = set()
+            doc_ids = posting_columns(documents)[0]
+            matched = set()
+            for chunk_start in range(0, len(doc_ids), DEADLINE_CHECK_INTERVAL):
+                matched.update(result.intersection(
+                    doc_ids[chunk_start:chunk_start + DEADLINE_CHECK_INTERVAL]))
+                if self._expired(deadline):
+                    # strict results must contain every term
+                    return set(), True
+            result = matched
 
-        for term in terms:
-            # add doc IDs for this term
-            docs = {int(doc_entry["doc_id"]) 
-                    for doc_entry in self.search_index.inverted_index[term]["documents"]}
-            docs_union.update(docs)
-
-        return docs_union
+        return result, False
 
     def _calc_query_vector(self, query_terms: List[str]):
         """
@@ -234,31 +473,57 @@ class SearchEngine:
         return query_vector
 
 
-    def _calculate_scores(self, result_docs, found_terms, query_vector, query_magnitude):
-        """More efficient batch scoring"""
+    def _calculate_scores(self, result_docs, found_terms, query_vector, query_magnitude,
+                          deadline=None):
+        """
+        Term-at-a-time scoring of candidate docs.
+
+        Args:
+            result_docs: Candidate doc ids, or None to score every doc that
+                contains a query term
+            found_terms: Unique query terms in the order they are scored
+            query_vector: Term -> query weight
+            query_magnitude: Norm of the query vector
+            deadline: time.monotonic() value after which scoring stops and
+                the partially accumulated scores are used
+
+        Returns:
+            (doc_id -> score, partial)
+        """
         try:
-            scores = {doc_id: 0.0 for doc_id in result_docs}
+            scores = defaultdict(float)
             title_exact_boost = 10
             title_boost = 2
-            
-            # Pre-calculate title matches
-            title_matches = {
-                doc_id: set(term for term in found_terms 
-                        if self._is_term_in_title(doc_id, term))
-                for doc_id in result_docs
-            }
+            partial = False
             
             # Calculate dot products in batch
             for term in found_terms:
                 term_data = self.search_index.inverted_index[term]
+                idf = float(term_data["idf"])
                 query_weight = query_vector[term]
-                
-                for doc_entry in term_data["documents"]:
-                    doc_id = int(doc_entry["doc_id"])
-                    if doc_id in result_docs:
-                        weight = float(doc_entry["tfk"]) * float(term_data["idf"])
-                        scores[doc_id] += query_weight * weight
+                doc_ids, tfks = posting_columns(term_data["documents"])
+
+                for chunk_start in range(0, len(doc_ids), DEADLINE_CHECK_INTERVAL):
+                    chunk_end = chunk_start + DEADLINE_CHECK_INTERVAL
+                    for doc_id, tfk in zip(doc_ids[chunk_start:chunk_end],
+                                           tfks[chunk_start:chunk_end]):
+                        if result_docs is None or doc_id in result_docs:
+                            weight = tfk * idf
+                            scores[doc_id] += query_weight * weight
+                    if self._expired(deadline):
+                        partial = True
+                        break
+                if partial:
+                    break
             
+            # Count title matches from the (small) title postings rather than
+            # checking every scored doc against every term
+            title_matches = defaultdict(int)
+            for term in found_terms:
+                for doc_id in self.term_title_index.get(term, ()):
+                    if doc_id in scores:
+                        title_matches[doc_id] += 1
+
             # Normalize and apply boosts
             final_scores = {}
             for doc_id, score in scores.items():
@@ -267,8 +532,8 @@ class SearchEngine:
                     base_score = score / (query_magnitude * self._doc_magnitudes[doc_id])
                     
                     # Apply title boost
-                    title_matching_terms = title_matches[doc_id]
-                    if len(title_matching_terms) == len(found_terms):
+                    title_matching_terms = title_matches.get(doc_id, 0)
+                    if title_matching_terms == len(found_terms):
                         final_score = base_score * title_exact_boost
                     elif title_matching_terms:
                         final_score = base_score * title_boost
@@ -277,46 +542,87 @@ class SearchEngine:
                         
                     final_scores[doc_id] = float((math.tanh(final_score) + 1) / 2)
             
-            return final_scores
+            return final_scores, partial
         except Exception as e:
             print(f"Scoring error: {str(e)}")
             raise
 
 
+class SearchResults(list):
+    """
+    List of (doc_id, score) pairs returned by SearchEngine.search.
+
+    partial is True when the latency budget ran out before every candidate
+    was scored, in which case these are the best results found in time.
+    """
+    def __init__(self, results=(), partial: bool = False):
+        super().__init__(results)
+        self.partial = partial
+
+
 class SearchMetrics:
-    """Track search engine performance metrics."""
+    """
+    Track search engine performance metrics.
+
+    Uses running totals and fixed-bucket histograms rather than per-search
+    lists, so memory stays constant and /metrics scrapes stay cheap.
+    """
     def __init__(self):
-        self.search_times = []  # Store time taken for each search
         self.total_searches = 0  # Total number of searches performed
-        self.cache_hits = 0      # Number of cache hits
+        self.cache_misses = 0    # Searches that were not served from cache
+        self.partial_searches = 0  # Searches cut short by their latency budget
         self.last_load_time = 0.0  # Time taken to load index
-        self.result_counts = []  # Number of results per search
+        self.total_search_time = 0.0
+        self.total_results = 0
         self.most_recent_search_time = 0.0
-        
+        self.latency_histogram = Histogram(LATENCY_BUCKETS)
+        self.results_histogram = Histogram(RESULT_COUNT_BUCKETS)
+        self._lock = threading.Lock()
+
+    @property
+    def cache_hits(self) -> int:
+        """Number of searches answered from the result cache."""
+        return max(self.total_searches - self.cache_misses, 0)
+
     def record_search_time(self, time_taken: float, num_results: int) -> None:
         """Record the time taken for a search and number of results."""
-        self.search_times.append(time_taken)
-        self.total_searches += 1
-        self.result_counts.append(num_results)
-        self.most_recent_search_time = time_taken
-
-    def record_cache_hit(self) -> None:
-        """Record when a search result comes from cache."""
-        self.cache_hits += 1
+        with self._lock:
+            self.total_searches += 1
+            self.total_search_time += time_taken
+            self.total_results += num_results
+            self.most_recent_search_time = time_taken
+
+        self.latency_histogram.observe(time_taken)
+        self.results_histogram.observe(num_results)
+
+    def record_cache_miss(self) -> None:
+        """Record a search that had to be scored."""
+        with self._lock:
+            self.cache_misses += 1
+
+    def record_partial(self) -> None:
+        """Record a search that hit its deadline and returned partial results."""
+        with self._lock:
+            self.partial_searches += 1
+
+    def cache_counts(self) -> Tuple[int, int]:
+        """Return (hits, misses) for the result cache."""
+        with self._lock:
+            return self.cache_hits, self.cache_misses
 
     def get_stats(self) -> Dict:
         """Get performance statistics."""
-        if not self.search_times:
+        if not self.total_searches:
             return {
                 "total_searches": 0,
                 "avg_search_time": 0,
                 "cache_hit_rate": 0,
                 "avg_results": 0
             }
-            
+
         return {
             "total_searches": self.total_searches,
-            "avg_search_time": sum(self.search_times) / len(self.search_times),
+            "avg_search_time": self.total_search_time / self.total_searches,
             "cache_hit_rate": self.cache_hits / self.total_searches,
-            "avg_results": sum(self.result_counts) / len(self.result_counts)
-        }
\ No newline at end of file
+            "avg_results": self.total_results / self.total_searches
+        }
@@ -0,0 +1,204 @@
+"""
+Incremental index segments, written by inverted_index/segment_indexer.py.
+
+Layout of INDEX_PATH/segments/:
+    manifest.json    {"generation": n, "segments": [{"name": ..., ...}, ...]},
+                     segments listed oldest first
+    <name>.postings  "word doc_id tf doc_id tf ..." per line
+    <name>.json      {"documents": [...], "deleted": [...],
+                      "norms": {doc_id: squared tf-idf norm, ...}}
+
+Segments are immutable; merges write a new segment and swap it into the
+manifest. A document's current version is the one in the newest segment that
+lists it under documents or deleted (deleted meaning it has none); the base
+index loaded from the part files is older than every segment.
+"""
+import json
+import math
+import os
+from collections.abc import Mapping
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from wikipedia_search.search.cache import LRUCache
+
+MANIFEST = 'manifest.json'
+
+
+def read_manifest(segments_path: str) -> dict:
+    """Current manifest, or an empty one if no segment was written yet."""
+    try:
+        with open(os.path.join(segments_path, MANIFEST), mode='r', encoding='utf-8') as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {"generation": 0, "segments": []}
+
+
+class Segment:
+    def __init__(self, name: str, postings: Dict[str, List[dict]],
+                 documents: Set[int], deleted: Set[int], max_update: int = 0):
+        self.name = name
+        self.postings = postings
+        self.documents = documents
+        self.deleted = deleted
+        self.max_update = max_update
+
+    @classmethod
+    def load(cls, segments_path: str, entry: dict) -> 'Segment':
+        """Load the segment described by a manifest entry."""
+        name = entry["name"]
+        with open(os.path.join(segments_path, f'{name}.json'), mode='r', encoding='utf-8') as file:
+            docs = json.load(file)
+
+        # segments written before norms were stored report 0.0
+        norms = {int(doc_id): norm for doc_id, norm in docs.get("norms", {}).items()}
+        postings = {}
+        with open(os.path.join(segments_path, f'{name}.postings'), mode='r', encoding='utf-8') as file:
+            for line in file:
+                data = line.split()
+                if len(data) < 3:
+                    continue
+                postings[data[0]] = [
+                    {"doc_id": int(data[i]), "tfk": float(data[i + 1]),
+                     "norm_factor": norms.get(int(data[i]), 0.0)}
+                    for i in range(1, len(data) - 1, 2)
+                ]
+        return cls(name, postings, set(docs["documents"]), set(docs["deleted"]),
+                   entry.get("max_update", 0))
+
+
+class SegmentedIndex(Mapping):
+    """
+    Read-only term -> {"idf", "documents"} view over the base index and
+    segments, in the same shape as SearchIndex.inverted_index.
+
+    Postings of superseded document versions are left out, and idf is
+    recomputed from the live document count and document frequencies across
+    all layers. Merged entries are built on first access and the most
+    recently used ones cached; the view is replaced (not updated) when the
+    segments change.
+    """
+    def __init__(self, base: Dict[str, dict], base_documents, segments: List[Segment],
+                 cache_size: int = 10000):
+        """
+        Args:
+            base: Inverted index loaded from the part files
+            base_documents: Container of the base index's doc ids
+            segments: Segments, oldest first
+            cache_size: Merged posting lists kept, 0 disables
+        """
+        self.base = base
+        self.segments = segments
+
+        # doc ids that a newer layer supersedes, per layer (oldest first)
+        superseded = set()
+        masks = []
+        live = 0
+        for segment in reversed(segments):
+            masks.append(frozenset(superseded))
+            live += len(segment.documents - superseded)
+            superseded |= segment.documents | segment.deleted
+        masks.reverse()
+        live += len(base_documents) - sum(1 for doc_id in superseded if doc_id in base_documents)
+
+        self.base_mask = frozenset(superseded)
+        self.segment_masks = masks
+        self.total_docs = live
+        self._cache = LRUCache(maxsize=cache_size)
+        # counted once here (on the segment poller thread) so len() and the
+        # /metrics and stats term counts never walk the index
+        self._length = sum(1 for _ in self)
+
+    def _layers(self, term: str):
+        entry = self.base.get(term)
+        if entry is not None:
+            yield entry["documents"], self.base_mask
+        for segment, mask in zip(self.segments, self.segment_masks):
+            postings = segment.postings.get(term)
+            if postings is not None:
+                yield postings, mask
+
+    def __getitem__(self, term: str) -> dict:
+        entry = self._cache.get(term)
+        if entry is not None:
+            return entry
+
+        layers = list(self._layers(term))
+        shared = len(layers) == 1 and not layers[0][1]
+        if shared:
+            # only one layer and nothing superseded: share its list
+            documents = layers[0][0]
+        else:
+            documents = [doc for postings, mask in layers for doc in postings
+                         if doc["doc_id"] not in mask]
+        if not documents:
+            raise KeyError(term)
+
+        entry = {"idf": math.log10(self.total_docs / len(documents)), "documents": documents}
+        if not shared:
+            # only copies are worth keeping; a shared list costs nothing to wrap
+            self._cache.put(term, entry)
+        return entry
+
+    def __contains__(self, term) -> bool:
+        try:
+            self[term]
+        except KeyError:
+            return False
+        return True
+
+    def _live(self, term: str) -> bool:
+        """Whether any layer still has a current posting of term."""
+        for postings, mask in self._layers(term):
+            # a posting list longer than its mask has a current posting, so
+            # only rare terms (df <= superseded docs) are ever scanned
+            if len(postings) > len(mask):
+                return True
+            if not postings:
+                continue
+            # shared index postings have a doc id column
+            doc_ids = getattr(postings, "doc_ids", None)
+            if doc_ids is None:
+                doc_ids = (doc["doc_id"] for doc in postings)
+            if any(doc_id not in mask for doc_id in doc_ids):
+                return True
+        return False
+
+    def __iter__(self):
+        # terms whose postings were all superseded are left out, as
+        # __getitem__ raises KeyError for them
+        if self.base_mask:
+            yield from (term for term in self.base if self._live(term))
+        else:
+            yield from self.base
+        seen = set()
+        for segment in self.segments:
+            for term in segment.postings:
+                if term not in self.base and term not in seen:
+                    seen.add(term)
+                    if self._live(term):
+                        yield term
+
+    def __len__(self) -> int:
+        return self._length
+
+    def current_terms(self, doc_ids: Iterable[int]) -> Dict[int, Optional[List[Tuple[str, float]]]]:
+        """
+        (term, tf) pairs of the current version of documents that segments
+        changed; None for deleted documents. Documents no segment mentions
+        are left out.
+        """
+        owners = {}  # doc_id -> newest segment mentioning it
+        pending = set(doc_ids)
+        for segment in reversed(self.segments):
+            for doc_id in pending & (segment.documents | segment.deleted):
+                owners[doc_id] = segment
+            pending -= owners.keys()
+
+        terms = {doc_id: (None if doc_id in segment.deleted else [])
+                 for doc_id, segment in owners.items()}
+        for segment in {id(s): s for s in owners.values()}.values():
+            for term, postings in segment.postings.items():
+                for doc in postings:
+                    if owners.get(doc["doc_id"]) is segment:
+                        terms[doc["doc_id"]].append((term, doc["tfk"]))
+        return terms
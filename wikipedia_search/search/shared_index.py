@@ -0,0 +1,493 @@
+"""
+Read-only index file that every worker process maps into memory.
+
+The dict-of-dicts index of SearchIndex.load_index costs each pre-forked
+worker its own copy: even when the workers fork after loading, reference
+count updates dirty the pages, so copy-on-write shares nothing. This module
+writes the index (postings, idf, per-document norms and magnitudes, and the
+title term postings) once into a flat file of arrays, and SharedIndex maps
+it with mmap. The page cache holds a single copy for all workers, and
+Python objects are only created for the postings a query actually reads.
+
+Layout: MAGIC, the header length (uint64), a JSON header describing the
+sections, then the sections themselves, each 8-byte aligned:
+
+    term_offsets     Q[terms + 1]  terms' byte ranges in term_bytes
+    term_bytes       B[]           utf-8 terms, in part file order
+    term_slots       I[]           open addressing table of term index + 1
+    idf              d[terms]
+    posting_offsets  Q[terms + 1]  terms' ranges in doc_ids / tfks
+    doc_ids          i[postings]
+    tfks             d[postings]
+    norms            d[max_doc_id + 1]  norm_factor from the part files
+    magnitudes       d[max_doc_id + 1]  sqrt(sum((tf * idf)^2))
+    present          B[max_doc_id + 1]  1 for documents in the index
+    title_offsets    Q[terms + 1]  terms' ranges in title_doc_ids
+    title_doc_ids    i[]           docs whose title contains the term
+"""
+import hashlib
+import json
+import math
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import zlib
+from array import array
+from collections import defaultdict
+from contextlib import contextmanager
+from collections.abc import Mapping, Sequence
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+MAGIC = b'WSIDX\x00\x00\x01'
+FORMAT_VERSION = 1
+
+_SECTIONS = (
+    ('term_offsets', 'Q'), ('term_bytes', 'B'), ('term_slots', 'I'), ('idf', 'd'),
+    ('posting_offsets', 'Q'), ('doc_ids', 'i'), ('tfks', 'd'),
+    ('norms', 'd'), ('magnitudes', 'd'), ('present', 'B'),
+    ('title_offsets', 'Q'), ('title_doc_ids', 'i'),
+)
+
+
+def _slot(term: bytes, mask: int) -> int:
+    return zlib.crc32(term) & mask
+
+
+def _grow(values: array, size: int) -> None:
+    """Zero-extend a doc_id indexed array to at least size entries."""
+    if len(values) < size:
+        values.extend(bytes(values.itemsize * (size - len(values))))
+
+
+def write_shared_index(path: str, parts: Iterable[str],
+                       title_terms: Iterable[Tuple[int, List[str]]],
+                       fingerprint: str,
+                       check: Optional[Callable[[List[Tuple[str, int]]], None]] = None) -> None:
+    """
+    Write the shared index file from the part files.
+
+    The parts are streamed into temporary files, then each term's postings
+    (several runs when parts split a term by document, which load_index
+    concatenates) are copied into place. Memory holds the vocabulary and
+    per-document arrays but not the postings.
+
+    Args:
+        path: File to write (replaced atomically)
+        parts: Part file paths
+        title_terms: (doc_id, cleaned title terms) of every document
+        fingerprint: Identifies the inputs, stored to detect a stale file
+        check: Called with the (sha256, term count) of each part before
+            the file is put in place, to reject parts that do not match
+            their manifest by raising
+
+    Raises:
+        ValueError: If a part is malformed
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    term_ids: Dict[str, int] = {}
+    term_offsets = array('Q', [0])
+    term_hashes = array('I')
+    idfs = array('d')
+    # each term's first run of postings in the temporary files; later runs
+    # of terms repeated across parts in extra_runs
+    run_starts = array('Q')
+    run_ends = array('Q')
+    extra_runs: Dict[int, List[Tuple[int, int]]] = defaultdict(list)
+    norms = array('d')
+    present = array('B')
+    checks = []
+
+    with tempfile.TemporaryDirectory(prefix='shared-index-', dir=directory) as tmp_dir:
+        term_bytes = open(os.path.join(tmp_dir, 'term_bytes'), mode='w+b')
+        run_doc_ids = open(os.path.join(tmp_dir, 'doc_ids'), mode='w+b')
+        run_tfks = open(os.path.join(tmp_dir, 'tfks'), mode='w+b')
+        try:
+            postings = 0
+            for part in parts:
+                digest = hashlib.sha256()
+                part_terms = 0
+                with open(part, mode='rb') as file:
+                    for line_num, raw_line in enumerate(file, 1):
+                        digest.update(raw_line)
+                        data = raw_line.split()
+                        if len(data) < 2:
+                            continue
+                        # complete (doc_id, tf, norm) triples, as load_index reads them
+                        end = 2 + (len(data) - 2) // 3 * 3
+                        try:
+                            word = data[0]
+                            idf = float(data[1])
+                            doc_ids = array('i', map(int, data[2:end:3]))
+                            tfks = array('d', map(float, data[3:end:3]))
+                            doc_norms = [float(value) for value in data[4:end:3]]
+                        except ValueError as e:
+                            raise ValueError(f"Malformed index entry at {line_num} of {part}") from e
+                        part_terms += 1
+
+                        doc_ids.tofile(run_doc_ids)
+                        tfks.tofile(run_tfks)
+                        run = (postings, postings + len(doc_ids))
+                        postings += len(doc_ids)
+
+                        term = word.decode('utf-8')
+                        index = term_ids.get(term)
+                        if index is None:
+                            # the first idf wins, as in load_index
+                            term_ids[term] = len(idfs)
+                            term_bytes.write(word)
+                            term_offsets.append(term_offsets[-1] + len(word))
+                            term_hashes.append(zlib.crc32(word))
+                            idfs.append(idf)
+                            run_starts.append(run[0])
+                            run_ends.append(run[1])
+                        else:
+                            extra_runs[index].append(run)
+
+                        if doc_ids:
+                            size = max(doc_ids) + 1
+                            _grow(norms, size)
+                            _grow(present, size)
+                        for doc_id, norm in zip(doc_ids, doc_norms):
+                            norms[doc_id] = norm
+                            present[doc_id] = 1
+                checks.append((digest.hexdigest(), part_terms))
+            if check is not None:
+                check(checks)
+
+            posting_offsets = array('Q', [0])
+            for index in range(len(idfs)):
+                length = run_ends[index] - run_starts[index]
+                length += sum(end - start for start, end in extra_runs.get(index, ()))
+                posting_offsets.append(posting_offsets[-1] + length)
+
+            # title postings, restricted to indexed terms: other terms are
+            # dropped from queries before titles are consulted
+            titles = defaultdict(set)
+            for doc_id, terms in title_terms:
+                for term in terms:
+                    index = term_ids.get(term)
+                    if index is not None:
+                        titles[index].add(doc_id)
+            title_offsets = array('Q', [0])
+            title_doc_ids = array('i')
+            for index in range(len(idfs)):
+                title_doc_ids.extend(sorted(titles.get(index, ())))
+                title_offsets.append(len(title_doc_ids))
+            del titles, term_ids
+
+            # load factor at most 1/2 keeps probe sequences short
+            table_size = 1 << max(1, (2 * len(idfs)).bit_length())
+            mask = table_size - 1
+            term_slots = array('I', bytes(4 * table_size))
+            for index, term_hash in enumerate(term_hashes):
+                slot = term_hash & mask
+                while term_slots[slot]:
+                    slot = (slot + 1) & mask
+                term_slots[slot] = index + 1
+
+            counts = {
+                'term_offsets': len(term_offsets), 'term_bytes': term_bytes.tell(),
+                'term_slots': len(term_slots), 'idf': len(idfs),
+                'posting_offsets': len(posting_offsets), 'doc_ids': postings, 'tfks': postings,
+                'norms': len(norms), 'magnitudes': len(norms), 'present': len(present),
+                'title_offsets': len(title_offsets), 'title_doc_ids': len(title_doc_ids),
+            }
+            header = {
+                "format": FORMAT_VERSION,
+                "fingerprint": fingerprint,
+                "terms": len(idfs),
+                "postings": postings,
+                "documents": sum(present),
+                "max_doc_id": len(present) - 1,
+                "sections": {},
+            }
+            # section offsets are relative to the end of the header
+            offset = 0
+            for name, typecode in _SECTIONS:
+                header["sections"][name] = [offset, typecode, counts[name]]
+                offset += _aligned(counts[name] * array(typecode).itemsize)
+            header_bytes = json.dumps(header).encode('utf-8')
+            header_bytes += b' ' * (_aligned(len(header_bytes)) - len(header_bytes))
+
+            with open(path + '.tmp', mode='wb') as out:
+                def pad(size):
+                    out.write(bytes(_aligned(size) - size))
+
+                out.write(MAGIC)
+                out.write(struct.pack('<Q', len(header_bytes)))
+                out.write(header_bytes)
+                term_offsets.tofile(out)
+                pad(len(term_offsets) * 8)
+                term_bytes.seek(0)
+                shutil.copyfileobj(term_bytes, out)
+                pad(counts['term_bytes'])
+                for values in (term_slots, idfs, posting_offsets):
+                    values.tofile(out)
+                    pad(len(values) * values.itemsize)
+
+                # postings in term order, and document magnitudes summed in
+                # the order SearchEngine._init_doc_magnitudes uses
+                magnitudes = array('d', bytes(8 * len(norms)))
+                with _mapped(run_doc_ids, 'i') as src_doc_ids, _mapped(run_tfks, 'd') as src_tfks:
+                    for column, source in (('doc_ids', src_doc_ids), ('tfks', src_tfks)):
+                        for index in range(len(idfs)):
+                            for start, end in _runs(index, run_starts, run_ends, extra_runs):
+                                out.write(source[start:end])
+                        pad(postings * source.itemsize)
+                    for index, idf in enumerate(idfs):
+                        for start, end in _runs(index, run_starts, run_ends, extra_runs):
+                            for doc_id, tfk in zip(src_doc_ids[start:end], src_tfks[start:end]):
+                                weight = tfk * idf
+                                magnitudes[doc_id] += weight * weight
+                for doc_id, value in enumerate(magnitudes):
+                    if value:
+                        magnitudes[doc_id] = math.sqrt(value)
+
+                for values in (norms, magnitudes, present, title_offsets, title_doc_ids):
+                    values.tofile(out)
+                    pad(len(values) * values.itemsize)
+            # workers still mapping a previous file keep reading its inode
+            os.replace(path + '.tmp', path)
+        finally:
+            for file in (term_bytes, run_doc_ids, run_tfks):
+                file.close()
+
+
+def _runs(index, run_starts, run_ends, extra_runs):
+    yield run_starts[index], run_ends[index]
+    yield from extra_runs.get(index, ())
+
+
+@contextmanager
+def _mapped(file, typecode):
+    """A written temporary file as a typed memoryview."""
+    file.flush()
+    if not file.tell():
+        yield memoryview(array(typecode))
+        return
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+        view = memoryview(mapped).cast(typecode)
+        try:
+            yield view
+        finally:
+            view.release()
+
+
+def _aligned(size: int) -> int:
+    return (size + 7) & ~7
+
+
+def read_fingerprint(path: str) -> Optional[str]:
+    """Fingerprint recorded in a shared index file, None if missing or unreadable."""
+    try:
+        with open(path, mode='rb') as file:
+            if file.read(len(MAGIC)) != MAGIC:
+                return None
+            (length,) = struct.unpack('<Q', file.read(8))
+            header = json.loads(file.read(length))
+    except (OSError, ValueError, struct.error):
+        return None
+    if header.get("format") != FORMAT_VERSION:
+        return None
+    return header.get("fingerprint")
+
+
+class SharedIndex(Mapping):
+    """
+    term -> {"idf", "documents"} over a mapped shared index file, in the
+    shape of SearchIndex.inverted_index.
+
+    The "documents" are PostingLists reading straight from the mapping.
+    """
+    def __init__(self, path: str):
+        with open(path, mode='rb') as file:
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        view = memoryview(self._mmap)
+        if view[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a shared index file")
+        (length,) = struct.unpack_from('<Q', self._mmap, len(MAGIC))
+        start = len(MAGIC) + 8
+        self.header = json.loads(bytes(view[start:start + length]))
+        start += length
+
+        for name, (offset, typecode, count) in self.header["sections"].items():
+            itemsize = array(typecode).itemsize
+            section = view[start + offset:start + offset + count * itemsize]
+            setattr(self, f'_{name}', section.cast(typecode) if typecode != 'B' else section)
+
+        self.path = path
+        self.size = len(self._mmap)
+        self.total_postings = self.header["postings"]
+        self._mask = len(self._term_slots) - 1
+        self.norms = DocumentValues(self._norms, self._present, self.header["documents"])
+        # read-only doc_id indexed view, for lookups in the scoring loop
+        self.magnitude_array = self._magnitudes
+
+    def term_index(self, term: str) -> int:
+        """Position of term in the file, -1 if it is not indexed."""
+        try:
+            key = term.encode('utf-8')
+        except (AttributeError, UnicodeError):
+            return -1
+        slot = _slot(key, self._mask)
+        while True:
+            index = self._term_slots[slot] - 1
+            if index < 0:
+                return -1
+            if self._term_bytes[self._term_offsets[index]:self._term_offsets[index + 1]] == key:
+                return index
+            slot = (slot + 1) & self._mask
+
+    def __getitem__(self, term: str) -> dict:
+        index = self.term_index(term)
+        if index < 0:
+            raise KeyError(term)
+        return {"idf": self._idf[index],
+                "documents": PostingList(self, self._posting_offsets[index],
+                                         self._posting_offsets[index + 1])}
+
+    def __contains__(self, term) -> bool:
+        return self.term_index(term) >= 0
+
+    def __iter__(self):
+        offsets, term_bytes = self._term_offsets, self._term_bytes
+        for index in range(len(self._idf)):
+            yield bytes(term_bytes[offsets[index]:offsets[index + 1]]).decode('utf-8')
+
+    def __len__(self) -> int:
+        return len(self._idf)
+
+    def title_doc_ids(self, term: str):
+        """Docs whose title contains term (an empty sequence if none)."""
+        index = self.term_index(term)
+        if index < 0:
+            return ()
+        return self._title_doc_ids[self._title_offsets[index]:self._title_offsets[index + 1]]
+
+
+class PostingList(Sequence):
+    """
+    Postings of one term, read from the mapping.
+
+    Items are {"doc_id", "tfk", "norm_factor"} dicts built on access;
+    columns gives the doc_id and tf sequences without building them.
+    """
+    __slots__ = ('_index', 'doc_ids', 'tfks')
+
+    def __init__(self, index: SharedIndex, start: int, end: int):
+        self._index = index
+        self.doc_ids = index._doc_ids[start:end]
+        self.tfks = index._tfks[start:end]
+
+    @property
+    def columns(self):
+        # converted in C: iterating lists is faster than iterating memoryviews
+        return self.doc_ids.tolist(), self.tfks.tolist()
+
+    def rows(self, start: int, stop: int):
+        """(doc_id, tfk, norm_factor) tuples of postings[start:stop]."""
+        norms = self._index._norms
+        doc_ids = self.doc_ids[start:stop].tolist()
+        return zip(doc_ids, self.tfks[start:stop].tolist(),
+                   [norms[doc_id] for doc_id in doc_ids])
+
+    def _posting(self, position: int) -> dict:
+        doc_id = self.doc_ids[position]
+        return {"doc_id": doc_id, "tfk": self.tfks[position],
+                "norm_factor": self._index._norms[doc_id]}
+
+    def __getitem__(self, position):
+        if isinstance(position, slice):
+            return [self._posting(i) for i in range(*position.indices(len(self.doc_ids)))]
+        return self._posting(range(len(self.doc_ids))[position])
+
+    def __iter__(self):
+        norms = self._index._norms
+        for doc_id, tfk in zip(self.doc_ids, self.tfks):
+            yield {"doc_id": doc_id, "tfk": tfk, "norm_factor": norms[doc_id]}
+
+    def __len__(self) -> int:
+        return len(self.doc_ids)
+
+
+class DocumentValues(Mapping):
+    """doc_id -> value of the indexed documents, over a doc_id indexed array."""
+    def __init__(self, values, present, count: int):
+        self._values = values
+        self._present = present
+        self._count = count
+
+    def __getitem__(self, doc_id: int) -> float:
+        if not isinstance(doc_id, int) or not 0 <= doc_id < len(self._present) \
+                or not self._present[doc_id]:
+            raise KeyError(doc_id)
+        return self._values[doc_id]
+
+    def __contains__(self, doc_id) -> bool:
+        return isinstance(doc_id, int) and 0 <= doc_id < len(self._present) \
+            and bool(self._present[doc_id])
+
+    def __iter__(self):
+        return (doc_id for doc_id, flag in enumerate(self._present) if flag)
+
+    def __len__(self) -> int:
+        return self._count
+
+
+class SharedTitleTerms:
+    """
+    term -> doc ids whose title contains it, from the shared file with this
+    process's changes on top.
+
+    Documents re-titled after the file was written (by index segments) are
+    masked out of the file's postings and tracked in memory instead.
+    """
+    def __init__(self, index: SharedIndex):
+        self.index = index
+        self.added = defaultdict(set)
+        self.overridden = set()
+
+    def get(self, term: str, default=()):
+        doc_ids = self.index.title_doc_ids(term)
+        if self.overridden:
+            doc_ids = {doc_id for doc_id in doc_ids if doc_id not in self.overridden}
+            doc_ids |= self.added.get(term, set())
+        return doc_ids if len(doc_ids) else default
+
+    def add(self, doc_id: int, terms: Iterable[str]) -> None:
+        self.overridden.add(doc_id)
+        for term in terms:
+            self.added[term].add(doc_id)
+
+    def forget(self, doc_id: int, terms: Iterable[str]) -> None:
+        self.overridden.add(doc_id)
+        for term in terms:
+            self.added.get(term, set()).discard(doc_id)
+
+
+def open_shared_index(path: str, fingerprint: str, parts: List[str],
+                      title_terms: Callable[[], Iterable[Tuple[int, List[str]]]],
+                      check: Optional[Callable[[List[Tuple[str, int]]], None]] = None
+                      ) -> SharedIndex:
+    """
+    Map the shared index file, writing it first if missing or stale.
+
+    An exclusive lock on path + '.lock' makes the first worker write the
+    file while the others wait and then map the same file.
+
+    Args:
+        path: Shared index file
+        fingerprint: Identifies the current part files and stopwords
+        parts: Part files, read when the file has to be written
+        title_terms: Called for (doc_id, title terms) when writing
+        check: Passed to write_shared_index
+    """
+    import fcntl
+
+    with open(path + '.lock', mode='w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if read_fingerprint(path) != fingerprint:
+            write_shared_index(path, parts, title_terms(), fingerprint, check)
+        return SharedIndex(path)
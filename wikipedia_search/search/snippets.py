@@ -0,0 +1,145 @@
+"""Query-highlighted snippets built from document_content."""
+import re
+import logging
+from typing import Dict, Iterable, List, Optional, Sequence
+
+import database
+from wikipedia_search.search.cache import LRUCache
+from wikipedia_search.search.metadata import BATCH_SIZE
+
+
+class SnippetGenerator:
+    def __init__(self, snippet_length: int = 200, cache_size: int = 5000):
+        """
+        Args:
+            snippet_length: Target snippet size in characters
+            cache_size: Number of (doc, terms) snippets kept in the LRU cache
+        """
+        self.snippet_length = snippet_length
+        self.cache = LRUCache(maxsize=cache_size)
+        self.logger = logging.getLogger(__name__)
+
+    def generate(self, doc_ids: Sequence[int], terms: Iterable[str]) -> Dict[int, dict]:
+        """
+        Build snippets for the returned top-k docs.
+
+        Content is only read for docs missing from the cache, BATCH_SIZE
+        docs per query.
+
+        Args:
+            doc_ids: Result doc ids
+            terms: Cleaned query terms to highlight
+
+        Returns:
+            doc_id -> {"text": snippet, "highlights": [[start, end], ...]}.
+            Docs whose content does not contain any term are left out.
+        """
+        terms = tuple(sorted(set(terms)))
+        if not terms or not doc_ids:
+            return {}
+
+        snippets = {}
+        missing = []
+        for doc_id in doc_ids:
+            snippet = self.cache.get((doc_id, terms))
+            if snippet is None:
+                missing.append(doc_id)
+            elif snippet:
+                snippets[doc_id] = snippet
+
+        if missing:
+            pattern = self._term_pattern(terms)
+            for doc_id, content in self._fetch_content(missing):
+                snippet = self._best_window(content, pattern) or {}
+                # cache misses too (as {}), so docs without a match are not re-read
+                self.cache.put((doc_id, terms), snippet)
+                if snippet:
+                    snippets[doc_id] = snippet
+
+        return snippets
+
+    @staticmethod
+    def _term_pattern(terms: Sequence[str]):
+        # longest first so a term is not shadowed by its own prefix
+        alternatives = '|'.join(re.escape(term) for term in sorted(terms, key=len, reverse=True))
+        return re.compile(rf"\b(?:{alternatives})\b", re.IGNORECASE)
+
+    def _fetch_content(self, doc_ids: List[int]):
+        """
+        Yield (doc_id, content) one BATCH_SIZE IN (...) query at a time, so
+        a large k neither exceeds SQLite's parameter limit nor holds every
+        body in memory at once.
+        """
+        for i in range(0, len(doc_ids), BATCH_SIZE):
+            batch = doc_ids[i:i + BATCH_SIZE]
+            placeholders = ','.join('?' * len(batch))
+            with database.get_db() as conn:
+                rows = conn.execute(
+                    f"SELECT doc_id, content FROM document_content "
+                    f"WHERE doc_id IN ({placeholders})",
+                    batch
+                ).fetchall()
+            for doc_id, content in rows:
+                yield doc_id, database.decompress_content(content)
+
+    def _best_window(self, content: str, pattern) -> Optional[dict]:
+        """
+        Pick the snippet_length window with the most distinct query terms
+        (ties broken by total matches).
+
+        A single regex scan finds the matches and a two-pointer sweep over
+        them finds the best window, so cost is linear in the content.
+        """
+        matches = [(m.start(), m.end(), m.group(0).casefold())
+                   for m in pattern.finditer(content)]
+        if not matches:
+            return None
+
+        best = (0, 0, 0, 0)  # distinct, total, first match, last match
+        counts = {}
+        left = 0
+        for right, (_, end, term) in enumerate(matches):
+            counts[term] = counts.get(term, 0) + 1
+            while end - matches[left][0] > self.snippet_length:
+                left_term = matches[left][2]
+                counts[left_term] -= 1
+                if not counts[left_term]:
+                    del counts[left_term]
+                left += 1
+
+            score = (len(counts), right - left + 1)
+            if score > best[:2]:
+                best = (score[0], score[1], left, right)
+
+        first, last = best[2], best[3]
+        return self._format(content, matches[first:last + 1])
+
+    def _format(self, content: str, window_matches) -> dict:
+        match_start = window_matches[0][0]
+        match_end = window_matches[-1][1]
+
+        # center the matches in the window, then snap to word boundaries
+        padding = max(self.snippet_length - (match_end - match_start), 0) // 2
+        start = max(match_start - padding, 0)
+        end = min(start + self.snippet_length, len(content))
+        start = max(min(start, end - self.snippet_length), 0)
+
+        if start > 0:
+            space = content.find(' ', start, match_start)
+            if space != -1:
+                start = space + 1
+        if end < len(content):
+            space = content.rfind(' ', match_end, end)
+            if space != -1:
+                end = space
+
+        prefix = '... ' if start > 0 else ''
+        suffix = ' ...' if end < len(content) else ''
+        offset = len(prefix) - start
+        highlights = [[m_start + offset, m_end + offset]
+                      for m_start, m_end, _ in window_matches if m_end <= end]
+
+        return {
+            "text": prefix + content[start:end] + suffix,
+            "highlights": highlights
+        }
@@ -0,0 +1,169 @@
+"""
+Symmetric-delete spelling correction (SymSpell style) over the index vocabulary.
+
+Every vocabulary term is expanded into the strings reachable by deleting up
+to max_edit_distance characters, and each delete maps back to its terms.
+A lookup only generates the deletes of the misspelled word and probes that
+map, so suggestions cost a handful of dict lookups and a few bounded
+edit-distance checks instead of a scan over the vocabulary.
+"""
+import logging
+from typing import Iterable, List, Optional, Tuple
+
+
+class SpellingIndex:
+    def __init__(self, max_edit_distance: int = 2, prefix_length: int = 7,
+                 min_doc_freq: int = 1):
+        """
+        Args:
+            max_edit_distance: Largest edit distance a suggestion may have
+            prefix_length: Only the first prefix_length characters of a term
+                are expanded into deletes, which bounds memory per term
+            min_doc_freq: Terms found in fewer documents are not suggested
+                (mostly typos in the corpus itself)
+        """
+        if prefix_length <= max_edit_distance:
+            raise ValueError("prefix_length must be larger than max_edit_distance")
+
+        self.max_edit_distance = max_edit_distance
+        self.prefix_length = prefix_length
+        self.min_doc_freq = min_doc_freq
+
+        # term -> document frequency, used to rank equally distant candidates
+        self.frequencies = {}
+        # delete string -> term (str) or tuple of terms, a bare str for the
+        # common single-term case keeps the map compact
+        self.deletes = {}
+        self.logger = logging.getLogger(__name__)
+
+    def build(self, term_frequencies: Iterable[Tuple[str, int]]) -> None:
+        """
+        Build the delete map from (term, document frequency) pairs.
+
+        Args:
+            term_frequencies: Vocabulary with document frequencies
+        """
+        deletes = {}
+        frequencies = {}
+        for term, frequency in term_frequencies:
+            if frequency < self.min_doc_freq:
+                continue
+            frequencies[term] = frequency
+
+            for variant in self._edits(term[:self.prefix_length], self._max_distance(term)):
+                existing = deletes.get(variant)
+                if existing is None:
+                    deletes[variant] = term
+                elif isinstance(existing, str):
+                    deletes[variant] = (existing, term)
+                else:
+                    deletes[variant] = existing + (term,)
+
+        self.frequencies = frequencies
+        self.deletes = deletes
+        self.logger.info(
+            f"Built spelling index: {len(frequencies)} terms, {len(deletes)} deletes"
+        )
+
+    def lookup(self, word: str, max_candidates: int = 5) -> List[Tuple[str, int, int]]:
+        """
+        Find in-vocabulary terms close to word.
+
+        Args:
+            word: Cleaned (lowercase) query term
+            max_candidates: Number of suggestions to return
+
+        Returns:
+            List of (term, edit distance, document frequency), closest and
+            most frequent first
+        """
+        if word in self.frequencies:
+            return [(word, 0, self.frequencies[word])]
+
+        max_distance = self._max_distance(word)
+        candidates = {}
+        for variant in self._edits(word[:self.prefix_length], max_distance):
+            terms = self.deletes.get(variant)
+            if terms is None:
+                continue
+            if isinstance(terms, str):
+                terms = (terms,)
+
+            for term in terms:
+                if term in candidates or abs(len(term) - len(word)) > max_distance:
+                    continue
+                distance = edit_distance(word, term, max_distance)
+                if distance <= max_distance:
+                    candidates[term] = distance
+
+        ranked = sorted(candidates.items(),
+                        key=lambda item: (item[1], -self.frequencies[item[0]], item[0]))
+        return [(term, distance, self.frequencies[term])
+                for term, distance in ranked[:max_candidates]]
+
+    def correct(self, word: str) -> Optional[str]:
+        """Best correction for word, or None if nothing is close enough."""
+        candidates = self.lookup(word, max_candidates=1)
+        return candidates[0][0] if candidates else None
+
+    def _max_distance(self, word: str) -> int:
+        # one edit already changes a lot of a very short word
+        if len(word) <= 4:
+            return min(1, self.max_edit_distance)
+        return self.max_edit_distance
+
+    @staticmethod
+    def _edits(word: str, max_distance: int) -> set:
+        """word plus every string made by deleting up to max_distance chars."""
+        variants = {word}
+        frontier = {word}
+        for _ in range(max_distance):
+            next_frontier = set()
+            for item in frontier:
+                if len(item) <= 1:
+                    continue
+                for i in range(len(item)):
+                    next_frontier.add(item[:i] + item[i + 1:])
+            next_frontier -= variants
+            variants |= next_frontier
+            frontier = next_frontier
+        return variants
+
+    def __len__(self) -> int:
+        return len(self.frequencies)
+
+
+def edit_distance(source: str, target: str, max_distance: int) -> int:
+    """
+    Optimal string alignment (Damerau-Levenshtein with adjacent swaps).
+
+    Stops as soon as a whole row exceeds max_distance and returns
+    max_distance + 1 in that case.
+    """
+    if source == target:
+        return 0
+    if abs(len(source) - len(target)) > max_distance:
+        return max_distance + 1
+
+    previous_previous = None
+    previous = list(range(len(target) + 1))
+    for i, source_char in enumerate(source, 1):
+        current = [i] + [0] * len(target)
+        row_min = i
+        for j, target_char in enumerate(target, 1):
+            cost = 0 if source_char == target_char else 1
+            value = min(previous[j] + 1,        # deletion
+                        current[j - 1] + 1,     # insertion
+                        previous[j - 1] + cost) # substitution
+            if (previous_previous is not None and i > 1 and j > 1
+                    and source_char == target[j - 2] and source[i - 2] == target_char):
+                value = min(value, previous_previous[j - 2] + 1)  # transposition
+            current[j] = value
+            row_min = min(row_min, value)
+
+        if row_min > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
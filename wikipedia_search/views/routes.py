@@ -1,5 +1,6 @@
 """Web routes for the search engine."""
 from flask import Blueprint, render_template, request, jsonify
+import itertools
 import requests
 
 views_bp = Blueprint('views', __name__)
@@ -22,8 +23,13 @@ def test_api():
 @views_bp.route('/stats')
 def show_stats():
     """Show index statistics."""
-    try:
-        api_response = requests.get('http://localhost:5000/api/v1/stats')
-        return render_template('stats.html', stats=api_response.json())
-    except requests.RequestException:
-        return "Error fetching stats", 500
\ No newline at end of file
+    # read in-process instead of calling our own API over HTTP
+    from wikipedia_search.search import search_index, search_engine
+
+    stats = dict(search_engine.metrics.get_stats())
+    stats.update({
+        "total_words": len(search_index.inverted_index),
+        "sample_words": list(itertools.islice(search_index.inverted_index, 10)),
+        "stopwords_count": len(search_index.stopwords)
+    })
+    return render_template('stats.html', stats=stats)
\ No newline at end of file